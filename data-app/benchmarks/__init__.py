@@ -0,0 +1 @@
+"""Synthetic-data benchmarks for the data pipeline (run with python -m benchmarks)."""
@@ -0,0 +1,196 @@
+"""
+Pipeline benchmark harness.
+
+Generates synthetic GRADE_DATA at each requested scale, runs the pipeline stages against it
+(each in a child process) and records wall time, throughput and peak RSS per stage. Results are
+written as JSON under benchmarks/results/ and compared against a baseline run when one exists.
+
+    python -m benchmarks --scales 1 10 --terms 2
+    python -m benchmarks --scales 1 --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import REAL_TERM_ROWS, generate_grade_data
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_APP_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+STAGES = ["generate", "preprocess", "ingest", "summaries", "rmp_matching", "duplicates"]
+# Stages that need the database built by ingest
+DB_STAGES = {"summaries", "rmp_matching", "duplicates"}
+
+
+def run_child(cmd, cwd, log_path):
+    """Run `cmd` to completion and return (exit code, wall seconds, cpu seconds, peak RSS in MB)."""
+    env = dict(os.environ, PYTHONPATH=DATA_APP_DIR)
+    start = time.perf_counter()
+    with open(log_path, "a") as log:
+        log.write(f"\n$ {' '.join(cmd)}\n")
+        log.flush()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        # wait4 reports the resource usage of this child alone (ru_maxrss is in KB on Linux)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    return proc.returncode, wall, usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024
+
+
+def run_stage(stage, run_dir, raw_dir, seed, log_path):
+    """Run one pipeline stage in a child process and return its measurements."""
+    out_path = os.path.join(run_dir, f"{stage}.result.json")
+    if stage == "ingest":
+        metrics_path = os.path.join(run_dir, "metrics", "ingest.json")
+        cmd = [sys.executable, os.path.join(DATA_APP_DIR, "main.py"), "-dr", "--metrics-out", metrics_path]
+    else:
+        metrics_path = None
+        cmd = [sys.executable, "-m", "benchmarks.stages", stage, "--raw-dir", raw_dir,
+               "--seed", str(seed), "--out", out_path]
+
+    code, wall, cpu, rss = run_child(cmd, run_dir, log_path)
+    result = {
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": round(rss, 1),
+    }
+    if code != 0:
+        result["error"] = f"exited with code {code} (see {log_path})"
+        return result
+
+    if metrics_path:
+        # main.py reports rows and its own sub-stage timings
+        with open(metrics_path) as f:
+            report = json.load(f)
+        result["rows"] = report["counters"].get("csv.rows", 0)
+        result["substages"] = {name: stage["wall_seconds"] for name, stage in report["stages"].items()}
+    else:
+        with open(out_path) as f:
+            result.update(json.load(f))
+    if result.get("rows"):
+        result["rows_per_second"] = round(result["rows"] / wall, 1)
+    return result
+
+
+def run_scale(scale, terms, seed, stages, workdir):
+    """Generate the dataset for one scale and run every selected stage against it."""
+    scale_dir = os.path.join(workdir, f"scale_{scale:g}")
+    raw_dir = os.path.join(scale_dir, "raw")
+    run_dir = os.path.join(scale_dir, "run")
+    log_path = os.path.join(scale_dir, "benchmark.log")
+    os.makedirs(run_dir, exist_ok=True)
+    results = {}
+
+    start = time.perf_counter()
+    written = generate_grade_data(raw_dir, scale, seed, terms)
+    wall = time.perf_counter() - start
+    rows = sum(written.values())
+    if "generate" in stages:
+        results["generate"] = {"wall_seconds": round(wall, 3), "rows": rows,
+                               "rows_per_second": round(rows / wall, 1)}
+    print(f"[BENCH] {scale:g}x: generated {rows} rows in {len(written)} files ({wall:.1f}s)")
+    shutil.copytree(raw_dir, os.path.join(run_dir, "GRADE_DATA"))
+
+    for stage in STAGES[1:]:
+        if stage not in stages:
+            continue
+        if stage in DB_STAGES and "error" in results.get("ingest", {}):
+            results[stage] = {"error": "skipped: ingest failed"}
+            continue
+        if stage in DB_STAGES and not os.path.exists(os.path.join(run_dir, "ProcessedData.db")):
+            results[stage] = {"error": "skipped: no database (run the ingest stage)"}
+            continue
+        print(f"[BENCH] {scale:g}x: running {stage}...")
+        results[stage] = run_stage(stage, run_dir, raw_dir, seed, log_path)
+        summary = results[stage]
+        if "error" in summary:
+            print(f"[ERROR] {scale:g}x {stage}: {summary['error']}")
+        else:
+            print(f"[BENCH] {scale:g}x {stage}: {summary['wall_seconds']:.2f}s, "
+                  f"{summary.get('rows_per_second', 0):.0f} rows/s, {summary['peak_rss_mb']:.0f} MB peak RSS")
+    return results
+
+
+def git_commit():
+    """Current commit of the checkout, if available."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DATA_APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print wall time, throughput and peak RSS of this run next to the baseline run."""
+    print(f"\n[BENCH] Comparison with baseline from {baseline.get('created_at')} ({baseline.get('commit')})")
+    print(f"{'scale':>6} {'stage':<14} {'wall s':>9} {'base s':>9} {'ratio':>7} {'rows/s':>10} {'RSS MB':>8} {'base MB':>8}")
+    for scale, stages in report["results"].items():
+        base_stages = baseline.get("results", {}).get(scale, {})
+        for stage, current in stages.items():
+            base = base_stages.get(stage)
+            if "error" in current or not base or "error" in base:
+                continue
+            ratio = current["wall_seconds"] / base["wall_seconds"] if base["wall_seconds"] else float("nan")
+            print(f"{scale:>6} {stage:<14} {current['wall_seconds']:>9.2f} {base['wall_seconds']:>9.2f} "
+                  f"{ratio:>7.2f} {current.get('rows_per_second', 0):>10.0f} "
+                  f"{current.get('peak_rss_mb', 0):>8.0f} {base.get('peak_rss_mb', 0):>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the data pipeline on synthetic GRADE_DATA.')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1],
+                        help='Multiples of the real data volume to benchmark (e.g. 1 10 100).')
+    parser.add_argument('--terms', type=int, default=1,
+                        help=f'Number of most recent terms to generate (1-{len(REAL_TERM_ROWS)}).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data.')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to run.')
+    parser.add_argument('--workdir', help='Directory for generated data and databases (default: a temporary directory).')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory after the run.')
+    parser.add_argument('--output', help='Path of the results JSON (default: benchmarks/results/<timestamp>.json).')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results JSON to compare against.')
+    parser.add_argument('--save-baseline', action='store_true', help='Also write this run to the baseline path.')
+    args = parser.parse_args()
+
+    terms = sorted(REAL_TERM_ROWS)[-args.terms:]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="buzzgrades-bench-")
+    created_at = datetime.now(timezone.utc)
+    report = {
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "terms": terms,
+        "results": {},
+    }
+
+    try:
+        for scale in args.scales:
+            report["results"][f"{scale:g}"] = run_scale(scale, terms, args.seed, args.stages, workdir)
+    finally:
+        if args.keep or args.workdir:
+            print(f"[BENCH] Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, created_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
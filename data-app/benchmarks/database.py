@@ -0,0 +1,123 @@
+"""
+Bulk builder for benchmark databases.
+
+Builds a ProcessedData.db with the db/Models.py schema from GRADE_DATA-style CSVs, with the
+same grouping as main.py ingestion (one termdistribution row per term, instructor and course)
+but in a few set-based inserts, so 10x-scale databases build in seconds rather than hours.
+Summary tables are filled as generate_summaries.py would shape them and the FTS5 tables by
+src/search/fts.py itself, so frontend query plans can be checked against the result.
+"""
+import json
+import sqlite3
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from db.Models import Base, class_code_for
+from mapping.mappings import dept_mapping
+from src.search.fts import FTS_TABLES, create_fts_table
+
+GRADES = ["A", "B", "C", "D", "F", "S", "U", "V", "I", "W"]
+CAMPUS = "MAIN"
+
+
+def load_grade_rows(csv_files: list) -> pd.DataFrame:
+    """Read CSVs and aggregate sections per (term, instructor, subject, course number) like main.py."""
+    df = pd.concat([pd.read_csv(path, dtype={"Section": str}) for path in csv_files], ignore_index=True)
+    df["subject"] = df["Course"].str.extract(r"^([A-Za-z]+)", expand=False)
+    df["course_number"] = df["Course"].str.extract(r"[A-Za-z]+\s+(.+)", expand=False)
+    df = df[~df["course_number"].astype(str).str.endswith("R")]
+    df["Instructor"] = df["Instructor"].fillna("Unknown Instructor")
+    hc_columns = [f"hc_{grade}" for grade in GRADES]
+    df[hc_columns] = df[hc_columns].fillna(0)
+    grouped = df.groupby(["Term", "Instructor", "subject", "course_number"], sort=False)[hc_columns].sum()
+    grouped = grouped.round().astype(int).reset_index()
+    grouped.columns = ["term", "instructor", "subject", "course_number"] + GRADES
+    grouped["students"] = grouped[GRADES].sum(axis=1)
+    return grouped
+
+
+def _grades_json(frame: pd.DataFrame) -> list:
+    return [json.dumps(dict(zip(GRADES, row))) for row in frame[GRADES].values.tolist()]
+
+
+def build_database(db_path: str, csv_files: list) -> dict:
+    """Create `db_path` from the CSVs and return row counts per table."""
+    Base.metadata.create_all(create_engine(f"sqlite:///{db_path}"))
+    rows = load_grade_rows(csv_files)
+
+    subjects = pd.Index(rows["subject"].unique())
+    instructors = pd.Index(rows["instructor"].unique())
+    classes = rows[["subject", "course_number"]].drop_duplicates().reset_index(drop=True)
+    classes["class_id"] = classes.index + 1
+    rows = rows.merge(classes, on=["subject", "course_number"])
+    rows["instructor_id"] = instructors.get_indexer(rows["instructor"]) + 1
+    dists = rows[["class_id", "instructor_id"]].drop_duplicates().reset_index(drop=True)
+    dists["dist_id"] = dists.index + 1
+    rows = rows.merge(dists, on=["class_id", "instructor_id"])
+    class_totals = rows.groupby("class_id")[GRADES + ["students"]].sum().reset_index()
+    rows["term"] = rows["term"].astype(int)
+
+    con = sqlite3.connect(db_path)
+    try:
+        con.executemany(
+            "INSERT INTO departmentdistribution (campus, dept_abbr, dept_name) VALUES (?, ?, ?)",
+            [(CAMPUS, subject, dept_mapping.get(subject, subject)) for subject in subjects],
+        )
+        con.executemany("INSERT INTO professor (id, name) VALUES (?, ?)",
+                        [(i + 1, name) for i, name in enumerate(instructors)])
+        classes = classes.merge(class_totals, on="class_id")
+        con.executemany(
+            "INSERT INTO classdistribution (id, campus, dept_abbr, course_num, class_code, class_desc, total_students, total_grades) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(class_id, CAMPUS, subject, number, class_code_for(subject, number), f"{subject} {number}", students, grades)
+             for class_id, subject, number, students, grades in zip(
+                 classes["class_id"].tolist(), classes["subject"], classes["course_number"],
+                 classes["students"].tolist(), _grades_json(classes))],
+        )
+        con.executemany("INSERT INTO distribution (id, class_id, instructor_id) VALUES (?, ?, ?)",
+                        zip(dists["dist_id"].tolist(), dists["class_id"].tolist(), dists["instructor_id"].tolist()))
+        con.executemany(
+            "INSERT INTO termdistribution (dist_id, students, term, grades) VALUES (?, ?, ?, ?)",
+            zip(rows["dist_id"].tolist(), rows["students"].tolist(), rows["term"].tolist(), _grades_json(rows)),
+        )
+        fill_summaries(con)
+        con.commit()
+        build_fts(db_path)
+        con.execute("ANALYZE")
+        con.commit()
+        return {table: con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("professor", "classdistribution", "distribution", "termdistribution")}
+    finally:
+        con.close()
+
+
+def fill_summaries(con: sqlite3.Connection) -> None:
+    """One summary row per class, instructor and department, keyed as generate_summaries.py writes them,
+    and the class instructor rollups with their full term lists.
+
+    Only the keys matter for query plans, so the summary GPA columns are left empty. Rollups keep
+    their real payload because class pages return it.
+    """
+    con.execute("INSERT INTO class_summary (class_id) SELECT id FROM classdistribution")
+    con.execute("INSERT INTO instructor_summary (instructor_id) SELECT id FROM professor")
+    con.execute("INSERT INTO department_summary (dept_abbr) SELECT dept_abbr FROM departmentdistribution")
+    grade_sums = ", ".join(f"'{grade}', SUM(json_extract(t.grades, '$.{grade}'))" for grade in GRADES)
+    con.execute(f"""
+        INSERT INTO class_instructor_rollup (dist_id, class_id, instructor_id, total_students, grades, terms)
+        SELECT d.id, d.class_id, d.instructor_id, SUM(t.students), json_object({grade_sums}),
+               json_group_array(json_array(t.term, t.students, json(t.grades)))
+        FROM distribution d JOIN termdistribution t ON t.dist_id = d.id
+        GROUP BY d.id
+    """)
+
+
+def build_fts(db_path: str) -> None:
+    """Create and fill the FTS5 tables with src/search/fts.py, as the pipeline does (without catalog titles)."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        with engine.begin() as conn:
+            for table in FTS_TABLES:
+                create_fts_table(conn, table, titles={})
+    finally:
+        engine.dispose()
@@ -0,0 +1,113 @@
+"""
+Startup budget check for the command-line entry points.
+
+Runs each quick command (--help of every entry point, python -m src.rmp --stats-only on an
+empty database) in a fresh interpreter and fails when
+
+  * the median wall time of a command exceeds its budget, or
+  * a command imports a module it does not need (pandas, the gql/aiohttp RMP client, and for
+    plain --help also SQLAlchemy), as reported by python -X importtime
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --runs 10 --show-imports 15
+    python -m benchmarks.import_budget --budget-scale 2     # slower machine
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_APP_DIR = os.path.dirname(BENCHMARK_DIR)
+
+# Modules only the ingestion and RMP update paths need
+HEAVY_MODULES = {"pandas", "gql", "aiohttp", "rapidfuzz"}
+# Commands that never open the database should not load the database layer either
+NO_DATABASE = HEAVY_MODULES | {"sqlalchemy", "numpy"}
+
+# (name, arguments, median wall time budget in seconds with interpreter start, modules it must not import)
+COMMANDS = [
+    ("main", [os.path.join(DATA_APP_DIR, "main.py"), "--help"], 0.3, NO_DATABASE),
+    ("summaries", [os.path.join(DATA_APP_DIR, "generate_summaries.py"), "--help"], 1.0, HEAVY_MODULES),
+    ("rmp", ["-m", "src.rmp", "--help"], 0.3, NO_DATABASE),
+    ("rmp_stats", ["-m", "src.rmp", "--stats-only", "--skip-maintenance"], 1.0, HEAVY_MODULES),
+    ("maintenance", ["-m", "src.maintenance", "--help"], 0.3, NO_DATABASE),
+    ("analytics", ["-m", "src.analytics", "--help"], 1.0, HEAVY_MODULES),
+    ("catalog", ["-m", "src.catalog", "--help"], 0.3, NO_DATABASE),
+    ("publish", ["-m", "src.publish", "--help"], 0.3, NO_DATABASE),
+]
+
+IMPORT_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def imported_modules(cmd: list, cwd: str, env: dict) -> list:
+    """[(cumulative microseconds, nesting depth, module)] for every module `cmd` imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime"] + cmd, cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_RE.match(line)
+        if match:
+            # importtime indents each nested import by two more spaces
+            modules.append((int(match.group(2)), (len(match.group(3)) - 1) // 2, match.group(4)))
+    return modules
+
+
+def time_command(cmd: list, cwd: str, env: dict, runs: int) -> float:
+    """Median wall time of `cmd` over `runs` fresh interpreters, in seconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + cmd, cwd=cwd, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(cmd)} exited with status {result.returncode}")
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that the quick entry point commands start within budget.')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per command (median is compared).')
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='Multiply every budget by this factor (for slower machines).')
+    parser.add_argument('--show-imports', type=int, default=0, metavar='N',
+                        help='Print the N slowest top-level imports of every command.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="buzzgrades-imports-")
+    env = dict(os.environ, PYTHONPATH=DATA_APP_DIR)
+    failures = []
+    try:
+        # --stats-only reads an empty database with the current schema
+        subprocess.run([sys.executable, "-c", "from db.Models import Base, get_engine; Base.metadata.create_all(get_engine())"],
+                       cwd=workdir, env=env, check=True)
+        for name, cmd, budget, forbidden in COMMANDS:
+            budget *= args.budget_scale
+            modules = imported_modules(cmd, workdir, env)
+            heavy = sorted({module.split(".")[0] for _, _, module in modules} & forbidden)
+            elapsed = time_command(cmd, workdir, env, args.runs)
+            status = "ok" if elapsed <= budget and not heavy else "FAIL"
+            print(f"[IMPORTS] {name:<12} {elapsed * 1000:7.0f} ms (budget {budget * 1000:.0f} ms)  {status}"
+                  + (f"  imports {', '.join(heavy)}" if heavy else ""))
+            top_level = sorted((cumulative, module) for cumulative, depth, module in modules if depth == 0)
+            for cumulative, module in top_level[::-1][:args.show_imports]:
+                print(f"    {cumulative / 1000:7.1f} ms  {module}")
+            if elapsed > budget:
+                failures.append(f"{name}: {elapsed * 1000:.0f} ms over the {budget * 1000:.0f} ms budget")
+            if heavy:
+                failures.append(f"{name}: imports {', '.join(heavy)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("\n[IMPORTS] FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\n[IMPORTS] All commands within the startup budget")
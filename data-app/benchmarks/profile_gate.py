@@ -0,0 +1,88 @@
+"""
+Profile regression gate.
+
+Runs main.py, generate_summaries.py and python -m src.rmp --fix-duplicates with --profile on the
+fixed sample dataset in benchmarks/sample/ (no network access needed) and compares each run's
+stage profiles against the baselines in benchmarks/profiles/. Exits non-zero if a stage
+regressed beyond the thresholds; the offending runs print their top regressed functions.
+
+    python -m benchmarks.profile_gate
+    python -m benchmarks.profile_gate --update-baseline
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from src.metrics.profiling import DEFAULT_ALLOC_THRESHOLD, DEFAULT_TIME_THRESHOLD
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_APP_DIR = os.path.dirname(BENCHMARK_DIR)
+SAMPLE_DIR = os.path.join(BENCHMARK_DIR, "sample", "GRADE_DATA")
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, "profiles")
+
+RUNS = [
+    ("main", [os.path.join(DATA_APP_DIR, "main.py"), "-dr"]),
+    ("summaries", [os.path.join(DATA_APP_DIR, "generate_summaries.py")]),
+    ("rmp", ["-m", "src.rmp", "--fix-duplicates"]),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Profile the pipeline on the sample dataset and compare against the baseline.')
+    parser.add_argument('--update-baseline', action='store_true', help='Record new baselines instead of comparing.')
+    parser.add_argument('--metric', default='cpu', choices=['cpu', 'wall'], help='Time measure to compare.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help='Allowed relative time increase per stage.')
+    parser.add_argument('--alloc-threshold', type=float, default=DEFAULT_ALLOC_THRESHOLD,
+                        help='Allowed relative increase of a stage\'s allocation peak.')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory (profiles, logs, database).')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="buzzgrades-profile-")
+    shutil.copytree(SAMPLE_DIR, os.path.join(workdir, "GRADE_DATA"))
+    profile_dir = os.path.join(workdir, "profiles")
+    env = dict(os.environ, PYTHONPATH=DATA_APP_DIR)
+    failed = []
+
+    try:
+        for run_name, command in RUNS:
+            cmd = [sys.executable] + command + ["--profile", profile_dir, "--profile-metric", args.metric,
+                                                "--profile-threshold", str(args.threshold),
+                                                "--profile-alloc-threshold", str(args.alloc_threshold)]
+            baseline = os.path.join(BASELINE_DIR, f"{run_name}.json")
+            if not args.update_baseline:
+                if not os.path.exists(baseline):
+                    print(f"[GATE] No baseline for {run_name} at {baseline}; run with --update-baseline")
+                    failed.append(run_name)
+                    continue
+                cmd += ["--profile-baseline", baseline]
+
+            print(f"[GATE] Profiling {run_name}...")
+            with open(os.path.join(workdir, f"{run_name}.log"), "w") as log:
+                result = subprocess.run(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            with open(os.path.join(workdir, f"{run_name}.log")) as log:
+                # Echo the gate verdict and any regression details from the run's output
+                for line in log:
+                    if line.startswith(("[PROFILE]", "    +")):
+                        print(line, end="")
+            if result.returncode != 0:
+                failed.append(run_name)
+                continue
+
+            if args.update_baseline:
+                os.makedirs(BASELINE_DIR, exist_ok=True)
+                shutil.copy(os.path.join(profile_dir, f"{run_name}.json"), baseline)
+                print(f"[GATE] Baseline updated: {baseline}")
+    finally:
+        if args.keep:
+            print(f"[GATE] Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if failed:
+        print(f"[GATE] FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    print("[GATE] All runs within the baseline thresholds" if not args.update_baseline else "[GATE] Baselines recorded")
@@ -0,0 +1,273 @@
+"""
+Query-plan regression suite for the SQL the frontend issues.
+
+Loads the SQL from frontend/lib/db/queries.js and fts-search.js, builds fresh databases from
+synthetic GRADE_DATA at each scale (1x and 10x by default) with the db/Models.py schema, and for
+every query shape:
+
+  * runs EXPLAIN QUERY PLAN and fails on a full scan (or automatic index, which is a scan per
+    query) of termdistribution or distribution; other full scans are reported as warnings
+  * times the query against a latency budget for that scale
+
+and times point lookups of classes by class code, the step every class page starts with, against
+a per-lookup budget that must hold at every scale.
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --scales 1 --show-plans
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.database import build_database
+from benchmarks.synthetic import REAL_TERM_ROWS, generate_grade_data
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DB_DIR = os.path.join(os.path.dirname(os.path.dirname(BENCHMARK_DIR)), "frontend", "lib", "db")
+QUERY_FILES = ["queries.js", "fts-search.js"]
+
+# Tables that must always be reached through an index
+GUARDED_TABLES = {"termdistribution", "distribution"}
+# Median latency budgets in milliseconds, per scale
+DEFAULT_BUDGET_MS = {1: 20.0, 10: 50.0}
+# Queries that list a whole table by design get a larger budget
+LISTING_BUDGET_MS = {1: 100.0, 10: 1000.0}
+LISTING_QUERIES = {"getEveryClassCode", "getEveryProfessorCode", "getEveryDepartmentCode"}
+TIMED_RUNS = 7
+# Known problems, reported but not failing the run until fixed: {query name: reason}
+EXPECTED_FAILURES = {
+    "getDistributionFromTerms": "fallback until class_instructor_rollup is built; returns every term row of the busiest class",
+}
+# Class page lookup, as queries.js resolves a class code; must be a unique-index search
+POINT_LOOKUP_SQL = "SELECT id FROM classdistribution WHERE class_code = UPPER(REPLACE(?, ' ', ''))"
+POINT_LOOKUP_INDEX = "ix_classdistribution_class_code"
+POINT_LOOKUP_SAMPLES = 500
+# p99 budget in milliseconds for one lookup, the same at every scale
+POINT_LOOKUP_BUDGET_MS = 1.0
+
+TEMPLATE_RE = re.compile(r"(\w+)\s*=\s*`(.*?)`", re.S)
+# Query functions: exported ones and module-private helpers such as fallbacks
+EXPORT_RE = re.compile(r"(?:export\s+const\s+(\w+)\s*=|const\s+(\w+)\s*=\s*async\b)")
+CLAUSE_RE = re.compile(r"const\s+(\w+Clause)\s*=(.*?);", re.S)
+STRING_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+PLACEHOLDER_RE = re.compile(r"\$\{(\w+)\}")
+TABLE_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?(?!(?:ON|LEFT|INNER|JOIN|WHERE|GROUP|ORDER|LIMIT)\b)([A-Za-z_]\w*))?",
+    re.I,
+)
+PLAN_RE = re.compile(r"^(SCAN|SEARCH) (\w+)(.*)$")
+
+
+def load_query_shapes(frontend_db_dir: str = FRONTEND_DB_DIR) -> dict:
+    """Return {name: sql} for every SQL template literal in the frontend query modules.
+
+    `${...Clause}` placeholders are expanded into one shape per string literal of the nearest
+    preceding `const ...Clause = ...;` declaration (the JS picks one of them at runtime).
+    """
+    shapes = {}
+    for filename in QUERY_FILES:
+        with open(os.path.join(frontend_db_dir, filename)) as f:
+            source = f.read()
+        for match in TEMPLATE_RE.finditer(source):
+            var_name, sql = match.groups()
+            if "SELECT" not in sql.upper():
+                continue
+            before = source[:match.start()]
+            exports = [exported or private for exported, private in EXPORT_RE.findall(before)]
+            base = exports[-1] if filename == "queries.js" and exports else f"{filename[:-3]}:{var_name}"
+            variants = [("", sql)]
+            for placeholder in set(PLACEHOLDER_RE.findall(sql)):
+                declarations = [m for m in CLAUSE_RE.finditer(before) if m.group(1) == placeholder]
+                if not declarations:
+                    raise ValueError(f"{filename}: no declaration found for ${{{placeholder}}} in {var_name}")
+                literals = [a or b for a, b in STRING_RE.findall(declarations[-1].group(2))]
+                variants = [(f"{suffix}[{i}]", text.replace(f"${{{placeholder}}}", literal))
+                            for suffix, text in variants for i, literal in enumerate(literals)]
+            for suffix, text in variants:
+                name = base + suffix
+                # The same variable name is reused in different branches of fts-search.js
+                while name in shapes:
+                    name += "'"
+                shapes[name] = text
+    return shapes
+
+
+def table_aliases(sql: str) -> dict:
+    aliases = {}
+    for table, alias in TABLE_ALIAS_RE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def check_plan(con: sqlite3.Connection, sql: str, params: dict) -> tuple:
+    """Return (plan lines, violations, warnings) for a query."""
+    plan = [row[3] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    aliases = table_aliases(sql)
+    violations, warnings = [], []
+    for detail in plan:
+        match = PLAN_RE.match(detail)
+        if not match:
+            continue
+        operation, name, rest = match.groups()
+        table = aliases.get(name, name)
+        full_scan = (operation == "SCAN" and "VIRTUAL TABLE" not in rest) or "AUTOMATIC" in rest
+        if not full_scan:
+            continue
+        if table in GUARDED_TABLES:
+            violations.append(detail)
+        elif not table.endswith("_fts"):
+            warnings.append(detail)
+    return plan, violations, warnings
+
+
+def sample_params(con: sqlite3.Connection) -> dict:
+    """Representative parameters: the busiest class, instructor and department in the database."""
+    dept, number = con.execute("""
+        SELECT c.dept_abbr, c.course_num FROM classdistribution c
+        JOIN distribution d ON d.class_id = c.id
+        JOIN termdistribution t ON t.dist_id = d.id
+        GROUP BY c.id ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()
+    instructor_id, instructor = con.execute("""
+        SELECT p.id, p.name FROM professor p JOIN distribution d ON d.instructor_id = p.id
+        GROUP BY p.id ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()
+    return {
+        "class_name": f"{dept} {number}",
+        "dept_code": dept,
+        "dept_abbr": dept,
+        "course_num": number,
+        "instructor_id": instructor_id,
+        "exact_course_pattern": f'"{dept}{number}"',
+        "dept_pattern": f"{dept}*",
+        "course_pattern": f"{dept}{number[:2]}*",
+        "search_term": f"{instructor.split()[-1]}* OR \"{instructor.split()[-1]}\"",
+    }
+
+
+def time_query(con: sqlite3.Connection, sql: str, params: dict) -> float:
+    """Median wall time in milliseconds over TIMED_RUNS executions (after one warm-up run)."""
+    con.execute(sql, params).fetchall()
+    samples = []
+    for _ in range(TIMED_RUNS):
+        start = time.perf_counter()
+        con.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def time_point_lookups(con: sqlite3.Connection, samples: int = POINT_LOOKUP_SAMPLES, seed: int = 0) -> tuple:
+    """
+    (plan, median ms, p99 ms) of looking up `samples` random classes by their spaced class code
+    ("CS 1332"), one query each.
+    """
+    codes = [f"{dept} {number}" for dept, number in con.execute(
+        "SELECT dept_abbr, course_num FROM classdistribution")]
+    codes = random.Random(seed).choices(codes, k=samples)
+    plan = [row[3] for row in con.execute(f"EXPLAIN QUERY PLAN {POINT_LOOKUP_SQL}", (codes[0],))]
+    con.execute(POINT_LOOKUP_SQL, (codes[0],)).fetchall()
+    timings = []
+    for code in codes:
+        start = time.perf_counter()
+        con.execute(POINT_LOOKUP_SQL, (code,)).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return plan, statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def budget_for(name: str, scale: float) -> float:
+    budgets = LISTING_BUDGET_MS if name in LISTING_QUERIES else DEFAULT_BUDGET_MS
+    return budgets.get(scale, budgets[max(budgets)])
+
+
+def run_suite(db_path: str, scale: float, shapes: dict, show_plans: bool = False) -> list:
+    """Check every query shape against one database. Returns a list of failure messages."""
+    con = sqlite3.connect(db_path)
+    failures = []
+    try:
+        params = sample_params(con)
+        print(f"\n[PLANS] {scale:g}x: {os.path.getsize(db_path) / 1e6:.1f} MB, sample class {params['class_name']}")
+        print(f"{'query':<44} {'median ms':>10} {'budget':>8}  status")
+        for name, sql in shapes.items():
+            plan, violations, warnings = check_plan(con, sql, params)
+            elapsed = time_query(con, sql, params)
+            budget = budget_for(name, scale)
+            status, problems = [], []
+            if violations:
+                status.append("FULL SCAN")
+                problems.append(f"{scale:g}x {name}: full scan of {', '.join(violations)}")
+            if elapsed > budget:
+                status.append("OVER BUDGET")
+                problems.append(f"{scale:g}x {name}: {elapsed:.2f} ms exceeds {budget:.0f} ms budget")
+            if problems and name in EXPECTED_FAILURES:
+                status.append(f"expected: {EXPECTED_FAILURES[name]}")
+            else:
+                failures += problems
+            if warnings:
+                status.append(f"warning: {'; '.join(warnings)}")
+            print(f"{name:<44} {elapsed:>10.2f} {budget:>8.0f}  {', '.join(status) or 'ok'}")
+            if show_plans:
+                for detail in plan:
+                    print(f"    {detail}")
+
+        plan, median, p99 = time_point_lookups(con)
+        status = []
+        if not any(POINT_LOOKUP_INDEX in detail for detail in plan):
+            status.append("NO INDEX")
+            failures.append(f"{scale:g}x class code lookup: not using {POINT_LOOKUP_INDEX} ({'; '.join(plan)})")
+        if p99 > POINT_LOOKUP_BUDGET_MS:
+            status.append("OVER BUDGET")
+            failures.append(f"{scale:g}x class code lookup: p99 {p99:.3f} ms exceeds {POINT_LOOKUP_BUDGET_MS:g} ms budget")
+        print(f"[PLANS] {scale:g}x class code lookup over {POINT_LOOKUP_SAMPLES} classes: median {median:.3f} ms, "
+              f"p99 {p99:.3f} ms (budget {POINT_LOOKUP_BUDGET_MS:g} ms)  {', '.join(status) or 'ok'}")
+    finally:
+        con.close()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that frontend queries stay index-backed and within latency budgets.')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10],
+                        help='Multiples of the real data volume to test (default: 1 10).')
+    parser.add_argument('--terms', type=int, default=len(REAL_TERM_ROWS),
+                        help='Number of most recent terms to generate (default: all).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data.')
+    parser.add_argument('--db', help='Check an existing database instead of building synthetic ones.')
+    parser.add_argument('--show-plans', action='store_true', help='Print the query plan of every query.')
+    args = parser.parse_args()
+
+    shapes = load_query_shapes()
+    print(f"[PLANS] Loaded {len(shapes)} query shapes from {', '.join(QUERY_FILES)}")
+    failures = []
+    if args.db:
+        failures += run_suite(args.db, 1, shapes, args.show_plans)
+    else:
+        workdir = tempfile.mkdtemp(prefix="buzzgrades-plans-")
+        try:
+            terms = sorted(REAL_TERM_ROWS)[-args.terms:]
+            for scale in args.scales:
+                csv_dir = os.path.join(workdir, f"scale_{scale:g}")
+                written = generate_grade_data(csv_dir, scale, args.seed, terms)
+                db_path = os.path.join(workdir, f"scale_{scale:g}.db")
+                start = time.perf_counter()
+                counts = build_database(db_path, sorted(written))
+                print(f"[PLANS] {scale:g}x: built database in {time.perf_counter() - start:.1f}s {counts}")
+                failures += run_suite(db_path, scale, shapes, args.show_plans)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print("\n[PLANS] FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\n[PLANS] All queries index-backed and within budget")
@@ -0,0 +1,110 @@
+"""
+Benchmark stage entry points.
+
+Each stage runs in its own interpreter (python -m benchmarks.stages <stage>) with the benchmark
+work directory as cwd, so the pipeline's relative paths (GRADE_DATA/, ProcessedData.db) resolve
+to the synthetic dataset and the parent can read the child's peak RSS on its own. The stage
+writes a small JSON result (rows processed plus any stage-specific figures) to --out.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+
+DATA_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_preprocess(args):
+    """Preprocess a fresh copy of the raw synthetic CSVs."""
+    from data_preprocessor import process_csv_file
+
+    shutil.rmtree("PREPROCESS_DATA", ignore_errors=True)
+    shutil.copytree(args.raw_dir, "PREPROCESS_DATA")
+    rows = 0
+    for file_path in sorted(glob.glob("PREPROCESS_DATA/*.csv")):
+        process_csv_file(file_path)
+        with open(file_path) as f:
+            rows += sum(1 for _ in f) - 1
+    return {"rows": rows}
+
+
+def run_summaries(args):
+    """Run generate_summaries.main against the ingested database."""
+    import generate_summaries
+    from sqlalchemy import create_engine, text
+
+    generate_summaries.main()
+    engine = create_engine("sqlite:///./ProcessedData.db")
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM termdistribution")).scalar()
+        summaries = conn.execute(text("SELECT COUNT(*) FROM class_summary")).scalar()
+    return {"rows": rows, "class_summaries": summaries}
+
+
+def run_duplicates(args):
+    """Run RMP duplicate detection and merging over the ingested professors."""
+    from sqlalchemy import create_engine, text
+    from src.rmp.rmp import RMP
+
+    engine = create_engine("sqlite:///./ProcessedData.db")
+    with engine.connect() as conn:
+        before = conn.execute(text("SELECT COUNT(*) FROM professor")).scalar()
+    RMP()._detect_and_merge_duplicates()
+    with engine.connect() as conn:
+        after = conn.execute(text("SELECT COUNT(*) FROM professor")).scalar()
+    return {"rows": before, "merged": before - after}
+
+
+def _rmp_candidates(name, rmp, rng):
+    """RMP search results for `name`: the professor (sometimes under a nickname) among decoys."""
+    first, last = name.split()[0], name.split()[-1]
+    nicknames = rmp._nickname_map.get(first.lower())
+    if nicknames and rng.random() < 0.5:
+        first = nicknames[rng.integers(0, len(nicknames))].title()
+    nodes = [{"firstName": first, "lastName": last}]
+    for decoy in ("Alex", "Jordan", "Taylor", "Morgan"):
+        nodes.append({"firstName": decoy, "lastName": last})
+    rng.shuffle(nodes)
+    return [{"node": node} for node in nodes]
+
+
+def run_rmp_matching(args):
+    """Match every ingested professor name against synthetic RMP search results."""
+    import numpy as np
+    from sqlalchemy import create_engine, text
+    from src.rmp.rmp import RMP
+
+    engine = create_engine("sqlite:///./ProcessedData.db")
+    with engine.connect() as conn:
+        names = [row[0] for row in conn.execute(text("SELECT name FROM professor"))]
+    names = [name for name in names if len(name.split()) >= 2]
+
+    rmp = RMP()
+    rng = np.random.default_rng(args.seed)
+    searches = [(name, _rmp_candidates(name, rmp, rng)) for name in names]
+    matched = sum(1 for name, candidates in searches if rmp._enhanced_match_candidates(name, candidates))
+    return {"rows": len(searches), "matched": matched}
+
+
+STAGES = {
+    "preprocess": run_preprocess,
+    "summaries": run_summaries,
+    "duplicates": run_duplicates,
+    "rmp_matching": run_rmp_matching,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a single benchmark stage.')
+    parser.add_argument('stage', choices=sorted(STAGES), help='Stage to run.')
+    parser.add_argument('--raw-dir', help='Directory holding the raw synthetic CSVs.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for synthetic inputs.')
+    parser.add_argument('--out', required=True, help='Path of the JSON result file.')
+    args = parser.parse_args()
+
+    sys.path.insert(0, DATA_APP_DIR)
+    result = STAGES[args.stage](args)
+    with open(args.out, "w") as f:
+        json.dump(result, f)
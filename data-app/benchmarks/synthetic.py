@@ -0,0 +1,262 @@
+"""
+Synthetic GRADE_DATA generator.
+
+Writes semester CSVs in the exact schema of the files in GRADE_DATA (already preprocessed:
+"First Last" instructors, grade percentages and hc_* headcounts) at a multiple of the real
+volume. Row counts per term, instructor/course/department cardinalities and the enrollment
+skew are calibrated against the real 2016-2025 data; every scale is deterministic for a seed.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from mapping.mappings import term_to_name
+
+# Real volume (Summer 2016 - Summer 2025) used as the 1x reference
+REAL_TERM_ROWS = {
+    201605: 2331, 201608: 5708, 201702: 5680, 201705: 2409, 201708: 5847, 201802: 5807,
+    201805: 2412, 201808: 6053, 201902: 6002, 201905: 2443, 201908: 6273, 202002: 6150,
+    202005: 2446, 202008: 5945, 202102: 5953, 202105: 2573, 202108: 6197, 202202: 6122,
+    202205: 2600, 202208: 6446, 202302: 6486, 202305: 2729, 202308: 6806, 202402: 6815,
+    202405: 2751, 202408: 7195, 202502: 7088, 202505: 2768,
+}
+REAL_INSTRUCTORS = 4358
+REAL_COURSES = 4895
+REAL_DEPARTMENTS = 90
+# Share of instructors that also appear under a variant spelling ("Dr. X", different case),
+# and how often such an instructor's rows use the variant
+DUPLICATE_NAME_RATE = 0.01
+DUPLICATE_ROW_RATE = 0.3
+
+GRADES = ["A", "B", "C", "D", "F", "S", "U", "V", "I", "W", "IJ"]
+COLUMNS = ["Term", "Course", "Instructor", "Section", "Enrollment", "Average"] + GRADES + [f"hc_{g}" for g in GRADES]
+# Dirichlet weights for a typical letter-graded section
+GRADE_ALPHA = np.array([5.0, 3.0, 1.5, 0.5, 0.4, 0.05, 0.02, 0.02, 0.02, 0.5, 0.01])
+# Pass/fail sections are almost entirely S
+PASS_FAIL_ALPHA = np.array([0.01, 0.01, 0.01, 0.01, 0.01, 8.0, 0.2, 0.05, 0.05, 0.2, 0.01])
+PASS_FAIL_RATE = 0.15
+# Share of (term, course, instructor) groups made of a single section
+GROUP_SINGLE_SECTION_RATE = 0.78
+
+FIRST_NAMES = [
+    "Robert", "William", "James", "Michael", "David", "Richard", "Thomas", "Charles", "Christopher",
+    "Daniel", "Matthew", "Anthony", "Joseph", "Andrew", "Elizabeth", "Margaret", "Patricia", "Jennifer",
+    "Susan", "Salvador", "Mary", "Linda", "Barbara", "Sarah", "Karen", "Nancy", "Lisa", "Betty", "Sandra",
+    "Ashley", "Emily", "Laura", "Rachel", "Anna", "Maria", "Wei", "Jing", "Hao", "Yan", "Li", "Priya",
+    "Rahul", "Anil", "Sanjay", "Deepa", "Ahmed", "Omar", "Fatima", "Mohammed", "Yusuf", "Olga", "Ivan",
+    "Dmitri", "Elena", "Sergei", "Hiroshi", "Kenji", "Yuki", "Akira", "Min", "Jae", "Soo", "Carlos",
+    "Jose", "Luis", "Ana", "Sofia", "Pierre", "Marie", "Hans", "Greta", "Lars", "Ingrid", "Kwame", "Ama",
+]
+SURNAME_PREFIXES = [
+    "An", "Bar", "Bel", "Ch", "Cor", "Dav", "Del", "Ed", "Fer", "Gar", "Gold", "Har", "Hol", "Jan", "Kal",
+    "Kim", "Lan", "Lee", "Mac", "Mar", "Mor", "Nak", "Ol", "Pat", "Ram", "Ros", "San", "Sch", "Tan", "Van",
+    "Wal", "Wat", "Yam", "Zh",
+]
+SURNAME_SUFFIXES = [
+    "son", "ez", "ley", "man", "ton", "berg", "ski", "ova", "ani", "oto", "ang", "ell", "er", "ford", "wood",
+    "ini", "ard", "ers", "ams", "ino", "ura", "ov", "ich", "ez", "etti", "sen", "ström", "ado", "stein",
+]
+SURNAME_INFIXES = ["", "a", "e", "i", "o", "ra", "li", "ne", "to", "ber"]
+MIDDLE_NAME_RATE = 0.05
+
+
+def _department_codes(count: int, rng: np.random.Generator) -> list:
+    """Unique 2-4 letter department codes."""
+    codes = set()
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    while len(codes) < count:
+        length = rng.integers(2, 5)
+        codes.add("".join(rng.choice(letters, length)))
+    return sorted(codes)
+
+
+def _instructor_names(count: int, rng: np.random.Generator) -> np.ndarray:
+    """Unique "First Last" names (about 5% with a middle name, as in the real data)."""
+    surnames = sorted({p + m + s for p in SURNAME_PREFIXES for m in SURNAME_INFIXES for s in SURNAME_SUFFIXES})
+    space = len(FIRST_NAMES) * len(surnames)
+    if count > space:
+        raise ValueError(f"Cannot generate {count} unique instructor names (pool holds {space})")
+    picks = rng.choice(space, size=count, replace=False)
+    middles = rng.choice(FIRST_NAMES, size=count)
+    with_middle = rng.random(count) < MIDDLE_NAME_RATE
+    return np.array([
+        f"{FIRST_NAMES[pick % len(FIRST_NAMES)]} {middle + ' ' if has_middle else ''}{surnames[pick // len(FIRST_NAMES)]}"
+        for pick, middle, has_middle in zip(picks, middles, with_middle)
+    ])
+
+
+def _duplicate_variant(name: str, rng: np.random.Generator) -> str:
+    """A spelling of `name` that canonicalizes to the same professor."""
+    variant = rng.integers(0, 3)
+    if variant == 0:
+        return f"Dr. {name}"
+    if variant == 1:
+        return name.lower()
+    return f"{name} Jr."
+
+
+def build_catalog(scale: float, seed: int = 0) -> dict:
+    """
+    Build the synthetic catalog shared by every term: departments, courses (with popularity
+    weights and instructor pools) and instructors.
+    """
+    rng = np.random.default_rng(seed)
+    n_depts = max(1, round(REAL_DEPARTMENTS * min(scale, 1) + REAL_DEPARTMENTS * max(scale - 1, 0) ** 0.5))
+    n_courses = max(n_depts, round(REAL_COURSES * scale))
+    n_instructors = max(1, round(REAL_INSTRUCTORS * scale))
+
+    depts = _department_codes(n_depts, rng)
+    # Department sizes are skewed: the largest hold ~6% of all courses (ECE, MGT, CS), many are small
+    dept_weights = rng.lognormal(0, 0.7, n_depts)
+    dept_weights /= dept_weights.sum()
+    course_dept = rng.choice(n_depts, size=n_courses, p=dept_weights)
+    instructor_dept = rng.choice(n_depts, size=n_instructors, p=dept_weights)
+    instructors = _instructor_names(n_instructors, rng)
+
+    # Course numbers: level 1-8 thousand, unique within a department; ~3% carry a letter suffix
+    # and ~1% are recitations ending in R, which ingestion skips
+    course_codes = []
+    used = set()
+    for dept_idx in course_dept:
+        while True:
+            number = f"{rng.integers(1, 9)}{rng.integers(0, 1000):03d}"
+            roll = rng.random()
+            if roll < 0.01:
+                number += "R"
+            elif roll < 0.04:
+                number += rng.choice(["K", "L", "X"])
+            code = f"{depts[dept_idx]} {number}"
+            if code not in used:
+                used.add(code)
+                course_codes.append(code)
+                break
+
+    # Zipf-like popularity so a few intro courses carry many sections
+    course_weights = 1.0 / np.arange(1, n_courses + 1) ** 0.8
+    rng.shuffle(course_weights)
+    course_weights /= course_weights.sum()
+
+    # Each course is taught by a pool of instructors, preferably from its own department. Popular
+    # courses need enough instructors that their many sections per term rarely share one
+    # (the real data averages ~5.7 instructors per course, up to several hundred).
+    groups_per_term = np.mean(list(REAL_TERM_ROWS.values())) * scale * GROUP_SINGLE_SECTION_RATE
+    by_dept = [np.flatnonzero(instructor_dept == d) for d in range(n_depts)]
+    pools = []
+    for dept_idx, weight in zip(course_dept, course_weights):
+        size = 1 + rng.poisson(2) + int(np.ceil(1.5 * weight * groups_per_term))
+        local = by_dept[dept_idx]
+        source = local if len(local) >= size and rng.random() < 0.9 else np.arange(n_instructors)
+        pools.append(rng.choice(source, size=min(size, len(source)), replace=False))
+
+    duplicated = rng.choice(n_instructors, size=int(n_instructors * DUPLICATE_NAME_RATE), replace=False)
+    variants = {int(i): _duplicate_variant(instructors[i], rng) for i in duplicated}
+
+    return {
+        "courses": np.array(course_codes),
+        "course_weights": course_weights,
+        "pools": pools,
+        "instructors": instructors,
+        "variants": variants,
+    }
+
+
+def generate_term(term: int, rows: int, catalog: dict, rng: np.random.Generator) -> pd.DataFrame:
+    """Generate one semester's rows."""
+    courses = catalog["courses"]
+    instructors = catalog["instructors"]
+
+    # Sections are grouped per (course, instructor); most groups have a single section
+    group_sizes = []
+    total = 0
+    while total < rows:
+        size = int(min(rng.geometric(GROUP_SINGLE_SECTION_RATE), rows - total))
+        group_sizes.append(size)
+        total += size
+    group_sizes = np.array(group_sizes)
+    n_groups = len(group_sizes)
+
+    group_course = rng.choice(len(courses), size=n_groups, p=catalog["course_weights"])
+    # Within a term, a course's groups go to distinct instructors of its pool while the pool lasts
+    group_instructor = np.empty(n_groups, dtype=int)
+    order = np.argsort(group_course, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(group_course[order]) != 0])
+    for start, end in zip(starts, np.r_[starts[1:], n_groups]):
+        pool = rng.permutation(catalog["pools"][group_course[order[start]]])
+        group_instructor[order[start:end]] = pool[np.arange(end - start) % len(pool)]
+
+    course_idx = np.repeat(group_course, group_sizes)
+    instructor_idx = np.repeat(group_instructor, group_sizes)
+    section_no = np.concatenate([np.arange(size) for size in group_sizes])
+    section_letters = np.array(list("ABCDEFGHJKLMNPQRSTUVWXYZ"))
+    sections = np.where(
+        section_no < len(section_letters),
+        section_letters[np.minimum(section_no, len(section_letters) - 1)],
+        np.char.add("S", section_no.astype(str)),
+    )
+
+    # Enrollment: ~45% individual/small sections (1-5), the rest lognormal around 25
+    small = rng.random(rows) < 0.45
+    enrollment = np.where(
+        small,
+        rng.integers(1, 6, rows),
+        np.clip(np.round(rng.lognormal(np.log(25), 0.9, rows)), 1, 978),
+    ).astype(float)
+
+    pass_fail = rng.random(rows) < PASS_FAIL_RATE
+    percents = np.where(
+        pass_fail[:, None],
+        rng.dirichlet(PASS_FAIL_ALPHA, rows),
+        rng.dirichlet(GRADE_ALPHA, rows),
+    ) * 100
+    percents = np.round(percents, 1)
+    headcounts = np.round(percents * enrollment[:, None] / 100)
+
+    letter = headcounts[:, :5]
+    letter_total = letter.sum(axis=1)
+    gpa = np.divide(letter @ np.array([4.0, 3.0, 2.0, 1.0, 0.0]), letter_total,
+                    out=np.zeros(rows), where=letter_total > 0)
+    average = np.where(letter_total > 0, np.char.mod("%.2f", gpa), "Null")
+
+    names = instructors[instructor_idx].astype(object)
+    use_variant = rng.random(rows) < DUPLICATE_ROW_RATE
+    for i in np.flatnonzero(use_variant & np.isin(instructor_idx, list(catalog["variants"]))):
+        names[i] = catalog["variants"][instructor_idx[i]]
+
+    df = pd.DataFrame({
+        "Term": term,
+        "Course": courses[course_idx],
+        "Instructor": names,
+        "Section": sections,
+        "Enrollment": enrollment,
+        "Average": average,
+    })
+    for i, grade in enumerate(GRADES):
+        df[grade] = percents[:, i]
+    for i, grade in enumerate(GRADES):
+        df[f"hc_{grade}"] = headcounts[:, i]
+    return df.sort_values(["Course", "Instructor", "Section"], kind="stable")[COLUMNS]
+
+
+def term_file_name(term: int) -> str:
+    """GRADE_DATA file naming, e.g. 202502 -> Spring2025.csv."""
+    return term_to_name(term).replace(" ", "") + ".csv"
+
+
+def generate_grade_data(output_dir: str, scale: float = 1.0, seed: int = 0, terms: list = None) -> dict:
+    """
+    Write synthetic semester CSVs into `output_dir` and return {file_path: row_count}.
+
+    `terms` limits generation to a subset of the real term codes (default: all of them).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    catalog = build_catalog(scale, seed)
+    written = {}
+    for term in sorted(terms or REAL_TERM_ROWS):
+        rows = max(1, round(REAL_TERM_ROWS[term] * scale))
+        # Seed per term so a subset of terms reproduces the same files as a full run
+        df = generate_term(term, rows, catalog, np.random.default_rng([seed, term]))
+        path = os.path.join(output_dir, term_file_name(term))
+        df.to_csv(path, index=False)
+        written[path] = len(df)
+    return written
@@ -19,11 +19,12 @@ import glob
 import numpy as np
 import re
 from pathlib import Path
+from src.generation.names import flip_last_first_names
 
 def clean_instructor_name(name):
     """
     Convert instructor name from "Last, First" to "First Last" format.
-    Handles cases with or without quotes.
+    Handles cases with or without quotes. For whole columns use flip_last_first_names().
     """
     if pd.isna(name) or name == '':
         return name
@@ -104,9 +105,9 @@ def process_csv_file(file_path):
         
         # Clean instructor names - directly modify the existing Instructor column
         if 'Instructor' in df.columns:
-            df['Instructor'] = df['Instructor'].apply(clean_instructor_name)
+            df['Instructor'] = flip_last_first_names(df['Instructor'])
         elif 'instructor' in df.columns:
-            df['Instructor'] = df['instructor'].apply(clean_instructor_name)
+            df['Instructor'] = flip_last_first_names(df['instructor'])
             df.drop(columns=['instructor'], inplace=True, errors='ignore')
         
         # Convert Enrollment to numeric if needed
@@ -1,17 +1,33 @@
-from sqlalchemy import Column, ForeignKeyConstraint, Integer, PrimaryKeyConstraint, SmallInteger, ForeignKey, VARCHAR, JSON, Float, Table, create_engine, and_
+from sqlalchemy import Column, ForeignKeyConstraint, Integer, PrimaryKeyConstraint, SmallInteger, ForeignKey, VARCHAR, JSON, Float, Table, Text, Index, create_engine, and_, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, validates
 from mapping.mappings import term_to_name
+from src.coordination.coordination import configure_sqlite
+from src.generation.names import canonical_name, canonical_names
 
 """
 This file establishes the ORM for SqlAlchemy.
 
 Has definitions for Libeds, Distributions, Class Distributions, Professors, and Department Distributions.
+
+Relationships all load lazily. A query that walks one picks its loader per query, e.g.
+session.query(ClassDistribution).options(selectinload(ClassDistribution.dists).selectinload(Distribution.term_dists)).
+Read-only batch jobs use the row-returning queries in db/Reads.py instead.
 """
 
 
 Base = declarative_base()
 
+# SQL form of class_code_for(), for backfills and lookups done in the database
+CLASS_CODE_SQL = "UPPER(REPLACE(dept_abbr || course_num, ' ', ''))"
+
+
+def class_code_for(dept_abbr, course_num):
+    """Normalized class code: "cs", "1332" and "CS 1332" all give "CS1332"; None when either part is missing."""
+    if dept_abbr is None or course_num is None:
+        return None
+    return f"{dept_abbr}{course_num}".replace(" ", "").upper()
+
 libedAssociationTable = Table(
     "libedAssociationTable",
     Base.metadata,
@@ -23,7 +39,7 @@ class Libed(Base):
     __tablename__ = "libed"
     id = Column(Integer,primary_key=True)
     name = Column(VARCHAR(128),nullable=False,unique=True)
-    class_dists = relationship('ClassDistribution',secondary=libedAssociationTable,back_populates="libeds",lazy='selectin')
+    class_dists = relationship('ClassDistribution',secondary=libedAssociationTable,back_populates="libeds")
     def __str__(self) -> str:
         retVal = f"Libed: {self.name}"
         for class_dist in self.class_dists:
@@ -41,6 +57,12 @@ class TermDistribution(Base):
     term = Column(Integer,nullable=False)
     grades = Column(JSON,nullable=False)
 
+    __table_args__ = (
+        # Distribution pages join termdistribution on dist_id; term purges filter on term
+        Index("ix_termdistribution_dist_id_term", "dist_id", "term"),
+        Index("ix_termdistribution_term", "term"),
+    )
+
     def __str__(self) -> str:
         return f"{self.classdist.dept_abbr} {self.classdist.course_num} taught by {self.dist.prof.name} in {term_to_name(self.term)} for {self.students} students with a grade distribution of {self.grades}"
     def __repr__(self) -> str:
@@ -55,6 +77,11 @@ class Distribution(Base):
     # There are ocassionally classes that do not have a professor listed, hence why this is nullable
     # It will be displayed as unlisted professor in class distributions.
     term_dists = relationship('TermDistribution',backref="dist")
+
+    __table_args__ = (
+        Index("ix_distribution_class_id_instructor_id", "class_id", "instructor_id"),
+        Index("ix_distribution_instructor_id", "instructor_id"),
+    )
     def __str__(self) -> str:
         return f"{self.classdist.dept_abbr} {self.classdist.course_num} taught by {self.prof.name} over {len(self.term_dists)} terms."
     def __repr__(self) -> str:
@@ -69,9 +96,25 @@ class Professor(Base):
     RMP_diff = Column(Float,nullable=True)
     RMP_would_take_again = Column(Float,nullable=True)
     RMP_link = Column(VARCHAR(512),nullable=True)
+    # canonical_name(name), kept in sync on every name assignment; duplicate grouping and name lookups use its index
+    canonical_name = Column(VARCHAR(255),nullable=True)
 
     dists = relationship('Distribution',backref="prof")
 
+    __table_args__ = (
+        Index("ix_professor_canonical_name", "canonical_name"),
+    )
+
+    @validates("name")
+    def _set_canonical_name(self, key, name):
+        self.canonical_name = canonical_name(name)
+        return name
+
+    @classmethod
+    def by_name(cls, name: str):
+        """Filter clause for the professor named exactly `name`, narrowed through the canonical-name index."""
+        return and_(cls.canonical_name == canonical_name(name), cls.name == name)
+
     def __repr__(self) -> str:
         retVal = f"{self.name} has a RMP of {self.RMP_score} and has the following distributions\n"
         for dist in self.dists:
@@ -86,18 +129,28 @@ class ClassDistribution(Base):
     campus = Column(VARCHAR(8),nullable=True)
     dept_abbr = Column(VARCHAR(4),nullable=True)
     course_num = Column(VARCHAR(8),nullable=True)
+    # class_code_for(dept_abbr, course_num), e.g. "CS1332", kept in sync on every assignment; class lookups use its unique index
+    class_code = Column(VARCHAR(16),nullable=True)
 
     class_desc = Column(VARCHAR(255),nullable=False)
     total_students = Column(Integer,nullable=False)
     total_grades = Column(JSON,nullable=False)
 
     dists = relationship('Distribution',backref="classdist")
-    libeds = relationship('Libed',secondary=libedAssociationTable,back_populates="class_dists",lazy='selectin')
+    libeds = relationship('Libed',secondary=libedAssociationTable,back_populates="class_dists")
 
     __table_args__ = (
         ForeignKeyConstraint(['campus','dept_abbr'], ['departmentdistribution.campus','departmentdistribution.dept_abbr']),
+        Index("ix_classdistribution_dept_abbr_course_num", "dept_abbr", "course_num"),
+        Index("ix_classdistribution_class_code", "class_code", unique=True),
     )
 
+    @validates("dept_abbr", "course_num")
+    def _set_class_code(self, key, value):
+        parts = {"dept_abbr": self.dept_abbr, "course_num": self.course_num, key: value}
+        self.class_code = class_code_for(parts["dept_abbr"], parts["course_num"])
+        return value
+
     def __str__(self) -> str:
         return f"{self.dept_abbr} {self.course_num}: {self.total_grades}"
 
@@ -113,7 +166,7 @@ class DepartmentDistribution(Base):
     dept_abbr = Column(VARCHAR(4),nullable=False, unique=True)
     
     dept_name = Column(VARCHAR(255),nullable=False)
-    class_dists = relationship('ClassDistribution',backref="dept",lazy="selectin")
+    class_dists = relationship('ClassDistribution',backref="dept")
 
     __table_args__ = (
         PrimaryKeyConstraint('campus','dept_abbr'),
@@ -159,10 +212,263 @@ class InstructorSummary(Base):
         return f"InstructorSummary(instructor_id={self.instructor_id}, avg_gpa={self.average_gpa}, most_grade={self.most_grade}, most_percent={self.most_percent})"
 
 
-engine = create_engine("sqlite:///./ProcessedData.db",echo=False,future=True)
+class ClassInstructorRollup(Base):
+    __tablename__ = "class_instructor_rollup"
+    # One row per distribution, i.e. per (class, instructor): a class page reads these instead of every term row
+    dist_id = Column(Integer, primary_key=True, nullable=False)
+    class_id = Column(Integer, nullable=False)
+    instructor_id = Column(Integer, nullable=True)
+    total_students = Column(Integer, nullable=False)
+    # Grade counts summed over every term
+    grades = Column(JSON, nullable=False)
+    average_gpa = Column(Float, nullable=True)
+    # [[term, students, grades], ...] in term order
+    terms = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index("ix_class_instructor_rollup_class_id", "class_id", "instructor_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"ClassInstructorRollup(class_id={self.class_id}, instructor_id={self.instructor_id}, students={self.total_students}, avg_gpa={self.average_gpa}, terms={len(self.terms)})"
+
+
+class ClassRanking(Base):
+    __tablename__ = "class_ranking"
+    class_id = Column(Integer, primary_key=True, nullable=False)
+    dept_abbr = Column(VARCHAR(4), nullable=False)
+    # Course level is the thousands bucket of the course number (e.g. CS 3510 -> 3000)
+    course_level = Column(Integer, nullable=False)
+    total_students = Column(Integer, nullable=False)
+    average_gpa = Column(Float, nullable=False)
+    dept_rank = Column(Integer, nullable=False)
+    dept_percentile = Column(Float, nullable=False)
+    level_rank = Column(Integer, nullable=False)
+    level_percentile = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_class_ranking_dept_rank", "dept_abbr", "dept_rank"),
+        Index("ix_class_ranking_level_rank", "dept_abbr", "course_level", "level_rank"),
+    )
+
+    def __repr__(self) -> str:
+        return f"ClassRanking(class_id={self.class_id}, dept_abbr={self.dept_abbr}, course_level={self.course_level}, avg_gpa={self.average_gpa}, dept_rank={self.dept_rank}, level_rank={self.level_rank})"
+
+
+class InstructorRanking(Base):
+    __tablename__ = "instructor_ranking"
+    # Ranks an instructor within a single class by average GPA (class_rank, 1 = highest) and gives the
+    # percentile of that GPA among the class's instructors (class_percentile); dept_abbr is the class's department
+    class_id = Column(Integer, primary_key=True, nullable=False)
+    instructor_id = Column(Integer, primary_key=True, nullable=False)
+    dept_abbr = Column(VARCHAR(4), nullable=False)
+    total_students = Column(Integer, nullable=False)
+    average_gpa = Column(Float, nullable=False)
+    class_rank = Column(Integer, nullable=False)
+    class_percentile = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_instructor_ranking_class_rank", "class_id", "class_rank"),
+    )
+
+    def __repr__(self) -> str:
+        return f"InstructorRanking(class_id={self.class_id}, instructor_id={self.instructor_id}, avg_gpa={self.average_gpa}, class_rank={self.class_rank})"
+
+
+class Leaderboard(Base):
+    __tablename__ = "leaderboard"
+    # scope is one of 'dept', 'level' or 'class'; scope_key is e.g. 'CS', 'CS 3000' or a class id
+    scope = Column(VARCHAR(8), primary_key=True, nullable=False)
+    scope_key = Column(VARCHAR(16), primary_key=True, nullable=False)
+    rank = Column(Integer, primary_key=True, nullable=False)
+    entity_id = Column(Integer, primary_key=True, nullable=False)
+    average_gpa = Column(Float, nullable=False)
+    total_students = Column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"Leaderboard(scope={self.scope}, scope_key={self.scope_key}, rank={self.rank}, entity_id={self.entity_id}, avg_gpa={self.average_gpa})"
+
+
+class CourseCatalog(Base):
+    __tablename__ = "course_catalog"
+    # One row per class code from the highest ranked COURSE_INFO file listing it, see src/catalog/catalog.py
+    class_code = Column(VARCHAR(16), primary_key=True, nullable=False)
+    course_id = Column(VARCHAR(16), nullable=False)
+    subject_code = Column(VARCHAR(8), nullable=True)
+    course_number = Column(VARCHAR(8), nullable=True)
+    title = Column(VARCHAR(255), nullable=True)
+    description = Column(Text, nullable=True)
+    credit_hours = Column(VARCHAR(16), nullable=True)
+    # As in cumulative.json: requisites are a string or a list, restrictions a list of lines
+    prerequisites = Column(JSON, nullable=True)
+    corequisites = Column(JSON, nullable=True)
+    restrictions = Column(JSON, nullable=True)
+    # Term the requisites come from, None for catalog-only courses
+    term = Column(VARCHAR(6), nullable=True)
+    last_updated = Column(VARCHAR(32), nullable=True)
+    # File the row came from (relative to COURSE_INFO) and its rank: catalog 1, term 2, cumulative 3
+    source = Column(VARCHAR(64), nullable=False)
+    source_rank = Column(SmallInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_course_catalog_source", "source"),
+    )
+
+    def __repr__(self) -> str:
+        return f"CourseCatalog(class_code={self.class_code}, title={self.title}, term={self.term}, source={self.source})"
+
+
+class CatalogSource(Base):
+    __tablename__ = "catalog_source"
+    # Ingest state of each COURSE_INFO file, so unchanged files are skipped
+    path = Column(VARCHAR(64), primary_key=True, nullable=False)
+    kind = Column(VARCHAR(16), nullable=False)
+    size = Column(Integer, nullable=False)
+    mtime_ns = Column(Integer, nullable=False)
+    sha256 = Column(VARCHAR(64), nullable=False)
+    scraped_at = Column(VARCHAR(32), nullable=True)
+    courses = Column(Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"CatalogSource(path={self.path}, scraped_at={self.scraped_at}, courses={self.courses})"
+
+
+class CatalogMismatch(Base):
+    __tablename__ = "catalog_mismatch"
+    # Class codes on which course_catalog and the grade data disagree, see src/catalog/mismatches.py
+    class_code = Column(VARCHAR(16), primary_key=True, nullable=False)
+    # One of MISMATCH_REASONS in src/catalog/mismatches.py
+    reason = Column(VARCHAR(24), primary_key=True, nullable=False)
+
+    __table_args__ = (
+        Index("ix_catalog_mismatch_reason", "reason", "class_code"),
+    )
+
+    def __repr__(self) -> str:
+        return f"CatalogMismatch(class_code={self.class_code}, reason={self.reason})"
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    # One row per committed pipeline write, with the keys it touched, see src/publish/changes.py.
+    # AUTOINCREMENT keeps versions increasing even when the newest rows are pruned.
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(VARCHAR(32), nullable=False)
+    # Write path that recorded it: ingest, professors, purge, catalog, summaries, rmp, duplicates, ...
+    source = Column(VARCHAR(16), nullable=False)
+    # Sorted JSON lists of the class codes, professor ids and department codes that changed
+    class_codes = Column(JSON, nullable=False)
+    professor_ids = Column(JSON, nullable=False)
+    dept_abbrs = Column(JSON, nullable=False)
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    def __repr__(self) -> str:
+        return f"ChangeLog(version={self.version}, source={self.source}, created_at={self.created_at})"
+
+
+def add_missing_columns(bind) -> None:
+    """create_all() only adds columns along with new tables; add nullable columns declared after a database was built."""
+    with bind.begin() as conn:
+        # Inspect through the same connection: a second one would wait on this transaction's write lock
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}'))
+
+
+def backfill_canonical_names(bind) -> int:
+    """Fill professor.canonical_name for rows written before the column existed."""
+    with bind.begin() as conn:
+        if not inspect(conn).has_table("professor"):
+            return 0
+        missing = conn.execute(text("SELECT id, name FROM professor WHERE canonical_name IS NULL")).all()
+        if not missing:
+            return 0
+        # Only a database from before the column needs pandas; the usual startup skips it
+        import pandas as pd
+
+        rows = pd.DataFrame(missing, columns=["id", "name"])
+        rows["canonical_name"] = canonical_names(rows["name"])
+        conn.execute(text("UPDATE professor SET canonical_name = :canonical_name WHERE id = :id"),
+                     rows[["id", "canonical_name"]].to_dict("records"))
+    print(f"[DB] Backfilled canonical names for {len(rows)} professors")
+    return len(rows)
+
+
+def backfill_class_codes(bind) -> int:
+    """
+    Fill classdistribution.class_code for rows written before the column existed. Fails before
+    anything is written when two classes normalize to the same code, which the unique index rejects.
+    """
+    with bind.begin() as conn:
+        if not inspect(conn).has_table("classdistribution"):
+            return 0
+        duplicates = conn.execute(text(f"""
+            SELECT {CLASS_CODE_SQL} AS code, COUNT(*) FROM classdistribution
+            WHERE dept_abbr IS NOT NULL AND course_num IS NOT NULL
+            GROUP BY code HAVING COUNT(*) > 1 LIMIT 10
+        """)).all()
+        if duplicates:
+            raise ValueError("Classes share a class code, merge them before migrating: "
+                             + ", ".join(f"{code} ({count} rows)" for code, count in duplicates))
+        filled = conn.execute(text(f"UPDATE classdistribution SET class_code = {CLASS_CODE_SQL} WHERE class_code IS NULL "
+                                   "AND dept_abbr IS NOT NULL AND course_num IS NOT NULL")).rowcount
+    if filled:
+        print(f"[DB] Backfilled class codes for {filled} classes")
+    return filled
+
+
+def create_missing_indexes(bind) -> None:
+    """
+    Bring an existing database up to the declared schema: add new nullable columns, backfill
+    derived ones, then create indexes declared after the database was built.
+    """
+    add_missing_columns(bind)
+    backfill_canonical_names(bind)
+    backfill_class_codes(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+
+DEFAULT_DATABASE_URL = "sqlite:///./ProcessedData.db"
+_engines = {}
+
+
+def get_engine(url: str = DEFAULT_DATABASE_URL):
+    """The configured engine for `url`, created on first use and shared afterwards."""
+    engine = _engines.get(url)
+    if engine is None:
+        engine = _engines[url] = configure_sqlite(create_engine(url, echo=False, future=True))
+    return engine
+
+
+class SessionFactory(sessionmaker):
+    """sessionmaker that binds to the default database the first time a session is made, not at import."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+# Every `from db.Models import Session` shares this factory; point it elsewhere with bind_session()
+Session = SessionFactory(autoflush=False)
+
+
+def bind_session(url: str = DEFAULT_DATABASE_URL):
+    """Bind Session to the database at `url` and return its engine."""
+    engine = get_engine(url)
+    Session.configure(bind=engine)
+    return engine
+
 
 if __name__ == "__main__":
+    engine = get_engine()
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
-
-Session = sessionmaker(bind=engine, autoflush=False)
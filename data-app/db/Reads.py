@@ -0,0 +1,135 @@
+"""
+Core read paths for batch jobs: summaries, exports and statistics.
+
+Each function runs one SELECT and returns plain rows (named tuples with attribute access), so
+walking every term distribution does not build, identity-map and lazy-load an ORM object per row.
+The ORM models stay the way to write; use these wherever a job only reads.
+"""
+from sqlalchemy import and_, case, func, select, true
+
+from db.Models import ClassDistribution, DepartmentDistribution, Distribution, Professor, TermDistribution
+
+
+def _in(column, values):
+    """Filter on `column` IN `values`, or no filter when `values` is None."""
+    return true() if values is None else column.in_(values)
+
+
+def class_rows(session, class_ids=None) -> list:
+    """(id, total_grades) of every class, or of `class_ids`, by id."""
+    return session.execute(
+        select(ClassDistribution.id, ClassDistribution.total_grades)
+        .where(_in(ClassDistribution.id, class_ids))
+        .order_by(ClassDistribution.id)
+    ).all()
+
+
+def department_abbrs(session, dept_abbrs=None) -> list:
+    """Abbreviation of every department, or of those in `dept_abbrs` that exist."""
+    return session.execute(
+        select(DepartmentDistribution.dept_abbr).where(_in(DepartmentDistribution.dept_abbr, dept_abbrs))
+        .order_by(DepartmentDistribution.dept_abbr)
+    ).scalars().all()
+
+
+def department_class_rows(session, dept_abbrs=None) -> list:
+    """
+    (dept_abbr, class_id, total_grades) of the classes of every department, or of `dept_abbrs`,
+    matched on campus and abbreviation like DepartmentDistribution.class_dists.
+    """
+    return session.execute(
+        select(DepartmentDistribution.dept_abbr, ClassDistribution.id, ClassDistribution.total_grades)
+        .join(ClassDistribution, and_(ClassDistribution.campus == DepartmentDistribution.campus,
+                                      ClassDistribution.dept_abbr == DepartmentDistribution.dept_abbr))
+        .where(_in(DepartmentDistribution.dept_abbr, dept_abbrs))
+        .order_by(DepartmentDistribution.dept_abbr, ClassDistribution.course_num, ClassDistribution.id)
+    ).all()
+
+
+def term_grades_by_class(session, class_ids=None, dept_abbrs=None) -> dict:
+    """
+    {class_id: [grades of each term distribution]} for every class, the classes in `class_ids`,
+    or the classes of `dept_abbrs`; rows come in the order the ORM relationships load them.
+    """
+    query = (select(Distribution.class_id, TermDistribution.grades)
+             .join(TermDistribution, TermDistribution.dist_id == Distribution.id)
+             .where(_in(Distribution.class_id, class_ids))
+             .order_by(Distribution.class_id, Distribution.instructor_id, Distribution.id,
+                       TermDistribution.term, TermDistribution.id))
+    if dept_abbrs is not None:
+        query = query.join(ClassDistribution, ClassDistribution.id == Distribution.class_id) \
+                     .where(ClassDistribution.dept_abbr.in_(dept_abbrs))
+    return _group(session.execute(query))
+
+
+def term_rows_by_distribution(session, class_ids=None) -> list:
+    """
+    (dist_id, class_id, instructor_id, term, students, grades) of every term distribution, or of
+    those of `class_ids`, grouped by distribution and in term order within each.
+    """
+    return session.execute(
+        select(Distribution.id, Distribution.class_id, Distribution.instructor_id,
+               TermDistribution.term, TermDistribution.students, TermDistribution.grades)
+        .join(TermDistribution, TermDistribution.dist_id == Distribution.id)
+        .where(_in(Distribution.class_id, class_ids))
+        .order_by(Distribution.class_id, Distribution.instructor_id, Distribution.id,
+                  TermDistribution.term, TermDistribution.id)
+    ).all()
+
+
+def term_grades_by_instructor(session, instructor_ids=None) -> dict:
+    """{instructor_id: [grades of each term distribution]} for every instructor or `instructor_ids`."""
+    query = (select(Distribution.instructor_id, TermDistribution.grades)
+             .join(TermDistribution, TermDistribution.dist_id == Distribution.id)
+             .where(Distribution.instructor_id.isnot(None), _in(Distribution.instructor_id, instructor_ids))
+             .order_by(Distribution.instructor_id, Distribution.id, TermDistribution.term, TermDistribution.id))
+    return _group(session.execute(query))
+
+
+def _group(rows) -> dict:
+    grouped = {}
+    for key, grades in rows:
+        grouped.setdefault(key, []).append(grades)
+    return grouped
+
+
+def professor_rows(session, instructor_ids=None) -> list:
+    """(id, name) of every professor, or of `instructor_ids`, by id."""
+    return session.execute(
+        select(Professor.id, Professor.name).where(_in(Professor.id, instructor_ids)).order_by(Professor.id)
+    ).all()
+
+
+def unmatched_professor_names(session) -> list:
+    """Names of the professors without an RMP link, alphabetically."""
+    return session.execute(
+        select(Professor.name).where(Professor.RMP_link.is_(None)).order_by(Professor.name)
+    ).scalars().all()
+
+
+def rmp_coverage(session):
+    """
+    One row of professor counts: total, with_score, with_link, valid_scores (0-5), zero_scores,
+    link_without_score, invalid_scores and invalid_take_again.
+    """
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    return session.execute(select(
+        func.count(Professor.id).label("total"),
+        count_if(Professor.RMP_score.isnot(None)).label("with_score"),
+        count_if(Professor.RMP_link.isnot(None)).label("with_link"),
+        count_if(Professor.RMP_score.between(0, 5)).label("valid_scores"),
+        count_if(Professor.RMP_score == 0.0).label("zero_scores"),
+        count_if(and_(Professor.RMP_link.isnot(None), Professor.RMP_score.is_(None))).label("link_without_score"),
+        count_if(and_(Professor.RMP_score.isnot(None), ~Professor.RMP_score.between(0, 5))).label("invalid_scores"),
+        count_if(Professor.RMP_would_take_again < -1).label("invalid_take_again"),
+    )).one()
+
+
+def top_rated_professors(session, limit: int = 3) -> list:
+    """(name, RMP_score) of the `limit` best-rated professors."""
+    return session.execute(
+        select(Professor.name, Professor.RMP_score).where(Professor.RMP_score.isnot(None))
+        .order_by(Professor.RMP_score.desc()).limit(limit)
+    ).all()
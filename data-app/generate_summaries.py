@@ -4,17 +4,39 @@ Generate summary tables for departments, classes, and instructors.
 
 This script calculates averageGPA, mostStudents (most common grade), and mostStudentsPercent
 using the same logic as the frontend's calculateAggregateStats function.
-These precomputed summaries will be joined in FTS search queries for instant tag rendering.
+These precomputed summaries are copied into the FTS search documents for instant tag rendering.
+
+Each class's per-instructor totals and term lists go into class_instructor_rollup, so a class
+page is one indexed read instead of summing every term distribution per request.
+
+It also materializes ranking and leaderboard tables (easiest classes per department and
+course level, highest-GPA instructors per class) so "top k" questions are indexed reads.
+
+The classes, instructors and departments whose summaries actually changed are appended to the
+change feed (src/publish/changes.py).
 """
 
+import argparse
 import json
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+import sys
+from itertools import groupby
+from operator import itemgetter
+from sqlalchemy import bindparam, insert, text
+from db.Reads import (
+    class_rows, department_abbrs, department_class_rows, professor_rows, term_grades_by_class, term_grades_by_instructor,
+    term_rows_by_distribution,
+)
 from db.Models import (
-    Base, ClassDistribution, Professor, DepartmentDistribution, 
-    DepartmentSummary, ClassSummary, InstructorSummary,
-    Distribution, TermDistribution
+    Base, DepartmentSummary, ClassSummary, InstructorSummary, ClassInstructorRollup,
+    ClassRanking, InstructorRanking, Leaderboard,
+    Session, create_missing_indexes, get_engine
 )
+from src.metrics import metrics, configure_logging, add_metrics_arguments, add_profile_arguments, start_profiling, finish_profiling
+from src.maintenance.maintenance import run_maintenance, add_maintenance_arguments
+from src.coordination.coordination import stage_lock
+from src.generation.term_index import parse_term_range
+from src.search.fts import FTS_TABLES, create_fts_table, outdated_fts_tables, rebuild_fts_table, sync_fts
+from src.publish.changes import record_changes
 
 
 # GPA mapping for GT letter grades (matches frontend/lib/db/utils.js)
@@ -26,6 +48,97 @@ GPA_MAP = {
     'F': 0.0,
 }
 
+# Minimum enrollment (summed over all terms) for a class or instructor to be ranked
+DEFAULT_MIN_CLASS_STUDENTS = 30
+DEFAULT_MIN_INSTRUCTOR_STUDENTS = 15
+# Number of entries kept per leaderboard scope
+DEFAULT_TOP_N = 10
+
+# Per-row GPA aggregates over termdistribution.grades, shared by the ranking queries
+GRADE_SUMS_SQL = """
+    SUM(t.students) AS total_students,
+    SUM(COALESCE(json_extract(t.grades, '$.A'), 0)) AS a,
+    SUM(COALESCE(json_extract(t.grades, '$.B'), 0)) AS b,
+    SUM(COALESCE(json_extract(t.grades, '$.C'), 0)) AS c,
+    SUM(COALESCE(json_extract(t.grades, '$.D'), 0)) AS d,
+    SUM(COALESCE(json_extract(t.grades, '$.F'), 0)) AS f
+"""
+
+AVERAGE_GPA_SQL = "ROUND((4.0 * a + 3.0 * b + 2.0 * c + 1.0 * d) / (a + b + c + d + f), 2)"
+
+# Summary tables compared before and after a run for the change feed: (record_changes argument, key
+# column, compared columns). Rollups leave out dist_id, which a term rebuild renumbers without changing a page.
+SUMMARY_CHANGE_KEYS = {
+    "class_summary": ("class_ids", "class_id", "*"),
+    "class_instructor_rollup": ("class_ids", "class_id", "class_id, instructor_id, total_students, grades, average_gpa, terms"),
+    "instructor_summary": ("professor_ids", "instructor_id", "*"),
+    "department_summary": ("dept_abbrs", "dept_abbr", "*"),
+}
+
+
+def execute_scoped(session, sql, params):
+    """Execute `sql`, binding list-valued parameters as expanding IN (...) lists."""
+    statement = text(sql)
+    expanding = [bindparam(name, expanding=True) for name, value in params.items() if isinstance(value, list)]
+    if expanding:
+        statement = statement.bindparams(*expanding)
+    return session.execute(statement, params)
+
+
+def changed_rows(session):
+    """Rows written by the last statement; the driver reports rowcount -1 for INSERTs that start with WITH."""
+    return session.execute(text("SELECT changes()")).scalar()
+
+
+def terms_in_range(session, first=None, last=None):
+    """Term codes present in termdistribution between `first` and `last` (None is open)."""
+    return [row[0] for row in session.execute(text("""
+        SELECT DISTINCT term FROM termdistribution
+        WHERE (:first IS NULL OR term >= :first) AND (:last IS NULL OR term <= :last)
+    """), {"first": first, "last": last})]
+
+
+def resolve_scope(session, terms=None, class_ids=(), instructor_ids=()):
+    """
+    Classes, instructors and departments whose summaries depend on `terms`, plus the given ids.
+
+    Used to re-summarize only what a term rebuild touched; pass the ids returned by the term purge
+    so entities that lost all their rows in those terms are refreshed too.
+    """
+    class_ids, instructor_ids = set(class_ids), set(instructor_ids)
+    if terms:
+        rows = execute_scoped(session, """
+            SELECT DISTINCT d.class_id, d.instructor_id FROM termdistribution t JOIN distribution d ON d.id = t.dist_id
+            WHERE t.term IN :terms
+        """, {"terms": list(terms)})
+        for class_id, instructor_id in rows:
+            class_ids.add(class_id)
+            if instructor_id is not None:
+                instructor_ids.add(instructor_id)
+    dept_abbrs = [row[0] for row in execute_scoped(session, """
+        SELECT DISTINCT dept_abbr FROM classdistribution WHERE id IN :class_ids AND dept_abbr IS NOT NULL
+    """, {"class_ids": sorted(class_ids)})]
+    return {"class_ids": sorted(class_ids), "instructor_ids": sorted(instructor_ids), "dept_abbrs": sorted(dept_abbrs)}
+
+
+def snapshot_summaries(session):
+    """Copy the summary tables into temp tables, so changed_summary_keys() can tell what this run changed."""
+    for table in SUMMARY_CHANGE_KEYS:
+        session.execute(text(f"DROP TABLE IF EXISTS temp.before_{table}"))
+        session.execute(text(f"CREATE TEMP TABLE before_{table} AS SELECT * FROM {table}"))
+
+
+def changed_summary_keys(session):
+    """Keys of the summary rows added, removed or rewritten with other values since snapshot_summaries()."""
+    keys = {"class_ids": set(), "professor_ids": set(), "dept_abbrs": set()}
+    for table, (argument, column, compared) in SUMMARY_CHANGE_KEYS.items():
+        keys[argument].update(row[0] for row in session.execute(text(f"""
+            SELECT {column} FROM (SELECT {compared} FROM {table} EXCEPT SELECT {compared} FROM temp.before_{table})
+            UNION SELECT {column} FROM (SELECT {compared} FROM temp.before_{table} EXCEPT SELECT {compared} FROM {table})
+        """)))
+        session.execute(text(f"DROP TABLE temp.before_{table}"))
+    return keys
+
 
 def calculate_aggregate_stats(all_grades):
     """
@@ -82,186 +195,390 @@ def calculate_aggregate_stats(all_grades):
     }
 
 
-def generate_class_summaries(session):
-    """Generate summaries for all classes."""
+def load_grades(value):
+    """A grade dict from a JSON column value (decoded, or still a JSON string); None if empty or unreadable."""
+    if not value:
+        return None
+    try:
+        return json.loads(value) if isinstance(value, str) else value
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def summary_row(stats):
+    """Summary table columns for calculate_aggregate_stats() output; zero/empty stats are stored as NULL."""
+    return {
+        "average_gpa": stats['averageGPA'] if stats['averageGPA'] > 0 else None,
+        "most_grade": stats['mostStudents'] if stats['mostStudents'] else None,
+        "most_percent": stats['mostStudentsPercent'] if stats['mostStudentsPercent'] > 0 else None,
+    }
+
+
+def class_grades(total_grades, term_grades):
+    """A class's grade dicts: its running total followed by every term distribution."""
+    all_grades = [load_grades(total_grades)] + [load_grades(grades) for grades in term_grades]
+    return [grades for grades in all_grades if grades is not None]
+
+
+def generate_class_summaries(session, scope=None):
+    """Generate summaries for all classes (or only those in `scope`)."""
     print("Generating class summaries...")
+    class_ids = None if scope is None else scope["class_ids"]
     
     # Clear existing summaries
-    session.query(ClassSummary).delete()
-    
-    # Get all classes with their grade distributions
-    classes = session.query(ClassDistribution).all()
+    summaries_query = session.query(ClassSummary)
+    if scope is not None:
+        summaries_query = summaries_query.filter(ClassSummary.class_id.in_(class_ids))
+    summaries_query.delete(synchronize_session=False)
     
+    # Read the grade columns as plain rows: two queries however many classes and terms there are
+    term_grades = term_grades_by_class(session, class_ids)
     summaries = []
-    for class_dist in classes:
-        # Collect all grade distributions for this class
-        all_grades = []
-        
-        # Add total_grades if it exists
-        if class_dist.total_grades:
-            try:
-                if isinstance(class_dist.total_grades, str):
-                    total_grades = json.loads(class_dist.total_grades)
-                else:
-                    total_grades = class_dist.total_grades
-                all_grades.append(total_grades)
-            except (json.JSONDecodeError, TypeError):
-                pass
-        
-        # Add individual distribution grades
-        for dist in class_dist.dists:
-            for term_dist in dist.term_dists:
-                if term_dist.grades:
-                    try:
-                        if isinstance(term_dist.grades, str):
-                            grades = json.loads(term_dist.grades)
-                        else:
-                            grades = term_dist.grades
-                        all_grades.append(grades)
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-        
-        # Calculate summary
-        stats = calculate_aggregate_stats(all_grades)
-        
-        summary = ClassSummary(
-            class_id=class_dist.id,
-            average_gpa=stats['averageGPA'] if stats['averageGPA'] > 0 else None,
-            most_grade=stats['mostStudents'] if stats['mostStudents'] else None,
-            most_percent=stats['mostStudentsPercent'] if stats['mostStudentsPercent'] > 0 else None
-        )
-        summaries.append(summary)
+    for class_id, total_grades in class_rows(session, class_ids):
+        stats = calculate_aggregate_stats(class_grades(total_grades, term_grades.get(class_id, [])))
+        summaries.append(dict(class_id=class_id, **summary_row(stats)))
     
-    session.add_all(summaries)
+    if summaries:
+        session.execute(insert(ClassSummary), summaries)
+    metrics.incr("summaries.class", len(summaries))
     print(f"Generated {len(summaries)} class summaries")
 
 
-def generate_instructor_summaries(session):
-    """Generate summaries for all instructors."""
+def rollup_row(term_rows):
+    """class_instructor_rollup columns for one distribution's (dist_id, class_id, instructor_id, term, students, grades) rows."""
+    dist_id, class_id, instructor_id = term_rows[0][:3]
+    grades, terms = {}, []
+    for *_, term, students, term_grades in term_rows:
+        term_grades = load_grades(term_grades) or {}
+        for grade, count in term_grades.items():
+            grades[grade] = grades.get(grade, 0) + count
+        terms.append([term, students, term_grades])
+    return dict(dist_id=dist_id, class_id=class_id, instructor_id=instructor_id,
+                total_students=sum(students for _, students, _ in terms), grades=grades,
+                average_gpa=summary_row(calculate_aggregate_stats([grades]))["average_gpa"], terms=terms)
+
+
+def generate_class_instructor_rollups(session, scope=None):
+    """
+    Materialize each class's per-instructor totals and term list (for all classes, or only those
+    in `scope`), so a class page reads one row per instructor instead of summing every term.
+    """
+    print("Generating class instructor rollups...")
+    class_ids = None if scope is None else scope["class_ids"]
+
+    rollups_query = session.query(ClassInstructorRollup)
+    if scope is not None:
+        rollups_query = rollups_query.filter(ClassInstructorRollup.class_id.in_(class_ids))
+    rollups_query.delete(synchronize_session=False)
+
+    rollups = [rollup_row(list(term_rows)) for _, term_rows in
+               groupby(term_rows_by_distribution(session, class_ids), key=itemgetter(0))]
+
+    if rollups:
+        session.execute(insert(ClassInstructorRollup), rollups)
+    metrics.incr("rollups.class_instructor", len(rollups))
+    print(f"Generated {len(rollups)} class instructor rollups")
+
+
+def generate_instructor_summaries(session, scope=None):
+    """Generate summaries for all instructors (or only those in `scope`)."""
     print("Generating instructor summaries...")
+    instructor_ids = None if scope is None else scope["instructor_ids"]
     
     # Clear existing summaries
-    session.query(InstructorSummary).delete()
-    
-    # Get all professors with their distributions
-    professors = session.query(Professor).all()
+    summaries_query = session.query(InstructorSummary)
+    if scope is not None:
+        summaries_query = summaries_query.filter(InstructorSummary.instructor_id.in_(instructor_ids))
+    summaries_query.delete(synchronize_session=False)
     
+    # Every grade distribution taught by each professor
+    term_grades = term_grades_by_instructor(session, instructor_ids)
     summaries = []
-    for prof in professors:
-        # Collect all grade distributions taught by this professor
-        all_grades = []
-        
-        for dist in prof.dists:
-            for term_dist in dist.term_dists:
-                if term_dist.grades:
-                    try:
-                        if isinstance(term_dist.grades, str):
-                            grades = json.loads(term_dist.grades)
-                        else:
-                            grades = term_dist.grades
-                        all_grades.append(grades)
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-        
-        # Calculate summary
-        stats = calculate_aggregate_stats(all_grades)
-        
-        summary = InstructorSummary(
-            instructor_id=prof.id,
-            average_gpa=stats['averageGPA'] if stats['averageGPA'] > 0 else None,
-            most_grade=stats['mostStudents'] if stats['mostStudents'] else None,
-            most_percent=stats['mostStudentsPercent'] if stats['mostStudentsPercent'] > 0 else None
-        )
-        summaries.append(summary)
+    for instructor_id, _ in professor_rows(session, instructor_ids):
+        all_grades = [load_grades(grades) for grades in term_grades.get(instructor_id, [])]
+        stats = calculate_aggregate_stats([grades for grades in all_grades if grades is not None])
+        summaries.append(dict(instructor_id=instructor_id, **summary_row(stats)))
     
-    session.add_all(summaries)
+    if summaries:
+        session.execute(insert(InstructorSummary), summaries)
+    metrics.incr("summaries.instructor", len(summaries))
     print(f"Generated {len(summaries)} instructor summaries")
 
 
-def generate_department_summaries(session):
-    """Generate summaries for all departments."""
+def generate_department_summaries(session, scope=None):
+    """Generate summaries for all departments (or only those in `scope`)."""
     print("Generating department summaries...")
+    dept_abbrs = None if scope is None else scope["dept_abbrs"]
     
     # Clear existing summaries
-    session.query(DepartmentSummary).delete()
+    summaries_query = session.query(DepartmentSummary)
+    if scope is not None:
+        summaries_query = summaries_query.filter(DepartmentSummary.dept_abbr.in_(dept_abbrs))
+    summaries_query.delete(synchronize_session=False)
     
-    # Get all departments with their class distributions
-    departments = session.query(DepartmentDistribution).all()
-    
-    summaries = []
-    for dept in departments:
-        # Collect all grade distributions for classes in this department
-        all_grades = []
-        
-        for class_dist in dept.class_dists:
-            # Add total_grades if it exists
-            if class_dist.total_grades:
-                try:
-                    if isinstance(class_dist.total_grades, str):
-                        total_grades = json.loads(class_dist.total_grades)
-                    else:
-                        total_grades = class_dist.total_grades
-                    all_grades.append(total_grades)
-                except (json.JSONDecodeError, TypeError):
-                    pass
-            
-            # Add individual distribution grades
-            for dist in class_dist.dists:
-                for term_dist in dist.term_dists:
-                    if term_dist.grades:
-                        try:
-                            if isinstance(term_dist.grades, str):
-                                grades = json.loads(term_dist.grades)
-                            else:
-                                grades = term_dist.grades
-                            all_grades.append(grades)
-                        except (json.JSONDecodeError, TypeError):
-                            pass
-        
-        # Calculate summary
-        stats = calculate_aggregate_stats(all_grades)
-        
-        summary = DepartmentSummary(
-            dept_abbr=dept.dept_abbr,
-            average_gpa=stats['averageGPA'] if stats['averageGPA'] > 0 else None,
-            most_grade=stats['mostStudents'] if stats['mostStudents'] else None,
-            most_percent=stats['mostStudentsPercent'] if stats['mostStudentsPercent'] > 0 else None
-        )
-        summaries.append(summary)
+    # Each department's classes, every one contributing its total and its term distributions
+    term_grades = term_grades_by_class(session, dept_abbrs=dept_abbrs)
+    dept_grades = {dept_abbr: [] for dept_abbr in department_abbrs(session, dept_abbrs)}
+    for dept_abbr, class_id, total_grades in department_class_rows(session, dept_abbrs):
+        dept_grades[dept_abbr] += class_grades(total_grades, term_grades.get(class_id, []))
+    summaries = [dict(dept_abbr=dept_abbr, **summary_row(calculate_aggregate_stats(all_grades)))
+                 for dept_abbr, all_grades in dept_grades.items()]
     
-    session.add_all(summaries)
+    if summaries:
+        session.execute(insert(DepartmentSummary), summaries)
+    metrics.incr("summaries.department", len(summaries))
     print(f"Generated {len(summaries)} department summaries")
 
 
-def main():
-    """Main function to generate all summary tables."""
-    engine = create_engine("sqlite:///./ProcessedData.db", echo=False, future=True)
+def generate_class_rankings(session, min_students=DEFAULT_MIN_CLASS_STUDENTS, scope=None):
+    """
+    Rank classes by average GPA within their department and within their department's course level.
+
+    Aggregation and ranking run as a single INSERT ... SELECT using SQLite window functions. With a
+    `scope`, only the departments in it are re-ranked (rankings never cross departments).
+    """
+    print("Generating class rankings...")
+
+    params = {"min_students": min_students}
+    dept_filter = ""
+    if scope is not None:
+        params["dept_abbrs"] = scope["dept_abbrs"]
+        dept_filter = "AND c.dept_abbr IN :dept_abbrs"
+        execute_scoped(session, "DELETE FROM class_ranking WHERE dept_abbr IN :dept_abbrs", {"dept_abbrs": scope["dept_abbrs"]})
+    else:
+        session.query(ClassRanking).delete()
+    execute_scoped(session, f"""
+        WITH class_totals AS (
+            SELECT c.id AS class_id,
+                   c.dept_abbr,
+                   (CAST(c.course_num AS INTEGER) / 1000) * 1000 AS course_level,
+                   {GRADE_SUMS_SQL}
+            FROM classdistribution c
+            JOIN distribution d ON d.class_id = c.id
+            JOIN termdistribution t ON t.dist_id = d.id
+            WHERE c.dept_abbr IS NOT NULL {dept_filter}
+            GROUP BY c.id
+        ),
+        eligible AS (
+            SELECT class_id, dept_abbr, course_level, total_students, {AVERAGE_GPA_SQL} AS average_gpa
+            FROM class_totals
+            WHERE total_students >= :min_students AND (a + b + c + d + f) > 0
+        )
+        INSERT INTO class_ranking (
+            class_id, dept_abbr, course_level, total_students, average_gpa,
+            dept_rank, dept_percentile, level_rank, level_percentile
+        )
+        SELECT class_id, dept_abbr, course_level, total_students, average_gpa,
+               RANK() OVER dept_desc,
+               ROUND(100 * CUME_DIST() OVER (PARTITION BY dept_abbr ORDER BY average_gpa), 1),
+               RANK() OVER level_desc,
+               ROUND(100 * CUME_DIST() OVER (PARTITION BY dept_abbr, course_level ORDER BY average_gpa), 1)
+        FROM eligible
+        WINDOW dept_desc AS (PARTITION BY dept_abbr ORDER BY average_gpa DESC, total_students DESC),
+               level_desc AS (PARTITION BY dept_abbr, course_level ORDER BY average_gpa DESC, total_students DESC)
+    """, params)
+    count = changed_rows(session)
+
+    metrics.incr("rankings.class", count)
+    print(f"Generated {count} class rankings")
+
+
+def generate_instructor_rankings(session, min_students=DEFAULT_MIN_INSTRUCTOR_STUDENTS, scope=None):
+    """Rank instructors by average GPA within each class they have taught (or each class in `scope`)."""
+    print("Generating instructor rankings...")
+
+    params = {"min_students": min_students}
+    class_filter = ""
+    if scope is not None:
+        params["class_ids"] = scope["class_ids"]
+        class_filter = "AND d.class_id IN :class_ids"
+        execute_scoped(session, "DELETE FROM instructor_ranking WHERE class_id IN :class_ids", {"class_ids": scope["class_ids"]})
+    else:
+        session.query(InstructorRanking).delete()
+    execute_scoped(session, f"""
+        WITH instructor_totals AS (
+            SELECT d.class_id,
+                   d.instructor_id,
+                   c.dept_abbr,
+                   {GRADE_SUMS_SQL}
+            FROM distribution d
+            JOIN classdistribution c ON c.id = d.class_id
+            JOIN professor p ON p.id = d.instructor_id
+            JOIN termdistribution t ON t.dist_id = d.id
+            WHERE p.name != 'Unknown Instructor' AND c.dept_abbr IS NOT NULL {class_filter}
+            GROUP BY d.class_id, d.instructor_id
+        ),
+        eligible AS (
+            SELECT class_id, instructor_id, dept_abbr, total_students, {AVERAGE_GPA_SQL} AS average_gpa
+            FROM instructor_totals
+            WHERE total_students >= :min_students AND (a + b + c + d + f) > 0
+        )
+        INSERT INTO instructor_ranking (
+            class_id, instructor_id, dept_abbr, total_students, average_gpa, class_rank, class_percentile
+        )
+        SELECT class_id, instructor_id, dept_abbr, total_students, average_gpa,
+               RANK() OVER (PARTITION BY class_id ORDER BY average_gpa DESC, total_students DESC),
+               ROUND(100 * CUME_DIST() OVER (PARTITION BY class_id ORDER BY average_gpa), 1)
+        FROM eligible
+    """, params)
+    count = changed_rows(session)
+
+    metrics.incr("rankings.instructor", count)
+    print(f"Generated {count} instructor rankings")
+
+
+def generate_leaderboards(session, top_n=DEFAULT_TOP_N, scope=None):
+    """Materialize the top-N entries of each ranking scope from the ranking tables (or those re-ranked in `scope`)."""
+    print("Generating leaderboards...")
+
+    params = {"top_n": top_n}
+    dept_filter = class_filter = ""
+    if scope is not None:
+        params.update(dept_abbrs=scope["dept_abbrs"], class_ids=scope["class_ids"])
+        dept_filter = "AND dept_abbr IN :dept_abbrs"
+        class_filter = "AND class_id IN :class_ids"
+        execute_scoped(session, """
+            DELETE FROM leaderboard
+            WHERE (scope = 'dept' AND scope_key IN :dept_abbrs)
+               OR (scope = 'level' AND substr(scope_key, 1, instr(scope_key, ' ') - 1) IN :dept_abbrs)
+               OR (scope = 'class' AND scope_key IN :class_keys)
+        """, {"dept_abbrs": scope["dept_abbrs"], "class_keys": [str(class_id) for class_id in scope["class_ids"]]})
+    else:
+        session.query(Leaderboard).delete()
+    execute_scoped(session, f"""
+        INSERT INTO leaderboard (scope, scope_key, rank, entity_id, average_gpa, total_students)
+        SELECT 'dept', dept_abbr, dept_rank, class_id, average_gpa, total_students
+        FROM class_ranking WHERE dept_rank <= :top_n {dept_filter}
+        UNION ALL
+        SELECT 'level', dept_abbr || ' ' || course_level, level_rank, class_id, average_gpa, total_students
+        FROM class_ranking WHERE level_rank <= :top_n {dept_filter}
+        UNION ALL
+        SELECT 'class', CAST(class_id AS TEXT), class_rank, instructor_id, average_gpa, total_students
+        FROM instructor_ranking WHERE class_rank <= :top_n {class_filter}
+    """, params)
+    count = changed_rows(session)
+
+    metrics.incr("leaderboard.entries", count)
+    print(f"Generated {count} leaderboard entries")
+
+
+def refresh_search_documents(session, scope=None):
+    """Rewrite the FTS documents of the classes, instructors and departments in `scope` (all of them without one)."""
+    print("Refreshing search documents...")
+    conn = session.connection()
+    if scope is None:
+        outdated = outdated_fts_tables(conn)
+        counts = {table: (create_fts_table if table in outdated else rebuild_fts_table)(conn, table) for table in FTS_TABLES}
+    else:
+        counts = sync_fts(conn, scope["class_ids"], scope["instructor_ids"], scope["dept_abbrs"])
+    metrics.incr("fts.documents", sum(counts.values()))
+    print(f"Refreshed {sum(counts.values())} search documents")
+
+
+def main(min_class_students=DEFAULT_MIN_CLASS_STUDENTS,
+         min_instructor_students=DEFAULT_MIN_INSTRUCTOR_STUDENTS,
+         top_n=DEFAULT_TOP_N,
+         terms=None,
+         class_ids=(),
+         instructor_ids=(),
+         term_range=None):
+    """
+    Main function to generate all summary tables.
+
+    With `terms` or a (first, last) `term_range` (and/or explicit class/instructor ids), only the classes, instructors and
+    departments those terms touch are re-summarized and re-ranked; everything else is left as is.
+    Returns the keys whose summaries changed ({"class_ids", "professor_ids", "dept_abbrs"}); the
+    caller publishes them (publish/ is written by main.py and python -m src.publish).
+    """
+    engine = get_engine()
     
     # Create tables if they don't exist
     Base.metadata.create_all(engine)
+    create_missing_indexes(engine)
     
-    Session = sessionmaker(bind=engine, autoflush=False)
-    session = Session()
+    session = Session(bind=engine)
     
-    try:
-        print("Starting summary generation...")
+    # Summaries read one consistent grade set: ingestion and duplicate merges wait until they are committed
+    with stage_lock("grades", exclusive=False), stage_lock("professors", exclusive=False):
+        try:
+            print("Starting summary generation...")
+            scope = None
+            if term_range is not None:
+                terms = list(terms or []) + terms_in_range(session, *term_range)
+            if terms or class_ids or instructor_ids:
+                scope = resolve_scope(session, terms, class_ids, instructor_ids)
+                print(f"Scoped to {len(scope['class_ids'])} classes, {len(scope['instructor_ids'])} instructors, "
+                      f"{len(scope['dept_abbrs'])} departments")
+            with metrics.stage("changes"):
+                snapshot_summaries(session)
         
-        # Generate summaries for each entity type
-        generate_class_summaries(session)
-        generate_instructor_summaries(session)
-        generate_department_summaries(session)
+            # Generate summaries for each entity type
+            with metrics.stage("class_summaries"):
+                generate_class_summaries(session, scope)
+            with metrics.stage("class_instructor_rollups"):
+                generate_class_instructor_rollups(session, scope)
+            with metrics.stage("instructor_summaries"):
+                generate_instructor_summaries(session, scope)
+            with metrics.stage("department_summaries"):
+                generate_department_summaries(session, scope)
+
+            # Rankings and leaderboards
+            with metrics.stage("class_rankings"):
+                generate_class_rankings(session, min_class_students, scope)
+            with metrics.stage("instructor_rankings"):
+                generate_instructor_rankings(session, min_instructor_students, scope)
+            with metrics.stage("leaderboards"):
+                generate_leaderboards(session, top_n, scope)
+
+            # Search documents carry the summary fields, so refresh those of every entity re-summarized
+            with metrics.stage("fts"):
+                refresh_search_documents(session, scope)
+
+            # Only what was really rewritten goes into the change feed, so caches keep everything else
+            with metrics.stage("changes"):
+                changed = changed_summary_keys(session)
+                version = record_changes(session, "summaries", **changed)
+            print(f"Changed summaries: {len(changed['class_ids'])} classes, {len(changed['professor_ids'])} instructors, "
+                  f"{len(changed['dept_abbrs'])} departments" + (f" (change {version})" if version else ""))
         
-        # Commit all changes
-        session.commit()
-        print("Summary generation completed successfully!")
+            # Commit all changes
+            with metrics.stage("commit"):
+                session.commit()
+            print("Summary generation completed successfully!")
+            return changed
         
-    except Exception as e:
-        session.rollback()
-        print(f"Error during summary generation: {e}")
-        raise
-    finally:
-        session.close()
+        except Exception as e:
+            session.rollback()
+            print(f"Error during summary generation: {e}")
+            raise
+        finally:
+            session.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate summary, ranking and leaderboard tables.')
+    parser.add_argument('--min-class-students', type=int, default=DEFAULT_MIN_CLASS_STUDENTS,
+                        help='Minimum total enrollment for a class to be ranked.')
+    parser.add_argument('--min-instructor-students', type=int, default=DEFAULT_MIN_INSTRUCTOR_STUDENTS,
+                        help='Minimum total enrollment for an instructor to be ranked within a class.')
+    parser.add_argument('--top-n', type=int, default=DEFAULT_TOP_N,
+                        help='Number of entries kept per leaderboard.')
+    parser.add_argument('--terms', type=str, default=None,
+                        help='Only re-summarize what these terms touch, e.g. 202502 or 201608..202508.')
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    add_maintenance_arguments(parser)
+    args = parser.parse_args()
+
+    configure_logging(args.log_level, args.log_json)
+    start_profiling(args)
+    try:
+        main(args.min_class_students, args.min_instructor_students, args.top_n,
+             term_range=parse_term_range(args.terms) if args.terms else None)
+        print("Run python -m src.publish to bring publish/ (warmup manifest, change feed, documents, sitemaps) up to date")
+        if not args.skip_maintenance:
+            run_maintenance()
+    finally:
+        metrics.write_report("summaries", args.metrics_out, args.prometheus_out)
+        print(f"Metrics report written to {args.metrics_out or 'metrics/summaries.json'}")
+    sys.exit(finish_profiling("summaries", args))
\ No newline at end of file
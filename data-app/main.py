@@ -1,16 +1,14 @@
 import argparse
-import pandas as pd
-import numpy as np
+import atexit
+import contextlib
 import os
-from db.Models import Session, Professor, DepartmentDistribution, TermDistribution
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-# Import data preprocessor for CSV file preprocessing
-from data_preprocessor import process_csv_file as clean_csv_file
+import sys
 
-from src.generation.process import Process
-from src.rmp.rmp import RMP
+from src.generation.term_index import parse_term_range
+from src.metrics import metrics, get_logger, configure_logging, add_metrics_arguments, add_profile_arguments, start_profiling, finish_profiling
+from src.maintenance.maintenance import run_maintenance, add_maintenance_arguments
+
+log = get_logger("main")
 
 # This script is specifically for Georgia Tech data processing
 # Process Spring 2025 and Summer 2025 cleaned data
@@ -25,28 +23,107 @@ if __name__ == "__main__":
     parser.add_argument('--overwrite', action='store_true', help='Overwrite existing term data in the database instead of appending it.')
     parser.add_argument('--cleardb', action='store_true', help='DANGER: Clear ALL database content (all professors, courses, grades). Cannot be undone!')
     parser.add_argument('--process-all', action='store_true', help='Process all CSV files in GRADE_DATA directory.')
+    parser.add_argument('--terms', metavar='RANGE', help='Only rebuild these terms: purge, re-ingest and re-summarize them (e.g. 201608..202508, 202402.. or 202502).')
+    parser.add_argument('--since', type=int, metavar='TERM', help='Only rebuild terms from TERM on (same as --terms TERM..).')
+    parser.add_argument('--changed', action='store_true', help='Only rebuild terms whose CSV changed since it was last ingested.')
+    parser.add_argument('--id-registry', default='id_registry.json', metavar='PATH', help='Registry of the professor, class and distribution ids that are not derived from their keys (default: id_registry.json).')
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    add_maintenance_arguments(parser)
 
     args = parser.parse_args()
-    
-    # Use the main database used by the frontend; do not delete existing data
-    from db.Models import Base
-    gt_engine = create_engine("sqlite:///./ProcessedData.db", echo=False, future=True)
 
-    # Import all model classes for reference
-    from db.Models import Libed, TermDistribution, Distribution, Professor, ClassDistribution, DepartmentDistribution
+    configure_logging(args.log_level, args.log_json)
+    start_profiling(args)
+
+    # The database layer is imported once the arguments are parsed, so --help and usage errors return at once
+    from sqlalchemy.orm import configure_mappers
+    from db.Models import Base, Professor, TermDistribution, Session, bind_session, create_missing_indexes
+    from src.coordination.coordination import read_only, stage_lock
+    from src.generation.term_index import refresh_term_index, select_files, mark_ingested
+    if not args.rmp_only:
+        # pandas, numpy, the ingestion code and the change feed it records are only needed when CSVs are processed
+        import pandas as pd
+        import numpy as np
+        from data_preprocessor import process_csv_file as clean_csv_file
+        from src.generation.ids import ids
+        from src.generation.names import canonical_name
+        from src.generation.process import Process
+        from src.search.fts import sync_stale_fts
+        from src.catalog.catalog import ingest_catalog, refresh_course_documents
+        from src.catalog.mismatches import sync_catalog_mismatches
+        from src.publish.changes import changes, record_changes
+
+    term_range = parse_term_range(args.terms) if args.terms else ((args.since, None) if args.since else None)
+    # A term selection rebuilds just those terms in place
+    selective = term_range is not None or args.changed
+    if selective:
+        args.overwrite = True
 
-    # Define a custom Session class for GT data
-    GTSession = sessionmaker(bind=gt_engine, autoflush=False)
+    def write_metrics_report():
+        metrics.write_report("main", args.metrics_out, args.prometheus_out)
+        print(f"[MAIN] Metrics report written to {args.metrics_out or 'metrics/main.json'}")
+        if finish_profiling("main", args):
+            # The exit status can no longer be changed through sys.exit() from an atexit handler
+            sys.stdout.flush()
+            os._exit(1)
+
+    # Write the metrics report however the run ends (including the exit() calls below)
+    atexit.register(write_metrics_report)
+
+    def publish_change_feed():
+        # The one place a run writes publish/: mirror the change_log rows it recorded (summaries
+        # included) into publish/changes/ for cache invalidation, re-export the page documents and
+        # sitemap shards they touched, and refresh the warmup manifest if enrollment or names moved
+        from src.publish.changes import publish_changes
+        from src.publish.documents import export_documents
+        from src.publish.sitemap import write_sitemaps
+        from src.publish.warmup import write_warmup_manifest
+        with metrics.stage("warmup_manifest"):
+            with read_only(gt_engine).connect() as conn:
+                write_warmup_manifest(conn)
+        with metrics.stage("changes"):
+            with read_only(gt_engine).connect() as conn:
+                publish_changes(conn)
+        with metrics.stage("documents"):
+            with read_only(gt_engine).connect() as conn:
+                export_documents(conn)
+        with metrics.stage("sitemap"):
+            with read_only(gt_engine).connect() as conn:
+                write_sitemaps(conn)
+    
+    # Use the main database used by the frontend; do not delete existing data
+    gt_engine = bind_session()
 
     # Create tables using the imported Base with all models
     Base.metadata.create_all(gt_engine)
+    create_missing_indexes(gt_engine)
+    # Set up the ORM mappers now rather than inside whichever stage first queries them
+    configure_mappers()
     
-    # Override the Session
-    import db.Models
-    db.Models.Session = GTSession
-    
+    # Hold the ingestion locks until the CSVs are in, so no duplicate merge or summary run interleaves
+    ingest_locks = contextlib.ExitStack()
+    # Release them on the early exit() paths too, before interpreter teardown closes the lock files
+    atexit.register(ingest_locks.close)
+    if not args.rmp_only:
+        ingest_locks.enter_context(stage_lock("professors", exclusive=args.cleardb))
+        ingest_locks.enter_context(stage_lock("grades"))
+
+    # Pick the CSVs to ingest from the cached file -> term index
+    class_data_dir = "GRADE_DATA"
+    term_index, selected_files = {}, []
+    if os.path.exists(class_data_dir) and os.path.isdir(class_data_dir) and not args.rmp_only:
+        term_index = refresh_term_index(class_data_dir)
+        selected_files = select_files(term_index, term_range, args.changed)
+        if selective:
+            print(f"[MAIN] Selected {len(selected_files)} of {len(term_index)} CSV files: {', '.join(selected_files) or 'none'}")
+    selected_terms = sorted({term_index[f]["term"] for f in selected_files if term_index[f]["term"] is not None})
+    purged = {"class_ids": [], "instructor_ids": []}
+    # Terms this run wrote grade rows for; only what they touch is re-summarized afterwards
+    ingested_terms = set()
+
     # Create a fresh session for initialization
-    session = GTSession()
+    session = Session()
     
     # Handle database clearing first (can work independently)
     if args.cleardb:
@@ -70,70 +147,50 @@ if __name__ == "__main__":
         try:
             # We need to delete in the correct order due to foreign key constraints
             from sqlalchemy import text
-            session.execute(text("DELETE FROM termdistribution"))
-            session.execute(text("DELETE FROM distribution"))
-            session.execute(text("DELETE FROM classdistribution"))
-            session.execute(text("DELETE FROM departmentdistribution"))
-            session.execute(text("DELETE FROM professor"))
-            session.commit()
+            with metrics.stage("cleardb"):
+                session.execute(text("DELETE FROM termdistribution"))
+                session.execute(text("DELETE FROM distribution"))
+                session.execute(text("DELETE FROM classdistribution"))
+                session.execute(text("DELETE FROM departmentdistribution"))
+                session.execute(text("DELETE FROM professor"))
+                session.commit()
             print("[MAIN] Successfully cleared all database content.")
         except Exception as e:
             print(f"[ERROR] Failed to clear database: {str(e)}")
             session.rollback()
     
+    # A first build (or one after --cleardb) summarizes everything instead of an IN-list of every id
+    with read_only(gt_engine).connect() as conn:
+        first_build = not args.rmp_only and conn.exec_driver_sql("SELECT 1 FROM termdistribution LIMIT 1").first() is None
+
     # If overwrite is specified, clear the relevant tables for the terms being processed
     if args.overwrite and not args.cleardb:
         print("[WARNING] Overwrite mode enabled.")
-        # Collect term codes to delete from CSV files
+        # Term codes of the CSV files being processed come from the term index
         print("[WARNING] Deleting existing term data for CSV files being processed.")
-        term_codes_to_delete = []
-        
-        # Scan all CSV files in GRADE_DATA directory to find term codes
-        class_data_dir = "GRADE_DATA"
-        if args.process_all and os.path.exists(class_data_dir) and os.path.isdir(class_data_dir):
-            csv_files = [os.path.join(class_data_dir, f) for f in os.listdir(class_data_dir) if f.endswith('.csv')]
-            
-            for csv_file in csv_files:
+        for csv_file in selected_files:
+            if term_index[csv_file]["term"] is None:
+                print(f"[WARNING] Could not determine term code from {csv_file}")
+            else:
+                print(f"[INFO] Found term code {term_index[csv_file]['term']} in file {csv_file}")
+
+        # If term codes were found, delete related data from the database
+        if selected_terms:
+            print(f"[MAIN] Found term codes to delete: {selected_terms}")
+
+            with metrics.stage("overwrite"):
                 try:
-                    df_sample = pd.read_csv(csv_file, nrows=1)
-                    term_col = None
-                    
-                    # Check for term column in different formats
-                    if 'Term' in df_sample.columns:
-                        term_col = 'Term'
-                    elif 'term_code' in df_sample.columns:
-                        term_col = 'term_code'
-                    
-                    if term_col and not df_sample[term_col].empty:
-                        term_value = df_sample[term_col].iloc[0]
-                        if isinstance(term_value, str) and term_value.isdigit():
-                            term_codes_to_delete.append(int(term_value))
-                        elif isinstance(term_value, (int, float)):
-                            term_codes_to_delete.append(int(term_value))
-                        print(f"[INFO] Found term code {int(term_value)} in file {os.path.basename(csv_file)}")
+                    # Remove the terms and take their grades back out of the class totals
+                    purged = Process.purge_terms(selected_terms)
+                    print(f"[MAIN] Successfully cleared term data for: {selected_terms} "
+                          f"({purged['term_rows']} term rows, {purged['distributions']} empty distributions, "
+                          f"{purged['classes']} class totals recomputed)")
                 except Exception as e:
-                    print(f"[WARNING] Could not determine term code from {csv_file}: {str(e)}")
-                        
-            # If term codes were found, delete related data from the database
-            if term_codes_to_delete:
-                term_codes_to_delete = list(set(term_codes_to_delete))  # Remove duplicates
-                print(f"[MAIN] Found term codes to delete: {term_codes_to_delete}")
-                
-                for term_code in term_codes_to_delete:
-                    print(f"[MAIN] Clearing data for term {term_code}...")
-                    try:
-                        # Find all TermDistribution entries for this term
-                        term_dists = session.query(TermDistribution).filter(TermDistribution.term == term_code).all()
-                        
-                        for term_dist in term_dists:
-                            # Delete the TermDistribution entry
-                            session.delete(term_dist)
-                        
-                        session.commit()
-                        print(f"[MAIN] Successfully cleared term data for: {term_code}")
-                    except Exception as e:
-                        print(f"[ERROR] Failed to clear term {term_code}: {str(e)}")
-                        session.rollback()
+                    # The purge rolled back; ingesting the CSVs on top would count those terms' grades twice
+                    print(f"[ERROR] Failed to clear terms {selected_terms}: {str(e)}")
+                    print("[ERROR] No CSV files were ingested. Fix the error and run again.")
+                    session.close()
+                    exit(1)
     
     session.close()
     
@@ -146,126 +203,131 @@ if __name__ == "__main__":
             
             # Step 1: Clean the CSV file (process instructor names and calculate headcounts)
             print(f"[MAIN] Cleaning data in {file_path}")
-            clean_csv_file(file_path)
+            with metrics.stage("preprocess"):
+                clean_csv_file(file_path)
             print(f"[MAIN] Finished cleaning {file_path}")
                 
             print(f"[MAIN] Loading data from {file_path}")
             
-            df = pd.read_csv(file_path, dtype={"section": str, "Section": str})
+            with metrics.stage("load"):
+                df = pd.read_csv(file_path, dtype={"section": str, "Section": str})
             
-            # Rename columns to the expected internal names
-            column_mapping = {
-                'Term': 'term_code',
-                'Course': 'course_full',
-                'Instructor': 'instructor',
-                'Section': 'section',
-                'Enrollment': 'enrollment',
-                'Average': 'avg_gpa'
-            }
+                # Rename columns to the expected internal names
+                column_mapping = {
+                    'Term': 'term_code',
+                    'Course': 'course_full',
+                    'Instructor': 'instructor',
+                    'Section': 'section',
+                    'Enrollment': 'enrollment',
+                    'Average': 'avg_gpa'
+                }
             
-            # Rename the columns instead of creating duplicates
-            df.rename(columns=column_mapping, inplace=True, errors='ignore')
+                # Rename the columns instead of creating duplicates
+                df.rename(columns=column_mapping, inplace=True, errors='ignore')
             
-            # Always parse subject and course_number from Course column
-            if 'Course' in df.columns or 'course_full' in df.columns:
-                # Use either Course or course_full column
-                course_col = 'Course' if 'Course' in df.columns else 'course_full'
-                # Parse subject and course_number from Course (e.g., "ACCT 2101" -> subject="ACCT", course_number="2101")
-                df['subject'] = df[course_col].str.extract(r'^([A-Za-z]+)', expand=False)
-                df['course_number'] = df[course_col].str.extract(r'[A-Za-z]+\s+(.+)', expand=False)
+                # Always parse subject and course_number from Course column
+                if 'Course' in df.columns or 'course_full' in df.columns:
+                    # Use either Course or course_full column
+                    course_col = 'Course' if 'Course' in df.columns else 'course_full'
+                    # Parse subject and course_number from Course (e.g., "ACCT 2101" -> subject="ACCT", course_number="2101")
+                    df['subject'] = df[course_col].str.extract(r'^([A-Za-z]+)', expand=False)
+                    df['course_number'] = df[course_col].str.extract(r'[A-Za-z]+\s+(.+)', expand=False)
             
-            # Exclude courses whose course_number ends with 'R' (e.g., 2110R)
-            df = df[~df["course_number"].astype(str).str.endswith('R', na=False)]
-            print(f"[MAIN] Loaded Data from {file_path}")
-            print(f"[DEBUG] Columns in data: {df.columns.tolist()}")
+                # Exclude courses whose course_number ends with 'R' (e.g., 2110R)
+                df = df[~df["course_number"].astype(str).str.endswith('R', na=False)]
+            metrics.incr("csv.files")
+            metrics.incr("csv.rows", len(df))
+            print(f"[MAIN] Loaded {len(df)} rows from {file_path}")
+            log.debug("columns_loaded", file=os.path.basename(file_path), columns=",".join(df.columns))
             
             # Process instructors
             print("[MAIN] Adding Instructors")
             # Add All Instructors Including an "Unknown Instructor" for non-attributed values to the Database
-            session = Session()
-            prof_list = np.array([prof.name for prof in session.query(Professor).all()])
-            session.close()
-            data_list = df["instructor"].unique() if "instructor" in df.columns else []
-            diff_list = np.setdiff1d(data_list, prof_list)
+            with metrics.stage("instructors"):
+                session = Session()
+                prof_list = np.array([prof.name for prof in session.query(Professor).all()])
+                session.close()
+                data_list = df["instructor"].unique() if "instructor" in df.columns else []
+                diff_list = np.setdiff1d(data_list, prof_list)
             
-            if diff_list.size > 0:
-                print(f"[MAIN] Adding {len(diff_list)} new instructors")
-                for x in diff_list:
-                    if x and not pd.isna(x):
-                        print(f"[DEBUG] Adding instructor: {x}")
-                        Process.process_prof(x)
-            else:
-                print("[MAIN] No new instructors found.")
+                if diff_list.size > 0:
+                    print(f"[MAIN] Adding {len(diff_list)} new instructors")
+                    Process.process_profs(diff_list)
+                else:
+                    print("[MAIN] No new instructors found.")
                 
-            # Add unknown instructor
-            Process.process_prof("Unknown Instructor")
+                # Add unknown instructor
+                Process.process_prof("Unknown Instructor")
 
-            session = Session()
-            if session.query(Professor).filter(Professor.name == "Unknown Instructor").first() == None:
-                session.add(Professor(name="Unknown Instructor"))
-                session.commit()
-                print("[MAIN] Added 'Unknown Instructor' to Instructors.")
-            session.close()
+                session = Session()
+                if session.query(Professor).filter(Professor.by_name("Unknown Instructor")).first() == None:
+                    session.add(Professor(id=ids.assign(session, "professor", canonical_name("Unknown Instructor"), "Unknown Instructor"), name="Unknown Instructor"))
+                    session.commit()
+                    print("[MAIN] Added 'Unknown Instructor' to Instructors.")
+                session.close()
             
             print("[MAIN] Finished Instructor Insertion")
             
             # Process departments
             print("[MAIN] Adding Departments")
-            unique_subjects = df["subject"].unique()
-            print(f"[DEBUG] Found subjects in data: {unique_subjects}")
+            with metrics.stage("departments"):
+                unique_subjects = df["subject"].unique()
+                log.debug("subjects_found", count=len(unique_subjects))
             
-            for subject in unique_subjects:
-                if subject and not pd.isna(subject):
-                    dept_tuple = ('MAIN', subject)
-                    print(f"[DEBUG] Adding department: {dept_tuple}")
-                    try:
-                        Process.process_dept(dept_tuple)
-                    except ValueError as e:
-                        print(f"[ERROR] Failed to process department {dept_tuple}: {str(e)}")
+                for subject in unique_subjects:
+                    if subject and not pd.isna(subject):
+                        dept_tuple = ('MAIN', subject)
+                        log.debug("adding_department", campus=dept_tuple[0], dept=dept_tuple[1])
+                        try:
+                            Process.process_dept(dept_tuple)
+                        except ValueError as e:
+                            print(f"[ERROR] Failed to process department {dept_tuple}: {str(e)}")
             
             print("[MAIN] Finished Department Insertion")
             
             # Generate distributions
             print("[MAIN] Generating Distributions")
-            session = Session()
-            # If force_process is True, we process all rows, otherwise we only process new terms
-            if force_process:
-                new_additions = df
-            else:
-                new_additions = df[~df["term_code"].isin(list(set(TermDist.term for TermDist in session.query(TermDistribution).all())))]
-            session.close()
+            with metrics.stage("distributions"):
+                session = Session()
+                # If force_process is True, we process all rows, otherwise we only process new terms
+                if force_process:
+                    new_additions = df
+                else:
+                    new_additions = df[~df["term_code"].isin(list(set(TermDist.term for TermDist in session.query(TermDistribution).all())))]
+                session.close()
             
-            if not new_additions.empty:
-                # Group by term, instructor, course (without section) for aggregation
-                # This ensures that all sections taught by the same instructor for the same course are combined
-                # Use the correct column names for groupby
-                new_additions.groupby(["term_code", "instructor", "subject", "course_number"], group_keys=False).apply(Process.process_dist)
-                print(f"[MAIN] Finished Generating Distributions for {len(new_additions)} rows")
-            else:
-                print("[MAIN] No new data to process")
+                if not new_additions.empty:
+                    # Recorded up front: groups committed before a failure still need their summaries
+                    ingested_terms.update(int(term) for term in new_additions["term_code"].dropna().unique())
+                    # Group by term, instructor, course (without section) for aggregation
+                    # This ensures that all sections taught by the same instructor for the same course are combined
+                    # Use the correct column names for groupby
+                    new_additions.groupby(["term_code", "instructor", "subject", "course_number"], group_keys=False).apply(Process.process_dist)
+                    print(f"[MAIN] Finished Generating Distributions for {len(new_additions)} rows")
+                else:
+                    print("[MAIN] No new data to process")
                 
             return True
             
         except Exception as e:
+            metrics.incr("csv.failed_files")
             print(f"[ERROR] Failed to process file {file_path}: {str(e)}")
             return False
     
     # Handle RMP-only mode
     if args.rmp_only:
         print("[MAIN] RMP-only mode: Skipping CSV processing, running RMP updates only")
-        
-        # Initialize database connection
-        from db.Models import Base
-        gt_engine = create_engine("sqlite:///./ProcessedData.db", echo=False, future=True)
-        
-        # Override the Session
-        import db.Models
-        db.Models.Session = sessionmaker(bind=gt_engine, autoflush=False)
-        
+        from src.rmp.rmp import RMP
+
         # Run RMP processing
         print("[MAIN] Starting RMP processing...")
-        RMP().update_profs(fix_duplicates=True)
+        with metrics.stage("rmp"):
+            RMP().update_profs(fix_duplicates=True)
         print("[MAIN] RMP processing completed")
+
+        if not args.skip_maintenance:
+            run_maintenance()
+        publish_change_feed()
         
         # Exit after RMP processing
         exit(0)
@@ -275,14 +337,37 @@ if __name__ == "__main__":
 
     # Process all CSV files in GRADE_DATA directory if specified
     if args.process_all:
-        class_data_dir = "GRADE_DATA"
+        # Bring course_catalog up to date with COURSE_INFO first (unchanged files are skipped), so
+        # search documents pick up catalog titles; classes whose title changed are re-indexed
+        with metrics.stage("catalog"):
+            with gt_engine.begin() as conn:
+                catalog = ingest_catalog(conn)
+                refreshed = refresh_course_documents(conn, catalog["codes"]) if catalog["codes"] else 0
+                mismatches = sync_catalog_mismatches(conn)
+                record_changes(conn, "catalog", class_codes=catalog["codes"])
+        metrics.incr("catalog.files", catalog["files"])
+        print(f"[MAIN] Catalog: {catalog['files']} files ingested, {catalog['removed']} removed, "
+              f"{refreshed} search documents refreshed, mismatches +{mismatches['added']} -{mismatches['removed']}")
+
         if os.path.exists(class_data_dir) and os.path.isdir(class_data_dir):
-            csv_files = [os.path.join(class_data_dir, f) for f in os.listdir(class_data_dir) if f.endswith('.csv')]
+            csv_files = [os.path.join(class_data_dir, f) for f in selected_files]
             
             if not csv_files:
-                print(f"[MAIN] No CSV files found in {class_data_dir}")
+                print(f"[MAIN] No CSV files {'selected' if selective else 'found'} in {class_data_dir}")
             else:
                 print(f"[MAIN] Found {len(csv_files)} CSV files to process in {class_data_dir}")
+
+                # New rows take ids derived from their keys, so a --cleardb or fresh database reproduces them
+                with metrics.stage("ids"):
+                    if first_build and not os.path.exists(args.id_registry):
+                        print(f"[WARNING] No id registry at {args.id_registry}; ids are derived from names and class codes, "
+                              f"but the exceptions a previous build registered are only kept if its registry is restored there first")
+                    ids.load(args.id_registry)
+                    with read_only(gt_engine).connect() as conn:
+                        registered = ids.sync(conn)
+                    ids.save()
+                print(f"[MAIN] Id registry {args.id_registry}: {sum(len(names) for names in ids.ids.values())} exceptions, "
+                      f"{registered} registered from the database")
                 
                 # Process libeds only once
                 print("[MAIN] Defining Libeds")
@@ -292,12 +377,52 @@ if __name__ == "__main__":
                 # Process each CSV file
                 for csv_file in sorted(csv_files):
                     print(f"\n[MAIN] Processing {os.path.basename(csv_file)}")
-                    process_csv_file(csv_file, force_process=args.overwrite)
+                    if process_csv_file(csv_file, force_process=args.overwrite):
+                        mark_ingested(class_data_dir, os.path.basename(csv_file))
+                    # Record what the file's groups committed, even if it failed part way
+                    with gt_engine.begin() as conn:
+                        changes.flush(conn, "ingest")
+                    ids.save()
+
+                # Make new classes, professors and departments searchable; summaries fill in their GPA fields
+                with metrics.stage("fts"):
+                    with gt_engine.begin() as conn:
+                        synced = sync_stale_fts(conn)
+                print(f"[MAIN] Synced search documents: {synced or 'none changed'}")
+
+                # Classes that gained or lost grades change which catalog entries have grade data
+                with metrics.stage("catalog"):
+                    with gt_engine.begin() as conn:
+                        mismatches = sync_catalog_mismatches(conn)
+                print(f"[MAIN] Catalog mismatches +{mismatches['added']} -{mismatches['removed']}")
         else:
             print(f"[ERROR] Directory {class_data_dir} does not exist or is not a directory")
+
+    # Re-summarize what this run wrote or purged, so the class rollups, rankings and the page documents
+    # exported from them below never lag behind the new grades
+    if first_build and ingested_terms:
+        import generate_summaries
+        print("[MAIN] Summarizing every class, instructor and department of the new database")
+        generate_summaries.main()
+    elif ingested_terms or purged["class_ids"] or purged["instructor_ids"]:
+        import generate_summaries
+        print(f"[MAIN] Re-summarizing classes, instructors and departments of terms {sorted(ingested_terms)}")
+        generate_summaries.main(terms=sorted(ingested_terms), class_ids=purged["class_ids"], instructor_ids=purged["instructor_ids"])
+    elif not args.rmp_only:
+        print("[MAIN] No grade rows written; summaries left as they are")
     
+    ingest_locks.close()
+
     # Optional enhancements
     if not args.DisableRMP:
         print("[MAIN] RMP Update For Instructors")
-        RMP().update_profs()
-        print("[MAIN] RMP Updated")
\ No newline at end of file
+        from src.rmp.rmp import RMP
+        with metrics.stage("rmp"):
+            RMP().update_profs()
+        print("[MAIN] RMP Updated")
+
+    # Refresh statistics, FTS tables and reclaim space after the writes above
+    if not args.skip_maintenance:
+        run_maintenance()
+
+    publish_change_feed()
@@ -45,6 +45,8 @@ grade_mapping = {
     "I": None,  # Incomplete
     "W": None,  # Withdrawal
 }
+# Grade columns in the order they are stored and reported
+GRADES = list(grade_mapping)
 
 # Georgia Tech departments
 # This is a comprehensive list of GT departments with auto-mapping for any department code
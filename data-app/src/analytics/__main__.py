@@ -0,0 +1,56 @@
+"""
+Build the grade cube or run quick queries against it.
+
+    python -m src.analytics build
+    python -m src.analytics gpa --by dept --terms 202402..
+    python -m src.analytics percentiles --by class_id --dept CS
+"""
+import argparse
+import sys
+import time
+
+from src.analytics.cube import DEFAULT_CUBE_DIR, DEFAULT_DB_PATH, build_cube, load_cube
+from src.generation.term_index import parse_term_range
+from src.metrics import configure_logging, add_metrics_arguments, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the NumPy grade cube.')
+    parser.add_argument('command', choices=['build', 'gpa', 'percentiles'], help='What to do.')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Database file (default: ProcessedData.db).')
+    parser.add_argument('--cube-dir', default=DEFAULT_CUBE_DIR, help='Directory of the saved cube (default: grade_cube).')
+    parser.add_argument('--by', default='dept', choices=['term', 'class_id', 'instructor_id', 'dept'],
+                        help='Group queries by this column.')
+    parser.add_argument('--terms', help='Only these terms, e.g. 202502 or 201608..202508.')
+    parser.add_argument('--dept', nargs='+', help='Only these departments.')
+    parser.add_argument('--instructor-id', type=int, nargs='+', help='Only these instructors.')
+    parser.add_argument('--limit', type=int, default=20, help='Number of groups to print.')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    configure_logging(args.log_level, args.log_json)
+    if args.command == 'build':
+        cube = build_cube(args.db)
+        cube.save(args.cube_dir)
+        print(f"[CUBE] Saved {cube!r} to {args.cube_dir}")
+        metrics.write_report("analytics", args.metrics_out, args.prometheus_out)
+        return 0
+
+    cube = load_cube(args.cube_dir, args.db)
+    start = time.perf_counter()
+    cube = cube.filter(terms=parse_term_range(args.terms) if args.terms else None,
+                       dept=args.dept, instructor_id=args.instructor_id)
+    if args.command == 'gpa':
+        keys, gpas = cube.gpa(args.by)
+        order = [i for i in gpas.argsort()[::-1] if gpas[i] == gpas[i]][:args.limit]
+        for i in order:
+            print(f"{keys[i]!s:>10}  {gpas[i]:.2f}")
+    else:
+        for q, value in cube.percentiles(args.by).items():
+            print(f"p{q:<3} {value}")
+    print(f"[CUBE] {len(cube)} rows queried in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
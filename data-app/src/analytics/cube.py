@@ -0,0 +1,235 @@
+"""
+Dense in-memory grade cube: every term distribution as one row of NumPy arrays.
+
+    grades        int32 (rows, 10)  counts per grade, columns in GRADES order
+    students      int32 (rows,)     termdistribution.students
+    term          int32 (rows,)     term code (e.g. 202502)
+    class_id      int32 (rows,)
+    instructor_id int32 (rows,)     -1 when the distribution has no instructor
+    dept          int16 (rows,)     index into `depts` (-1 when the class has no department)
+
+build_cube() reads ProcessedData.db once; save()/load_cube() persist the arrays as plain .npy
+files in a directory so they can be memory-mapped instead of read. Group-by sums, GPAs and
+percentiles then run over the whole history in milliseconds without touching SQLite.
+"""
+import json
+import os
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from mapping.mappings import GRADES
+from src.metrics import metrics, get_logger
+
+DEFAULT_DB_PATH = "ProcessedData.db"
+DEFAULT_CUBE_DIR = "grade_cube"
+ARRAYS = ["grades", "students", "term", "class_id", "instructor_id", "dept"]
+META_FILE = "meta.json"
+
+# GPA points per grade column (matches GPA_MAP in generate_summaries.py); NaN columns do not count
+GPA_POINTS = np.array([{"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0, "F": 0.0}.get(grade, np.nan) for grade in GRADES])
+GPA_COLUMNS = ~np.isnan(GPA_POINTS)
+
+log = get_logger("analytics")
+
+
+def source_fingerprint(conn) -> list:
+    """Cheap signature of termdistribution, stored with the cube to detect a stale copy."""
+    count, max_id, students = conn.execute(text(
+        "SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(students), 0) FROM termdistribution"
+    )).one()
+    return [count, max_id, students]
+
+
+class GradeCube:
+    """Column arrays of the term distributions plus the department names `dept` indexes into."""
+
+    def __init__(self, grades, students, term, class_id, instructor_id, dept, depts, fingerprint=None):
+        self.grades = grades
+        self.students = students
+        self.term = term
+        self.class_id = class_id
+        self.instructor_id = instructor_id
+        self.dept = dept
+        self.depts = depts
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.term)
+
+    def __repr__(self) -> str:
+        terms = f"{self.term.min()}..{self.term.max()}" if len(self) else "no terms"
+        return f"<GradeCube {len(self)} rows, {terms}, {len(self.depts)} departments>"
+
+    def dept_code(self, dept_abbr: str) -> int:
+        matches = np.flatnonzero(self.depts == dept_abbr)
+        return int(matches[0]) if len(matches) else -2
+
+    def mask(self, terms=None, dept=None, instructor_id=None, class_id=None) -> np.ndarray:
+        """
+        Boolean row mask. `terms` is a term, a list of terms or a (first, last) range tuple with
+        None for an open end; `dept` is an abbreviation or a list; ids are an int or a list.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if terms is not None:
+            if isinstance(terms, tuple):
+                first, last = terms
+                if first is not None:
+                    keep &= self.term >= first
+                if last is not None:
+                    keep &= self.term <= last
+            else:
+                keep &= np.isin(self.term, np.atleast_1d(terms))
+        if dept is not None:
+            codes = [self.dept_code(abbr) for abbr in np.atleast_1d(dept)]
+            keep &= np.isin(self.dept, codes)
+        if instructor_id is not None:
+            keep &= np.isin(self.instructor_id, np.atleast_1d(instructor_id))
+        if class_id is not None:
+            keep &= np.isin(self.class_id, np.atleast_1d(class_id))
+        return keep
+
+    def filter(self, terms=None, dept=None, instructor_id=None, class_id=None) -> "GradeCube":
+        """A cube holding only the matching rows (see mask())."""
+        keep = self.mask(terms, dept, instructor_id, class_id)
+        return GradeCube(*(getattr(self, name)[keep] for name in ARRAYS), self.depts, self.fingerprint)
+
+    def group_sum(self, by: str) -> tuple:
+        """
+        Sum grade counts and students per distinct value of `by` ("term", "class_id",
+        "instructor_id" or "dept"). Returns (keys, grades (groups, 10), students (groups,)).
+        """
+        keys, inverse = np.unique(getattr(self, by), return_inverse=True)
+        grades = np.column_stack([np.bincount(inverse, weights=self.grades[:, column], minlength=len(keys))
+                                  for column in range(len(GRADES))]).astype(np.int64).reshape(len(keys), len(GRADES))
+        students = np.bincount(inverse, weights=self.students, minlength=len(keys)).astype(np.int64)
+        if by == "dept":
+            keys = np.where(keys >= 0, self.depts[np.clip(keys, 0, None)], None)
+        return keys, grades, students
+
+    @staticmethod
+    def gpa_of(grades: np.ndarray) -> np.ndarray:
+        """Average GPA over the A-F columns of `grades` rows (NaN where no letter grades), rounded like the summaries."""
+        grades = np.atleast_2d(grades)
+        letters = grades[:, GPA_COLUMNS].sum(axis=1)
+        points = grades[:, GPA_COLUMNS] @ GPA_POINTS[GPA_COLUMNS]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.round(np.where(letters > 0, points / letters, np.nan), 2)
+
+    def gpa(self, by: str = None):
+        """Overall GPA, or (keys, GPAs) per group of `by`."""
+        if by is None:
+            return float(self.gpa_of(self.grades.sum(axis=0))[0])
+        keys, grades, _ = self.group_sum(by)
+        return keys, self.gpa_of(grades)
+
+    def percentiles(self, by: str, q=(10, 25, 50, 75, 90)) -> dict:
+        """Percentiles of the per-group GPAs of `by` (groups without letter grades are left out)."""
+        _, gpas = self.gpa(by)
+        gpas = gpas[~np.isnan(gpas)]
+        if not len(gpas):
+            return {p: None for p in q}
+        return dict(zip(q, np.round(np.percentile(gpas, q), 2).tolist()))
+
+    def percentile_rank(self, by: str) -> tuple:
+        """(keys, percentile rank 0-100 of each group's GPA) like CUME_DIST() in the ranking tables."""
+        keys, gpas = self.gpa(by)
+        ranked = np.sort(gpas[~np.isnan(gpas)])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ranks = np.round(100 * np.searchsorted(ranked, gpas, side="right") / len(ranked), 1)
+        return keys, np.where(np.isnan(gpas), np.nan, ranks)
+
+    def summary_stats(self, by: str) -> tuple:
+        """
+        (keys, average GPA, most common grade, its percent) per group, as calculate_aggregate_stats()
+        in generate_summaries.py computes them from the grade dicts.
+        """
+        keys, grades, _ = self.group_sum(by)
+        totals = grades.sum(axis=1)
+        most = grades.argmax(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percent = np.round(100 * grades[np.arange(len(keys)), most] / totals, 1)
+        most_grade = np.where(totals > 0, np.array(GRADES)[most], "")
+        return keys, np.nan_to_num(self.gpa_of(grades)), most_grade, np.nan_to_num(percent)
+
+    def save(self, cube_dir: str = DEFAULT_CUBE_DIR) -> None:
+        """Write each array as an uncompressed .npy (memory-mappable) plus a meta.json."""
+        os.makedirs(cube_dir, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(cube_dir, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(cube_dir, "depts.npy"), self.depts)
+        meta = {"rows": len(self), "grades": GRADES, "fingerprint": self.fingerprint, "built_at": time.time()}
+        with open(os.path.join(cube_dir, f"{META_FILE}.tmp"), "w") as f:
+            json.dump(meta, f, indent=2)
+        # meta.json is written last so a cube with meta.json is always complete
+        os.replace(os.path.join(cube_dir, f"{META_FILE}.tmp"), os.path.join(cube_dir, META_FILE))
+
+
+def build_cube(db_path: str = DEFAULT_DB_PATH) -> GradeCube:
+    """Read every term distribution from `db_path` into a GradeCube."""
+    engine = create_engine(f"sqlite:///{db_path}", echo=False, future=True)
+    grade_columns = ", ".join(f"COALESCE(json_extract(t.grades, '$.{grade}'), 0)" for grade in GRADES)
+    try:
+        with metrics.stage("cube_build"), engine.connect() as conn:
+            fingerprint = source_fingerprint(conn)
+            depts = np.array(sorted(row[0] for row in conn.execute(text(
+                "SELECT DISTINCT dept_abbr FROM classdistribution WHERE dept_abbr IS NOT NULL"
+            ))), dtype=str)
+            rows = conn.execute(text(f"""
+                SELECT t.term, d.class_id, COALESCE(d.instructor_id, -1), c.dept_abbr, t.students, {grade_columns}
+                FROM termdistribution t
+                JOIN distribution d ON d.id = t.dist_id
+                JOIN classdistribution c ON c.id = d.class_id
+                ORDER BY t.term, d.class_id, d.instructor_id
+            """)).all()
+    finally:
+        engine.dispose()
+
+    dept_codes = {abbr: code for code, abbr in enumerate(depts)}
+    numeric = np.array([tuple(row[:3]) + tuple(row[4:]) for row in rows], dtype=np.int64).reshape(len(rows), 4 + len(GRADES))
+    cube = GradeCube(
+        grades=numeric[:, 4:].astype(np.int32),
+        students=numeric[:, 3].astype(np.int32),
+        term=numeric[:, 0].astype(np.int32),
+        class_id=numeric[:, 1].astype(np.int32),
+        instructor_id=numeric[:, 2].astype(np.int32),
+        dept=np.array([dept_codes.get(row[3], -1) for row in rows], dtype=np.int16),
+        depts=depts,
+        fingerprint=fingerprint,
+    )
+    metrics.incr("cube.rows", len(cube))
+    log.info("cube_built", rows=len(cube), departments=len(depts))
+    return cube
+
+
+def load_cube(cube_dir: str = DEFAULT_CUBE_DIR, db_path: str = DEFAULT_DB_PATH, mmap: bool = True,
+              refresh: bool = True) -> GradeCube:
+    """
+    Load a saved cube, memory-mapping its arrays. With `refresh`, (re)build and save it first when
+    it is missing or its fingerprint no longer matches `db_path`.
+    """
+    meta_path = os.path.join(cube_dir, META_FILE)
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if refresh and os.path.exists(db_path):
+        engine = create_engine(f"sqlite:///{db_path}", echo=False, future=True)
+        try:
+            with engine.connect() as conn:
+                current = source_fingerprint(conn)
+        finally:
+            engine.dispose()
+        if meta is None or meta.get("fingerprint") != current or meta.get("grades") != GRADES:
+            print(f"[CUBE] Rebuilding {cube_dir} from {db_path}")
+            cube = build_cube(db_path)
+            cube.save(cube_dir)
+            return cube
+    if meta is None:
+        raise FileNotFoundError(f"No grade cube in {cube_dir}; build one with python -m src.analytics build")
+
+    mmap_mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(cube_dir, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+    depts = np.load(os.path.join(cube_dir, "depts.npy"))
+    return GradeCube(**arrays, depts=depts, fingerprint=meta.get("fingerprint"))
@@ -0,0 +1,47 @@
+"""
+Ingest the COURSE_INFO catalog JSON into course_catalog.
+
+    python -m src.catalog                # ingest new and changed files only
+    python -m src.catalog --full         # re-ingest every file
+
+Either way the catalog_mismatch reconciliation against the grade data is brought up to date.
+"""
+import argparse
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest the COURSE_INFO catalog files into the course_catalog table.')
+    parser.add_argument('--db', default='ProcessedData.db', help='Database file (default: ProcessedData.db).')
+    parser.add_argument('--course-info', metavar='DIR', help='COURSE_INFO directory (default: data-app/COURSE_INFO).')
+    parser.add_argument('--full', action='store_true', help='Re-ingest every file, even those whose hash is unchanged.')
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, text
+    from src.coordination.coordination import configure_sqlite
+    from db.Models import CatalogMismatch, CatalogSource, ChangeLog, CourseCatalog
+    from src.catalog.catalog import COURSE_INFO_DIR, ingest_catalog, refresh_course_documents
+    from src.catalog.mismatches import mismatch_counts, sync_catalog_mismatches
+    from src.publish.changes import record_changes
+
+    engine = configure_sqlite(create_engine(f"sqlite:///{args.db}", echo=False, future=True))
+    try:
+        CourseCatalog.metadata.create_all(engine, tables=[CourseCatalog.__table__, CatalogSource.__table__,
+                                                          CatalogMismatch.__table__, ChangeLog.__table__])
+        with engine.begin() as conn:
+            ingested = ingest_catalog(conn, args.course_info or COURSE_INFO_DIR, full=args.full)
+            refreshed = refresh_course_documents(conn, ingested["codes"]) if ingested["codes"] else 0
+            mismatches = sync_catalog_mismatches(conn)
+            record_changes(conn, "catalog", class_codes=ingested["codes"])
+            counts = mismatch_counts(conn)
+            courses = conn.execute(text("SELECT COUNT(*) FROM course_catalog")).scalar()
+        print(f"[CATALOG] {ingested['files']} files ingested, {ingested['removed']} removed, "
+              f"{refreshed} search documents refreshed; {courses} courses in the catalog")
+        print(f"[CATALOG] Mismatches +{mismatches['added']} -{mismatches['removed']}: {counts}")
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Course catalog ingestion: the COURSE_INFO JSON files -> course_catalog, one row per class code.
+
+Three kinds of file feed the table. From lowest to highest precedence they are:
+
+  * catalog/<subject>.json   the catalog foundation (title, description, credit hours)
+  * <term>/<term>.json       one term's courses with their requisites and restrictions; a newer
+                             term wins over an older one
+  * cumulative.json          the integrated record, i.e. the catalog foundation plus the newest
+                             term's requisites
+
+Each class code keeps the row of the highest ranked file that lists it, so a term file only
+supplies courses the integration left out. catalog/catalog.json and <term>/courses/*.json hold the
+same records as the files above and are not read.
+
+Files are streamed one course at a time. catalog_source records each file's size, mtime, sha256
+and scrapedAt: a file is only hashed when its size or mtime moved, and only re-ingested when its
+hash changed. Re-ingesting a file replaces the rows it owned. Codes it no longer lists fall back to
+the next file that does.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+from sqlalchemy import bindparam, text
+
+from db.Models import class_code_for
+from src.generation.term_index import file_sha256
+
+COURSE_INFO_DIR = Path(__file__).resolve().parents[2] / "COURSE_INFO"
+CUMULATIVE_FILE = "cumulative.json"
+# Aggregate of the per-subject catalog files (the per-course term files are a level deeper than the glob)
+SKIPPED_FILES = {"catalog/catalog.json"}
+TERM_FILE_RE = re.compile(r"^(\d{6})/\1\.json$")
+
+# source_rank of each kind of file; within the term files the term code breaks ties
+SOURCE_RANKS = {"catalog": 1, "term": 2, "cumulative": 3}
+# Rows per INSERT batch while streaming, and sources per IN (...) list
+INSERT_BATCH_SIZE = 500
+READ_CHUNK_SIZE = 1 << 16
+
+CATALOG_COLUMNS = [
+    "class_code", "course_id", "subject_code", "course_number", "title", "description", "credit_hours",
+    "prerequisites", "corequisites", "restrictions", "term", "last_updated", "source", "source_rank",
+]
+UPSERT_SQL = f"""
+    INSERT INTO course_catalog ({", ".join(CATALOG_COLUMNS)})
+    VALUES ({", ".join(f":{column}" for column in CATALOG_COLUMNS)})
+    ON CONFLICT (class_code) DO UPDATE SET
+        {", ".join(f"{column} = excluded.{column}" for column in CATALOG_COLUMNS[1:])}
+    WHERE (excluded.source_rank, COALESCE(excluded.term, '')) >= (course_catalog.source_rank, COALESCE(course_catalog.term, ''))
+"""
+
+# Term files spell requisites out ("CS 1331 Undergraduate Semester Minimum Grade of C"); cumulative.json
+# shortens them to "CS 1331 (Min. Grade: C)"
+LEVEL_GRADE_RE = re.compile(r"\s+(?:Undergraduate|Graduate) Semester(?: Minimum Grade of (\w+))?")
+RESTRICTION_RE = re.compile(r"^__(HEADER|DETAIL)_\d+__(.*)$", re.S)
+_decoder = json.JSONDecoder()
+_WHITESPACE_RE = re.compile(r"\s*")
+
+
+class _JSONStream:
+    """Reads a JSON document value by value, keeping only the current chunk in memory."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end of the file)."""
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {found!r}")
+        self.pos += 1
+
+    def skip(self, char: str) -> None:
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending the chunk may go on in the next one
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def stream_courses(path: Path, header: dict):
+    """Yield the entries of the top-level "courses" array of `path`; the other top-level keys land in `header`."""
+    with open(path, encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key == "courses":
+                stream.expect("[")
+                while stream.peek() != "]":
+                    yield stream.value()
+                    stream.skip(",")
+                stream.expect("]")
+            else:
+                header[key] = stream.value()
+            stream.skip(",")
+
+
+def source_files(course_info_dir: Path = COURSE_INFO_DIR) -> dict:
+    """{path relative to COURSE_INFO: (kind, term)} of every file course_catalog is built from."""
+    sources = {}
+    if (course_info_dir / CUMULATIVE_FILE).exists():
+        sources[CUMULATIVE_FILE] = ("cumulative", None)
+    for path in sorted(course_info_dir.glob("*/*.json")):
+        relative = path.relative_to(course_info_dir).as_posix()
+        term = TERM_FILE_RE.match(relative)
+        if term:
+            sources[relative] = ("term", term.group(1))
+        elif relative.startswith("catalog/") and relative not in SKIPPED_FILES:
+            sources[relative] = ("catalog", None)
+    return sources
+
+
+def requirement_text(value):
+    """Requisites of a term file in the cumulative.json wording; lists are converted item by item."""
+    if isinstance(value, list):
+        return [requirement_text(item) for item in value]
+    if not isinstance(value, str):
+        return value
+    text_value = LEVEL_GRADE_RE.sub(lambda match: f" (Min. Grade: {match.group(1)})" if match.group(1) else "", value)
+    return re.sub(r"\s{2,}", " ", text_value).strip()
+
+
+def restriction_lines(restrictions) -> list:
+    """Join the "__HEADER_n__"/"__DETAIL_n__" entries of a term file into one line per restriction."""
+    lines = []
+    for entry in restrictions or []:
+        match = RESTRICTION_RE.match(entry)
+        if match is None:
+            lines.append([entry, []])
+        elif match.group(1) == "HEADER" or not lines:
+            lines.append([match.group(2), []])
+        else:
+            lines[-1][1].append(match.group(2))
+    return [f"{header} {', '.join(details)}" if details else header for header, details in lines]
+
+
+def _json(value):
+    return None if value is None else json.dumps(value)
+
+
+def catalog_row(course: dict, source: str, kind: str, term) -> dict:
+    """course_catalog parameters of one course record, or None when it has no class code."""
+    code = class_code_for(course.get("subjectCode"), course.get("courseNumber"))
+    if not code:
+        return None
+    prerequisites, corequisites, restrictions = (course.get(key) for key in ("prerequisites", "corequisites", "restrictions"))
+    if kind == "term":
+        prerequisites, corequisites = requirement_text(prerequisites), requirement_text(corequisites)
+        restrictions = restriction_lines(restrictions)
+    return {
+        "class_code": code,
+        "course_id": course.get("courseId") or f"{course['subjectCode']} {course['courseNumber']}",
+        "subject_code": course.get("subjectCode"),
+        "course_number": course.get("courseNumber"),
+        "title": course.get("title"),
+        "description": course.get("description"),
+        "credit_hours": course.get("creditHours"),
+        "prerequisites": _json(prerequisites),
+        "corequisites": _json(corequisites),
+        "restrictions": _json(restrictions),
+        # cumulative.json gives "" for courses without term data
+        "term": term or course.get("term") or None,
+        "last_updated": course.get("lastUpdated"),
+        "source": source,
+        "source_rank": SOURCE_RANKS[kind],
+    }
+
+
+def _chunks(items: list, size: int = INSERT_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def ingest_file(conn, course_info_dir: Path, source: str, kind: str, term, only_codes=None) -> tuple:
+    """
+    Upsert the courses of one file (those in `only_codes`, when given). Returns (codes listed, header):
+    a row only replaces one of a lower or equal rank.
+    """
+    header, codes, batch = {}, set(), []
+    upsert = text(UPSERT_SQL)
+    for course in stream_courses(course_info_dir / source, header):
+        row = catalog_row(course, source, kind, term)
+        if row is None or (only_codes is not None and row["class_code"] not in only_codes):
+            continue
+        codes.add(row["class_code"])
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            conn.execute(upsert, batch)
+            batch = []
+    if batch:
+        conn.execute(upsert, batch)
+    return codes, header
+
+
+def scraped_at(header: dict):
+    return header.get("scrapedAt") or (header.get("catalogInfo") or {}).get("scrapedAt") or header.get("generatedAt")
+
+
+def changed_sources(conn, sources: dict, course_info_dir: Path, full: bool = False) -> tuple:
+    """
+    ({source: sha256} of files to (re-)ingest, [sources recorded but gone]). Files whose size and
+    mtime are unchanged are not hashed; hashed files that turn out unchanged get their new stat recorded.
+    """
+    recorded = {row.path: row for row in conn.execute(text("SELECT path, size, mtime_ns, sha256 FROM catalog_source"))}
+    changed = {}
+    for source in sources:
+        stat = os.stat(course_info_dir / source)
+        entry = recorded.get(source)
+        if not full and entry is not None and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            continue
+        sha256 = file_sha256(course_info_dir / source)
+        if not full and entry is not None and entry.sha256 == sha256:
+            conn.execute(text("UPDATE catalog_source SET size = :size, mtime_ns = :mtime_ns WHERE path = :path"),
+                         {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "path": source})
+            continue
+        changed[source] = sha256
+    return changed, sorted(set(recorded) - set(sources))
+
+
+def _owned_codes(conn, sources: list) -> set:
+    statement = text("SELECT class_code FROM course_catalog WHERE source IN :sources") \
+        .bindparams(bindparam("sources", expanding=True))
+    return {row[0] for chunk in _chunks(sources) for row in conn.execute(statement, {"sources": chunk})}
+
+
+def _titles(conn) -> dict:
+    return dict(conn.execute(text("SELECT class_code, title FROM course_catalog")).all())
+
+
+def _delete_sources(conn, sources: list) -> None:
+    for table, column in (("course_catalog", "source"), ("catalog_source", "path")):
+        statement = text(f"DELETE FROM {table} WHERE {column} IN :sources").bindparams(bindparam("sources", expanding=True))
+        for chunk in _chunks(sources):
+            conn.execute(statement, {"sources": chunk})
+
+
+def ingest_catalog(conn, course_info_dir: Path = COURSE_INFO_DIR, full: bool = False) -> dict:
+    """
+    Bring course_catalog up to date with the COURSE_INFO files. Returns {"files": files ingested,
+    "removed": files dropped, "courses": courses they list, "fallback": codes re-filled from other
+    files, "codes": class codes whose title changed}.
+    """
+    course_info_dir = Path(course_info_dir)
+    sources = source_files(course_info_dir)
+    changed, removed = changed_sources(conn, sources, course_info_dir, full)
+    result = {"files": len(changed), "removed": len(removed), "courses": 0, "fallback": 0, "codes": set()}
+    if not changed and not removed:
+        return result
+
+    titles_before = _titles(conn)
+    # Rows of changed and deleted files are rewritten from scratch
+    released = _owned_codes(conn, list(changed) + removed)
+    _delete_sources(conn, list(changed) + removed)
+    listed, ingested = set(), {}
+    for source, sha256 in changed.items():
+        kind, term = sources[source]
+        codes, header = ingest_file(conn, course_info_dir, source, kind, term)
+        listed |= codes
+        stat = os.stat(course_info_dir / source)
+        conn.execute(text("""
+            INSERT INTO catalog_source (path, kind, size, mtime_ns, sha256, scraped_at, courses)
+            VALUES (:path, :kind, :size, :mtime_ns, :sha256, :scraped_at, :courses)
+        """), {"path": source, "kind": kind, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+               "sha256": sha256, "scraped_at": scraped_at(header), "courses": len(codes)})
+        result["courses"] += len(codes)
+        files, courses, latest = ingested.get(kind, (0, 0, None))
+        ingested[kind] = (files + 1, courses + len(codes), max(filter(None, [latest, scraped_at(header)]), default=None))
+    for kind, (files, courses, latest) in ingested.items():
+        print(f"[CATALOG] Ingested {files} {kind} file{'s' if files != 1 else ''} ({courses} courses, scraped {latest or 'unknown'})")
+
+    # Codes only the rewritten files used to supply fall back to whichever other file lists them
+    orphaned = released - listed
+    if orphaned:
+        refilled = set()
+        for source, (kind, term) in sources.items():
+            if source not in changed:
+                refilled |= ingest_file(conn, course_info_dir, source, kind, term, orphaned)[0]
+        result["fallback"] = len(refilled)
+        print(f"[CATALOG] Re-filled {len(refilled)} courses no longer listed by their file; "
+              f"{len(orphaned - refilled)} left the catalog")
+    titles_after = _titles(conn)
+    result["codes"] = {code for code in released | listed if titles_before.get(code) != titles_after.get(code)}
+    return result
+
+
+def refresh_course_documents(conn, codes) -> int:
+    """Re-index the search documents of the classes with these codes, whose catalog title may have changed."""
+    from src.search.fts import sync_fts
+
+    statement = text("SELECT id FROM classdistribution WHERE class_code IN :codes") \
+        .bindparams(bindparam("codes", expanding=True))
+    class_ids = [row[0] for chunk in _chunks(sorted(codes)) for row in conn.execute(statement, {"codes": chunk})]
+    return sync_fts(conn, class_ids=class_ids).get("courses_fts", 0) if class_ids else 0
@@ -0,0 +1,54 @@
+"""
+Reconciliation of course_catalog against the grade data, kept in catalog_mismatch.
+
+Each row pairs a class code with one reason:
+
+  * missing_in_terms    catalog course without requisite data from any term file
+  * missing_in_catalog  course only known from a term file, not from the catalog
+  * no_grades           catalog course no grade CSV has ever listed
+  * not_in_catalog      graded class without a catalog entry
+
+The expected rows come from set operations (EXCEPT) over the indexed class codes of both tables.
+A sync writes only the difference against the stored rows, so it runs after every catalog ingest
+and every grade ingest at the cost of one pass over the codes.
+"""
+from sqlalchemy import text
+
+MISMATCH_REASONS = ["missing_in_terms", "missing_in_catalog", "no_grades", "not_in_catalog"]
+
+GRADED_CODES_SQL = "SELECT class_code FROM classdistribution WHERE class_code IS NOT NULL AND total_students > 0"
+MISMATCH_SQL = f"""
+    SELECT class_code, 'missing_in_terms' AS reason FROM course_catalog WHERE term IS NULL
+    UNION ALL
+    SELECT class_code, 'missing_in_catalog' FROM course_catalog WHERE source_rank = 2
+    UNION ALL
+    SELECT class_code, 'no_grades' FROM (SELECT class_code FROM course_catalog EXCEPT {GRADED_CODES_SQL})
+    UNION ALL
+    SELECT class_code, 'not_in_catalog' FROM ({GRADED_CODES_SQL} EXCEPT SELECT class_code FROM course_catalog)
+"""
+
+
+def sync_catalog_mismatches(conn) -> dict:
+    """Bring catalog_mismatch up to date. Returns {"added": rows inserted, "removed": rows deleted}."""
+    conn.execute(text(f"""
+        DELETE FROM catalog_mismatch WHERE (class_code, reason) IN (
+            SELECT class_code, reason FROM catalog_mismatch
+            EXCEPT
+            SELECT * FROM ({MISMATCH_SQL})
+        )
+    """))
+    removed = conn.execute(text("SELECT changes()")).scalar()
+    conn.execute(text(f"""
+        INSERT INTO catalog_mismatch (class_code, reason)
+        SELECT * FROM ({MISMATCH_SQL})
+        EXCEPT
+        SELECT class_code, reason FROM catalog_mismatch
+    """))
+    added = conn.execute(text("SELECT changes()")).scalar()
+    return {"added": added, "removed": removed}
+
+
+def mismatch_counts(conn) -> dict:
+    """{reason: rows} of every reason in MISMATCH_REASONS."""
+    counts = dict(conn.execute(text("SELECT reason, COUNT(*) FROM catalog_mismatch GROUP BY reason")).all())
+    return {reason: counts.get(reason, 0) for reason in MISMATCH_REASONS}
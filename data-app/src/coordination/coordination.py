@@ -0,0 +1,240 @@
+"""
+Write coordination for pipeline stages sharing ProcessedData.db.
+
+main.py, generate_summaries.py and python -m src.rmp may run at the same time against one
+database. Three pieces keep them from failing with "database is locked" or stepping on each other:
+
+  * configure_sqlite(): WAL journal (readers never block the writer), a busy timeout so a
+    writer waits for the lock instead of failing, and BEGIN IMMEDIATE so a write transaction takes
+    the write lock up front rather than failing when it upgrades from a stale read snapshot. A
+    writing session therefore holds the write lock until it commits or closes, so keep those short.
+    Connections from read_only() begin DEFERRED and take no write lock, so under WAL readers
+    (warmup, exports, statistics) neither wait for the writer nor hold it up
+  * stage_lock(): advisory file locks per resource, held for a whole stage, for work that must not
+    interleave (e.g. merging duplicate professors while ingestion references them)
+  * WriteQueue: one background writer that commits statements from any number of producers in
+    batches, so producers (e.g. RMP network workers) never wait on the database
+"""
+import contextlib
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from src.metrics import metrics, get_logger
+
+try:
+    import fcntl
+except ImportError:
+    # Advisory locks are POSIX-only; elsewhere stages rely on SQLite locking alone
+    fcntl = None
+
+DEFAULT_DB_PATH = "ProcessedData.db"
+BUSY_TIMEOUT_MS = 60000
+LOCK_POLL_SECONDS = 0.5
+WRITE_BATCH_SIZE = 200
+WRITE_FLUSH_SECONDS = 1.0
+MAX_WRITE_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 2
+
+# Resources guarded by stage_lock():
+#   professors - shared while ingestion references professor ids, exclusive while merging duplicates
+#   grades     - exclusive while ingesting term data, shared while summaries read it
+LOCK_RESOURCES = ("professors", "grades")
+
+log = get_logger("coordination")
+
+# Locks held by this process: {resource: [file object, mode, depth]}
+_held_locks = {}
+
+
+def configure_sqlite(engine):
+    """Enable WAL, a busy timeout and BEGIN IMMEDIATE transactions on a SQLite engine."""
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Let SQLAlchemy, not the sqlite3 module, decide when transactions begin
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        options = conn.get_execution_options()
+        if options.get("isolation_level") != "AUTOCOMMIT":
+            conn.exec_driver_sql("BEGIN" if options.get("read_only") else "BEGIN IMMEDIATE")
+
+    return engine
+
+
+def read_only(engine):
+    """
+    `engine` for jobs that only read: its transactions begin DEFERRED instead of IMMEDIATE, so they
+    read a WAL snapshot without taking the write lock. Use it for connect() or as a Session bind.
+    """
+    return engine.execution_options(read_only=True)
+
+
+@contextlib.contextmanager
+def stage_lock(resource: str, exclusive: bool = True, db_path: str = DEFAULT_DB_PATH, wait: bool = True):
+    """
+    Hold an advisory lock on `resource` of `db_path` for the duration of a stage.
+
+    Waits (printing once) while another process holds a conflicting lock; with wait=False it
+    yields False instead of waiting, and True once the lock is held. Nested locks on the same
+    resource in one process share the file handle. A shared lock is never upgraded: flock()
+    releases it before taking the exclusive one, so another process could get in between. A stage
+    that will need the exclusive lock has to take it from the start; asking for it while only a
+    shared one is held raises RuntimeError.
+    """
+    if resource not in LOCK_RESOURCES:
+        raise ValueError(f"Unknown lock resource {resource!r}; expected one of {LOCK_RESOURCES}")
+    if fcntl is None:
+        yield True
+        return
+
+    held = _held_locks.get(resource)
+    if held:
+        if exclusive and held[1] != fcntl.LOCK_EX:
+            raise RuntimeError(f"Exclusive '{resource}' lock requested while this process holds it shared; "
+                               f"take the exclusive lock from the start of the stage")
+        held[2] += 1
+        try:
+            yield True
+        finally:
+            held[2] -= 1
+        return
+
+    mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    lock_file = open(f"{db_path}.{resource}.lock", "a")
+    if not _acquire(lock_file, mode, resource, wait):
+        lock_file.close()
+        yield False
+        return
+    _held_locks[resource] = [lock_file, mode, 1]
+    try:
+        yield True
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+        del _held_locks[resource]
+
+
+def _acquire(lock_file, mode: int, resource: str, wait: bool) -> bool:
+    waited = False
+    start = time.perf_counter()
+    while True:
+        try:
+            fcntl.flock(lock_file, mode | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            if not wait:
+                return False
+            if not waited:
+                kind = "exclusive" if mode == fcntl.LOCK_EX else "shared"
+                print(f"[LOCK] Waiting for {kind} '{resource}' lock held by another stage...")
+                waited = True
+            time.sleep(LOCK_POLL_SECONDS)
+    if waited:
+        metrics.incr("locks.waits")
+        log.info("lock_acquired", resource=resource, waited_seconds=round(time.perf_counter() - start, 1))
+    return True
+
+
+class WriteQueue:
+    """
+    Single writer for statements produced anywhere in the process.
+
+    put() never blocks on the database: a background thread commits queued statements in batches
+    of up to `batch_size` (or whatever arrived within `flush_seconds`), retrying a batch that hits
+    a lock held by another process. Use as a context manager; leaving it drains the queue and
+    raises RuntimeError if any batch could not be committed. The `key` given to put() lands in
+    `committed` once its statement is committed, or in `failed` with the error otherwise, so
+    callers only report what really reached the database.
+    """
+
+    def __init__(self, session_factory, batch_size: int = WRITE_BATCH_SIZE, flush_seconds: float = WRITE_FLUSH_SECONDS):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.committed = []
+        self.failed = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Drain, but let the exception already on its way out win
+            self._drain()
+
+    def put(self, statement, key=None) -> None:
+        self._queue.put((statement, key))
+
+    def _drain(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def close(self) -> None:
+        self._drain()
+        if self.failed:
+            raise RuntimeError(f"{len(self.failed)} queued writes were not committed; first error: {self.failed[0][1]}")
+
+    def _run(self) -> None:
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch: list) -> None:
+        for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+            session = self.session_factory()
+            try:
+                for statement, _ in batch:
+                    session.execute(statement)
+                session.commit()
+                self.committed.extend(key for _, key in batch)
+                metrics.incr("writes.batches")
+                metrics.incr("writes.statements", len(batch))
+                return
+            except OperationalError as e:
+                session.rollback()
+                if "locked" not in str(e) or attempt == MAX_WRITE_ATTEMPTS:
+                    self._fail(batch, e)
+                    return
+                metrics.incr("writes.retries")
+                log.warning("write_batch_retry", attempt=attempt, statements=len(batch))
+                time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+            except Exception as e:
+                session.rollback()
+                self._fail(batch, e)
+                return
+            finally:
+                session.close()
+
+    def _fail(self, batch: list, error: Exception) -> None:
+        self.failed.extend((key, str(error)) for _, key in batch)
+        metrics.incr("writes.failed", len(batch))
+        log.error("write_batch_failed", statements=len(batch), error=str(error))
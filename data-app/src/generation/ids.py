@@ -0,0 +1,130 @@
+"""
+Stable ids for professors, classes and distributions, derived from what ingestion looks them up by,
+so a rebuild (--cleardb, a fresh ProcessedData.db, or a --terms purge and re-ingest) gives every
+entity the id it had before. /inst/<id> URLs, CDN entries and client caches keep pointing at the
+same rows, with nothing but the grade CSVs as input.
+
+A professor is keyed by canonical name, a class by class code, a distribution by its class code
+and instructor's canonical name. An id is a hash of the kind and key, below 2**53 so JavaScript
+reads it exactly. The registry file only holds the exceptions, by the row's exact name: a row whose
+hash was already taken (another spelling of the same canonical name, or a collision) and got a
+salted hash instead, and rows of a database built before derived ids. Each run first registers the
+database's exceptions, so an existing database keeps today's ids.
+"""
+import hashlib
+import json
+import os
+
+DEFAULT_REGISTRY_PATH = "id_registry.json"
+ID_SPACE = 2 ** 48
+# Registry kind -> table whose id column it assigns
+TABLES = {"professor": "professor", "class": "classdistribution", "distribution": "distribution"}
+# Rows of (id, key, exact name)
+KEYS_SQL = {
+    "professor": "SELECT id, canonical_name, name FROM professor WHERE canonical_name IS NOT NULL",
+    "class": "SELECT id, class_code, class_code FROM classdistribution WHERE class_code IS NOT NULL",
+    "distribution": """
+        SELECT d.id, c.class_code || ':' || COALESCE(p.canonical_name, ''), c.class_code || ':' || COALESCE(p.name, '')
+        FROM distribution d
+        JOIN classdistribution c ON c.id = d.class_id
+        LEFT JOIN professor p ON p.id = d.instructor_id
+        WHERE c.class_code IS NOT NULL
+    """,
+}
+
+
+def distribution_key(class_code, instructor_name) -> str:
+    """Key (or exact name) of the distribution of `class_code` taught by the instructor named `instructor_name`."""
+    return f"{class_code}:{instructor_name or ''}"
+
+
+def derived_id(kind: str, key: str, salt: int = 0) -> int:
+    digest = hashlib.blake2b(f"{kind}:{key}:{salt}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % ID_SPACE + 1
+
+
+class IdRegistry:
+    """Exact name -> id of the rows whose id is not their key's hash, per kind. Until load() is called it assigns nothing and inserts autoincrement."""
+
+    def __init__(self):
+        self.path = None
+        self.ids = {kind: {} for kind in TABLES}
+        # Ids handed out by this process, as rows still pending in a session are not in the database yet
+        self.assigned = {kind: set() for kind in TABLES}
+        # Ids in the database at sync(); ingestion holds the lock, so only this process adds rows since
+        self.db_ids = {kind: set() for kind in TABLES}
+        self.dirty = False
+
+    def load(self, path: str = DEFAULT_REGISTRY_PATH) -> None:
+        self.path = path
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            stored = {}
+        self.ids = {kind: dict(stored.get(kind, {})) for kind in TABLES}
+        self.assigned = {kind: set() for kind in TABLES}
+        self.db_ids = {kind: set() for kind in TABLES}
+        self.dirty = False
+
+    def sync(self, conn) -> int:
+        """
+        Register the database's rows whose id is not their key's hash, and drop entries of rows that
+        have it; the database being served is what URLs point at, so it wins over an older entry.
+        Returns the number of entries added, changed or dropped.
+        """
+        from sqlalchemy import text
+
+        updated = 0
+        for kind, sql in KEYS_SQL.items():
+            self.db_ids[kind] = {row[0] for row in conn.execute(text(f"SELECT id FROM {TABLES[kind]}"))}
+            for entity_id, key, name in conn.execute(text(sql)):
+                if entity_id != derived_id(kind, key):
+                    if self.ids[kind].get(name) != entity_id:
+                        self.ids[kind][name] = entity_id
+                        updated += 1
+                elif self.ids[kind].pop(name, None) is not None:
+                    updated += 1
+        self.dirty = self.dirty or updated > 0
+        return updated
+
+    def _in_use(self, conn, kind: str, entity_id: int) -> bool:
+        from sqlalchemy import text
+
+        if entity_id in self.assigned[kind]:
+            return True
+        if entity_id not in self.db_ids[kind]:
+            return False
+        # Rows purged since sync() free their ids again
+        return conn.execute(text(f"SELECT 1 FROM {TABLES[kind]} WHERE id = :id"), {"id": entity_id}).first() is not None
+
+    def assign(self, conn, kind: str, key, name=None):
+        """
+        Id for a new row of `kind` keyed `key` and named exactly `name` (default: the key), or None
+        (autoincrement) when no registry is loaded. A taken id moves on to the key's next salted
+        hash, which is registered under the name so a rebuild gives the row the same one.
+        """
+        if self.path is None or key is None:
+            return None
+        name = key if name is None else name
+        entity_id = self.ids[kind].get(name, derived_id(kind, key))
+        salt = 0
+        while self._in_use(conn, kind, entity_id):
+            salt += 1
+            entity_id = derived_id(kind, key, salt)
+        if salt:
+            self.ids[kind][name] = entity_id
+            self.dirty = True
+        self.assigned[kind].add(entity_id)
+        return entity_id
+
+    def save(self) -> None:
+        if self.path is None or not self.dirty:
+            return
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(self.ids, f, indent=1, sort_keys=True)
+        os.replace(f"{self.path}.tmp", self.path)
+        self.dirty = False
+
+
+ids = IdRegistry()
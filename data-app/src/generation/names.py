@@ -0,0 +1,50 @@
+"""
+Instructor name normalization shared by preprocessing, ingestion and RMP matching.
+
+canonical_name() is the matching key stored in professor.canonical_name: whitespace collapsed,
+academic titles and generational suffixes dropped, lowercased. The *_names() variants apply the
+same rules to a whole pandas Series with vectorized string operations.
+"""
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only for annotations: the functions take Series but never need pandas itself
+    import pandas as pd
+
+# Titles must be whole words, so "Drew" and "Professor" are not cut to "ew" and "essor"
+TITLE_PATTERN = re.compile(r'\b(dr|prof|professor)\b\.?\s*', flags=re.IGNORECASE)
+SUFFIX_PATTERN = re.compile(r'\s+(jr|sr|ii|iii|iv)\.?$', flags=re.IGNORECASE)
+
+
+def canonical_name(name: str) -> str:
+    """Clean and normalize a name for matching purposes only."""
+    if not name:
+        return ""
+    name = " ".join(name.split())
+    name = TITLE_PATTERN.sub('', name)
+    name = SUFFIX_PATTERN.sub('', name)
+    return " ".join(name.split()).lower()
+
+
+def canonical_names(names: "pd.Series") -> "pd.Series":
+    """canonical_name() over a Series; missing names become ""."""
+    names = names.fillna("").astype(str).str.split().str.join(" ")
+    names = names.str.replace(TITLE_PATTERN, '', regex=True).str.replace(SUFFIX_PATTERN, '', regex=True)
+    return names.str.split().str.join(" ").str.lower()
+
+
+def flip_last_first_names(names: "pd.Series") -> "pd.Series":
+    """
+    Convert "Last, First" names to "First Last", stripping surrounding quotes; names without a
+    comma are only stripped and missing values are kept.
+    """
+    if names.dtype != object:
+        return names
+    stripped = names.str.strip('"\'')
+    parts = stripped.str.split(',', n=1, expand=True)
+    if parts.shape[1] < 2:
+        return stripped.where(stripped.notna(), names)
+    flipped = parts[1].str.strip() + " " + parts[0].str.strip()
+    # Values that are not strings (NaN) come back from .str as NaN; keep the originals
+    return stripped.where(parts[1].isna(), flipped).where(stripped.notna(), names)
@@ -1,7 +1,17 @@
 import pandas as pd
-from db.Models import Session, ClassDistribution, DepartmentDistribution, Professor, Distribution, Libed, TermDistribution, and_
+from sqlalchemy import bindparam, text
+from db.Models import Session, ClassDistribution, class_code_for, DepartmentDistribution, Professor, Distribution, Libed, TermDistribution, and_
 from collections import Counter
-from mapping.mappings import term_to_name, dept_mapping, libed_mapping
+from mapping.mappings import GRADES, term_to_name, dept_mapping, libed_mapping
+from src.metrics import metrics, get_logger
+from src.generation.ids import ids, distribution_key
+from src.generation.names import canonical_name
+from src.publish.changes import changes, record_changes
+
+log = get_logger("process")
+
+# Names per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
 
 class Process:
     @staticmethod
@@ -61,39 +71,50 @@ class Process:
                     total = x[col].apply(pd.to_numeric, errors='coerce').fillna(0).sum()
                     grade_hash[grade] = int(round(total))
         except Exception as e:
-            print(f"Warning: Error processing grade data: {e}")
+            metrics.incr("dist.grade_errors")
+            log.warning("grade_data_error", error=str(e))
             # Keep default grade_hash values (all zeros)
         
         # Calculate total students from the sum of all grade counts
         num_students = int(sum(int(v) for v in grade_hash.values() if not pd.isna(v)))
         
         # Begin Insertion
-        class_dist = session.query(ClassDistribution).filter(and_(ClassDistribution.dept_abbr == dept_abbr, ClassDistribution.course_num == catalog_num, ClassDistribution.campus == campus)).first()
+        class_code = class_code_for(dept_abbr, catalog_num)
+        class_dist = session.query(ClassDistribution).filter(ClassDistribution.class_code == class_code).first()
         dept = session.query(DepartmentDistribution).filter(and_(DepartmentDistribution.dept_abbr == dept_abbr, DepartmentDistribution.campus == campus)).first()
-        prof = session.query(Professor).filter(Professor.name == prof_name).first() or session.query(Professor).filter(Professor.name == "Unknown Instructor").first()
+        prof = session.query(Professor).filter(Professor.by_name(prof_name)).first() or session.query(Professor).filter(Professor.by_name("Unknown Instructor")).first()
         
+        metrics.incr("dist.groups")
+        metrics.incr("dist.rows", len(x))
+
         if class_dist == None:
-            class_dist = ClassDistribution(campus=campus, dept_abbr=dept_abbr, course_num=catalog_num, class_desc=class_descr, total_students=num_students, total_grades=grade_hash)
+            class_dist = ClassDistribution(id=ids.assign(session, "class", class_code), campus=campus, dept_abbr=dept_abbr, course_num=catalog_num, class_desc=class_descr, total_students=num_students, total_grades=grade_hash)
             session.add(class_dist)
             session.flush()
-            print(f"[DIST Create] Created New Class Distribution {class_dist.dept_abbr} {class_dist.course_num}")
+            metrics.incr("class.created")
+            log.debug("class_created", dept=dept_abbr, course=catalog_num)
         else:
             class_dist.total_grades = Counter(class_dist.total_grades) + Counter(grade_hash)
             class_dist.total_students += num_students
-            print(f"[DIST Update] Updated Class Distribution {class_dist.dept_abbr} {class_dist.course_num}")
+            metrics.incr("class.updated")
+            log.debug("class_updated", dept=dept_abbr, course=catalog_num)
 
         dist = session.query(Distribution).filter(
             Distribution.class_id == class_dist.id,
-            Distribution.professor_id == prof.id
+            Distribution.instructor_id == prof.id
         ).first()
 
         if dist is None:
-            dist = Distribution(class_id=class_dist.id, professor_id=prof.id)
+            dist = Distribution(id=ids.assign(session, "distribution", distribution_key(class_code, prof.canonical_name),
+                                               distribution_key(class_code, prof.name)),
+                                class_id=class_dist.id, instructor_id=prof.id)
             session.add(dist)
             session.flush()
-            print(f"[DIST Create] Created New Distribution {prof_name}:{class_dist.dept_abbr} {class_dist.course_num}")
+            metrics.incr("distribution.created")
+            log.debug("distribution_created", instructor=prof_name, dept=dept_abbr, course=catalog_num)
         else:
-            print(f"[DIST Update] Using Existing Distribution {prof_name}:{class_dist.dept_abbr} {class_dist.course_num}")
+            metrics.incr("distribution.reused")
+            log.debug("distribution_reused", instructor=prof_name, dept=dept_abbr, course=catalog_num)
 
         # Upsert the per-term distribution for this distribution
         term_dist = session.query(TermDistribution).filter(
@@ -109,41 +130,131 @@ class Process:
                 grades=grade_hash,
             )
             session.add(term_dist)
-            print(f"[TERM Create] Created New Term Distribution for {term_to_name(term)}")
+            metrics.incr("term.created")
+            log.debug("term_created", term=term_to_name(term), dist_id=dist.id)
         else:
             term_dist.grades = Counter(term_dist.grades) + Counter(grade_hash)
             term_dist.students += num_students
-            print(f"[TERM Update] Updated Term Distribution for {term_to_name(term)}")
+            metrics.incr("term.updated")
+            log.debug("term_updated", term=term_to_name(term), dist_id=dist.id)
 
+        changes.touch(class_codes=[class_code], professor_ids=[prof.id], dept_abbrs=[dept_abbr])
         session.commit()
         session.close()
         return x
 
+    @staticmethod
+    def purge_terms(terms: list[int]) -> dict:
+        """
+        Delete all grade data for the given terms in one transaction.
+
+        Removes the terms' TermDistribution rows, drops distributions left without any term, and
+        recomputes total_students/total_grades of the affected classes from their remaining terms.
+        Returns the number of term rows, distributions and classes touched, and the affected
+        class and instructor ids.
+        """
+        terms_param = {"terms": [int(term) for term in terms]}
+        session = Session()
+        try:
+            affected = session.execute(text("""
+                SELECT DISTINCT d.class_id, d.instructor_id FROM termdistribution t JOIN distribution d ON d.id = t.dist_id
+                WHERE t.term IN :terms
+            """).bindparams(bindparam("terms", expanding=True)), terms_param).all()
+            class_ids = sorted({class_id for class_id, _ in affected})
+            instructor_ids = sorted({instructor_id for _, instructor_id in affected if instructor_id is not None})
+            term_rows = session.execute(text(
+                "DELETE FROM termdistribution WHERE term IN :terms"
+            ).bindparams(bindparam("terms", expanding=True)), terms_param).rowcount
+
+            classes_param = {"class_ids": class_ids}
+            empty_dists = session.execute(text("""
+                DELETE FROM distribution WHERE class_id IN :class_ids
+                AND NOT EXISTS (SELECT 1 FROM termdistribution t WHERE t.dist_id = distribution.id)
+            """).bindparams(bindparam("class_ids", expanding=True)), classes_param).rowcount
+
+            grade_sums = ", ".join(f"'{grade}', COALESCE(SUM(json_extract(t.grades, '$.{grade}')), 0)" for grade in GRADES)
+            session.execute(text(f"""
+                UPDATE classdistribution SET
+                    total_students = (
+                        SELECT COALESCE(SUM(t.students), 0) FROM distribution d
+                        JOIN termdistribution t ON t.dist_id = d.id WHERE d.class_id = classdistribution.id
+                    ),
+                    total_grades = (
+                        SELECT json_object({grade_sums}) FROM distribution d
+                        JOIN termdistribution t ON t.dist_id = d.id WHERE d.class_id = classdistribution.id
+                    )
+                WHERE id IN :class_ids
+            """).bindparams(bindparam("class_ids", expanding=True)), classes_param)
+            record_changes(session, "purge", class_ids=class_ids, professor_ids=instructor_ids)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        metrics.incr("overwrite.term_rows_deleted", term_rows)
+        metrics.incr("overwrite.distributions_deleted", empty_dists)
+        metrics.incr("overwrite.classes_recomputed", len(class_ids))
+        return {"term_rows": term_rows, "distributions": empty_dists, "classes": len(class_ids),
+                "class_ids": class_ids, "instructor_ids": instructor_ids}
+
     @staticmethod
     def process_prof(prof_name: str) -> None:
         """
         Process a professor, generating them in the DB if they do not exist.
         """
         session = Session()
-        prof = session.query(Professor).filter(Professor.name == prof_name).first()
+        prof = session.query(Professor).filter(Professor.by_name(prof_name)).first()
         if prof == None:
-            prof = Professor(name=prof_name)
+            prof = Professor(id=ids.assign(session, "professor", canonical_name(prof_name), prof_name), name=prof_name)
             session.add(prof)
+            session.flush()
+            changes.touch(professor_ids=[prof.id])
             session.commit()
-            print(f"[PROF Create] Added {prof_name} to Professors")
+            metrics.incr("professor.created")
+            log.debug("professor_created", name=prof_name)
         session.close()
 
+    @staticmethod
+    def process_profs(prof_names) -> int:
+        """
+        Create every professor in `prof_names` that does not exist yet, in one transaction.
+        Existing names are found through the canonical-name index. Returns the number created.
+        """
+        names = {name for name in prof_names if name and not pd.isna(name)}
+        if not names:
+            return 0
+        session = Session()
+        try:
+            existing = set()
+            canonical = sorted({canonical_name(name) for name in names})
+            for start in range(0, len(canonical), LOOKUP_CHUNK_SIZE):
+                chunk = canonical[start:start + LOOKUP_CHUNK_SIZE]
+                existing.update(row[0] for row in session.query(Professor.name).filter(Professor.canonical_name.in_(chunk)))
+            new_names = sorted(names - existing)
+            new_profs = [Professor(id=ids.assign(session, "professor", canonical_name(name), name), name=name) for name in new_names]
+            session.add_all(new_profs)
+            session.flush()
+            changes.touch(professor_ids=[prof.id for prof in new_profs])
+            session.commit()
+        finally:
+            session.close()
+        metrics.incr("professor.created", len(new_names))
+        log.debug("professors_created", count=len(new_names))
+        return len(new_names)
+
     @staticmethod
     def process_dept(dept_tuple: tuple[str, str]) -> None:
         # Process a department, generating in DB if they do not exist. If department isn't in dept_mapping, it will be created with its abbreviation as the name.
         campus, dept_abbr = dept_tuple
         if campus not in dept_mapping:
-            print(f"[WARNING] Campus {campus} not found in dept_mapping, using campus code as name")
+            log.warning("campus_not_mapped", campus=campus)
             # Create a new campus entry if it doesn't exist
             dept_mapping[campus] = {}
         
         if dept_abbr not in dept_mapping[campus]:
-            print(f"[WARNING] Department {dept_abbr} not found in dept_mapping for campus {campus}, using abbreviation as name")
+            log.warning("department_not_mapped", dept=dept_abbr, campus=campus)
             # Use the department abbreviation as the department name if not in mapping
             dept_mapping[campus][dept_abbr] = dept_abbr
 
@@ -158,7 +269,9 @@ class Process:
             )
             session.add(dept)
             session.commit()
-            print(f"[DEPT Create] Added {dept_abbr} to Departments")
+            changes.touch(dept_abbrs=[dept_abbr])
+            metrics.incr("department.created")
+            log.info("department_created", dept=dept_abbr)
         session.close()
 
     @staticmethod
@@ -172,6 +285,6 @@ class Process:
             if libed == None:
                 libed = Libed(name=value, abbr=key)
                 session.add(libed)
-                print(f"[LIBED Create] Added {key} to Libeds")
+                log.info("libed_created", libed=key)
         session.commit()
         session.close()
\ No newline at end of file
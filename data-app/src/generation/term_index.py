@@ -0,0 +1,106 @@
+"""
+Cached index of the grade CSVs: file name -> term code, content hash and the hash last ingested.
+
+Lets main.py pick files by term (--terms 201608..202508, --since 202402) or by content change
+(--changed) without opening every CSV. Entries are re-read only when a file's size or mtime moved.
+"""
+import hashlib
+import json
+import os
+
+INDEX_FILE = ".term_index.json"
+TERM_COLUMNS = ["Term", "term_code"]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_term(path: str) -> int:
+    """Term code of a grade CSV, from the first data row (every row of a file is one term)."""
+    # Imported here so parse_term_range() users (e.g. --help of the CLIs) do not pay for pandas
+    import pandas as pd
+
+    df_sample = pd.read_csv(path, nrows=1)
+    for column in TERM_COLUMNS:
+        if column in df_sample.columns and not df_sample[column].empty:
+            return int(float(df_sample[column].iloc[0]))
+    return None
+
+
+def load_term_index(data_dir: str) -> dict:
+    path = os.path.join(data_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_term_index(data_dir: str, index: dict) -> None:
+    path = os.path.join(data_dir, INDEX_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def refresh_term_index(data_dir: str) -> dict:
+    """Bring the index up to date with the CSVs in `data_dir` and return it.
+
+    Files whose size and mtime match their entry are not opened; new or modified files are
+    re-read for their term and re-hashed, and entries of deleted files are dropped.
+    """
+    index = load_term_index(data_dir)
+    refreshed = {}
+    for filename in sorted(f for f in os.listdir(data_dir) if f.endswith(".csv")):
+        path = os.path.join(data_dir, filename)
+        stat = os.stat(path)
+        entry = index.get(filename, {})
+        if entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+            try:
+                term = read_term(path)
+            except Exception as e:
+                print(f"[WARNING] Could not determine term code from {path}: {str(e)}")
+                term = None
+            entry = dict(entry, term=term, sha256=file_sha256(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        refreshed[filename] = entry
+    if refreshed != index:
+        save_term_index(data_dir, refreshed)
+    return refreshed
+
+
+def mark_ingested(data_dir: str, filename: str) -> None:
+    """Record the file's current content as ingested (the preprocessor rewrites files in place)."""
+    index = refresh_term_index(data_dir)
+    if filename in index:
+        index[filename]["ingested_sha256"] = index[filename]["sha256"]
+        save_term_index(data_dir, index)
+
+
+def parse_term_range(spec: str) -> tuple:
+    """Parse "201608..202508", "201608.." , "..202508" or a single "202502" into (first, last); None is open."""
+    if ".." not in spec:
+        return int(spec), int(spec)
+    first, last = spec.split("..", 1)
+    return (int(first) if first else None), (int(last) if last else None)
+
+
+def select_files(index: dict, term_range: tuple = None, changed: bool = False) -> list:
+    """File names whose term falls in `term_range` and, with `changed`, whose content differs from the last ingest."""
+    selected = []
+    for filename, entry in sorted(index.items()):
+        term = entry.get("term")
+        if term_range is not None:
+            first, last = term_range
+            if term is None or (first is not None and term < first) or (last is not None and term > last):
+                continue
+        if changed and entry.get("ingested_sha256") == entry.get("sha256"):
+            continue
+        selected.append(filename)
+    return selected
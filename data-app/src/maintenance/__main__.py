@@ -0,0 +1,39 @@
+"""
+Run the SQLite maintenance stage on its own.
+
+    python -m src.maintenance
+    python -m src.maintenance --vacuum always --db ProcessedData.db
+"""
+import argparse
+import sys
+
+from src.maintenance.maintenance import (
+    DEFAULT_DB_PATH, DEFAULT_FRAGMENTATION_THRESHOLD, DEFAULT_FREELIST_THRESHOLD, run_maintenance,
+)
+from src.metrics import metrics, configure_logging, add_metrics_arguments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ANALYZE/optimize, sync stale FTS documents and VACUUM when worthwhile.')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Database file (default: ProcessedData.db).')
+    parser.add_argument('--vacuum', default='auto', choices=['auto', 'always', 'never'],
+                        help='VACUUM only past the thresholds (auto), unconditionally, or never.')
+    parser.add_argument('--freelist-threshold', type=float, default=DEFAULT_FREELIST_THRESHOLD,
+                        help='Free page ratio at which to VACUUM.')
+    parser.add_argument('--fragmentation-threshold', type=float, default=DEFAULT_FRAGMENTATION_THRESHOLD,
+                        help='Share of out-of-order b-tree pages at which to VACUUM.')
+    parser.add_argument('--skip-fts', action='store_true', help='Do not check or sync the FTS5 tables.')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    configure_logging(args.log_level, args.log_json)
+    try:
+        run_maintenance(args.db, args.vacuum, args.freelist_threshold, args.fragmentation_threshold,
+                        rebuild_fts=not args.skip_fts)
+    finally:
+        metrics.write_report("maintenance", args.metrics_out, args.prometheus_out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
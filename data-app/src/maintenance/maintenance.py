@@ -0,0 +1,169 @@
+"""
+Post-write SQLite maintenance for ProcessedData.db.
+
+Refreshes planner statistics, adds and removes FTS5 documents of entities that appeared or
+disappeared, and VACUUMs only when the free-page ratio or b-tree fragmentation makes it worthwhile. Runs on its own (python -m src.maintenance)
+and at the end of main.py, generate_summaries.py and python -m src.rmp.
+"""
+import os
+
+from src.metrics import metrics, get_logger
+
+# SQLAlchemy and the FTS helpers are imported where they are used: every entry point imports this
+# module for add_maintenance_arguments(), and --help should not pay for them
+
+DEFAULT_DB_PATH = "ProcessedData.db"
+# VACUUM when at least this share of pages is free, or this share of b-tree pages is out of order
+DEFAULT_FREELIST_THRESHOLD = 0.10
+DEFAULT_FRAGMENTATION_THRESHOLD = 0.30
+# Databases smaller than this are not worth vacuuming
+MIN_VACUUM_BYTES = 1024 * 1024
+# Re-ANALYZE a table when its row count moved this much since the last statistics
+STALE_STATS_RATIO = 0.25
+
+log = get_logger("maintenance")
+
+
+def database_size(db_path: str) -> int:
+    """Size of the database including its WAL file."""
+    return sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+
+
+def page_stats(conn) -> dict:
+    from sqlalchemy import text
+
+    page_count = conn.execute(text("PRAGMA page_count")).scalar()
+    freelist_count = conn.execute(text("PRAGMA freelist_count")).scalar()
+    return {
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "freelist_ratio": round(freelist_count / page_count, 4) if page_count else 0.0,
+    }
+
+
+def fragmentation(conn) -> float:
+    """Share of b-tree pages not stored directly after the previous page of the same b-tree.
+
+    Needs the dbstat virtual table; returns None when SQLite was built without it.
+    """
+    from sqlalchemy import text
+
+    try:
+        rows = conn.execute(text("SELECT name, pageno FROM dbstat ORDER BY name, path")).all()
+    except Exception:
+        return None
+    out_of_order = 0
+    previous = (None, None)
+    for name, pageno in rows:
+        if name == previous[0] and pageno != previous[1] + 1:
+            out_of_order += 1
+        previous = (name, pageno)
+    return round(out_of_order / len(rows), 4) if rows else 0.0
+
+
+def stale_statistics(conn) -> list:
+    """Tables without sqlite_stat1 rows, or whose row count drifted since the last ANALYZE."""
+    from sqlalchemy import text
+
+    tables = [row[0] for row in conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'"
+        " AND name NOT LIKE '%_fts_%'"
+    ))]
+    has_stats = conn.execute(text("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")).scalar()
+    if not has_stats:
+        return tables
+    recorded = {}
+    for table, stat in conn.execute(text("SELECT tbl, stat FROM sqlite_stat1")):
+        # The first number of a stat entry is the row count the statistics were computed from
+        recorded[table] = max(recorded.get(table, 0), int(stat.split()[0]))
+    stale = []
+    for table in tables:
+        rows = conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+        if table not in recorded:
+            if rows:
+                stale.append(table)
+        elif abs(rows - recorded[table]) > STALE_STATS_RATIO * max(recorded[table], 1):
+            stale.append(table)
+    return stale
+
+
+def run_maintenance(db_path: str = DEFAULT_DB_PATH, vacuum: str = "auto",
+                    freelist_threshold: float = DEFAULT_FREELIST_THRESHOLD,
+                    fragmentation_threshold: float = DEFAULT_FRAGMENTATION_THRESHOLD,
+                    rebuild_fts: bool = True) -> dict:
+    """
+    Run the maintenance stage and return a report of what was measured and done.
+
+    `vacuum` is "auto" (only past the thresholds), "always" or "never".
+    """
+    from sqlalchemy import create_engine, text
+    from src.coordination.coordination import configure_sqlite, stage_lock
+    from src.search.fts import sync_stale_fts
+
+    if not os.path.exists(db_path):
+        print(f"[MAINT] {db_path} does not exist, skipping maintenance")
+        return {}
+
+    engine = configure_sqlite(create_engine(f"sqlite:///{db_path}", echo=False, future=True))
+    report = {"db_path": db_path, "size_before": database_size(db_path), "actions": []}
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            with metrics.stage("maintenance_inspect"):
+                report["before"] = page_stats(conn)
+                report["fragmentation"] = fragmentation(conn)
+            print(f"[MAINT] {report['size_before'] / 1e6:.1f} MB, {report['before']['freelist_count']} free pages "
+                  f"({report['before']['freelist_ratio']:.1%}), fragmentation {report['fragmentation']}")
+
+            if rebuild_fts:
+                with metrics.stage("maintenance_fts"):
+                    conn.execute(text("BEGIN IMMEDIATE"))
+                    synced = sync_stale_fts(conn)
+                    conn.execute(text("COMMIT"))
+                    for table, documents in synced.items():
+                        metrics.incr("maintenance.fts_documents", documents)
+                        report["actions"].append(f"sync {table}")
+                        print(f"[MAINT] Synced {documents} {table} documents")
+
+            with metrics.stage("maintenance_analyze"):
+                stale = stale_statistics(conn)
+                if stale:
+                    conn.execute(text("ANALYZE"))
+                    report["actions"].append("analyze")
+                    print(f"[MAINT] ANALYZE (stale statistics: {', '.join(stale)})")
+                else:
+                    conn.execute(text("PRAGMA optimize"))
+                    report["actions"].append("optimize")
+                    log.debug("statistics_current")
+
+            worthwhile = (report["before"]["freelist_ratio"] >= freelist_threshold
+                          or (report["fragmentation"] or 0) >= fragmentation_threshold)
+            if vacuum == "always" or (vacuum == "auto" and worthwhile and report["size_before"] >= MIN_VACUUM_BYTES):
+                # VACUUM rewrites the whole file; leave it for the next run if another stage is writing
+                with stage_lock("professors", db_path=db_path, wait=False) as professors_free, \
+                        stage_lock("grades", db_path=db_path, wait=False) as grades_free:
+                    if professors_free and grades_free:
+                        with metrics.stage("maintenance_vacuum"):
+                            conn.execute(text("VACUUM"))
+                        report["actions"].append("vacuum")
+                        metrics.incr("maintenance.vacuums")
+                        print("[MAINT] VACUUM completed")
+                    else:
+                        print("[MAINT] Skipping VACUUM: another stage holds a write lock")
+
+            # Fold the WAL back into the main file so the size report reflects the database itself
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+            report["after"] = page_stats(conn)
+    finally:
+        engine.dispose()
+
+    report["size_after"] = database_size(db_path)
+    metrics.incr("maintenance.bytes_reclaimed", max(report["size_before"] - report["size_after"], 0))
+    print(f"[MAINT] Size {report['size_before'] / 1e6:.1f} MB -> {report['size_after'] / 1e6:.1f} MB "
+          f"({', '.join(report['actions'])})")
+    return report
+
+
+def add_maintenance_arguments(parser) -> None:
+    """Add --skip-maintenance to entry points that chain the maintenance stage."""
+    parser.add_argument('--skip-maintenance', action='store_true',
+                        help='Do not run ANALYZE/FTS sync/conditional VACUUM after writing.')
@@ -0,0 +1,2 @@
+from .metrics import metrics, Metrics, get_logger, configure_logging, add_metrics_arguments, to_prometheus
+from .profiling import profiler, add_profile_arguments, start_profiling, finish_profiling, compare_profiles
@@ -0,0 +1,176 @@
+"""
+Pipeline instrumentation: leveled structured logging, counters and per-stage timers.
+
+Entry points (main.py, generate_summaries.py, python -m src.rmp) record into the
+process-wide `metrics` registry and write a JSON report, plus an optional
+Prometheus textfile, when they finish.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from .profiling import profiler
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+DEFAULT_METRICS_DIR = "metrics"
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as `LEVEL [logger] event key=value ...` or as one JSON object per line."""
+
+    def __init__(self, json_lines: bool = False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", {})
+        if self.json_lines:
+            return json.dumps({
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }, default=str)
+        pairs = " ".join(f"{key}={value!r}" if isinstance(value, str) and " " in value else f"{key}={value}"
+                         for key, value in fields.items())
+        return f"{record.levelname} [{record.name}] {record.getMessage()}" + (f" {pairs}" if pairs else "")
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger adapter that turns keyword arguments into structured fields: log.debug("event", key=value)."""
+
+    def process(self, msg, kwargs):
+        reserved = {"exc_info", "stack_info", "stacklevel", "extra"}
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in reserved}
+        kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Return a structured logger under the `pipeline` namespace."""
+    return StructuredLogger(logging.getLogger(f"pipeline.{name}"), {})
+
+
+def configure_logging(level: str = "INFO", json_lines: bool = False) -> None:
+    """Configure the `pipeline` logger hierarchy. Logs go to stdout so they interleave with print() banners."""
+    root = logging.getLogger("pipeline")
+    root.setLevel(level.upper())
+    root.handlers.clear()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter(json_lines))
+    root.addHandler(handler)
+    root.propagate = False
+
+
+class Metrics:
+    """Counters and per-stage wall/CPU timers for a single pipeline run."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.counters = Counter()
+        self.stages = {}
+        self.started_at = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def merge(self, counters: dict) -> None:
+        """Fold counters recorded elsewhere (e.g. in a worker process) into this registry."""
+        self.counters.update(counters)
+
+    def snapshot(self) -> dict:
+        return dict(self.counters)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage (and profile it under --profile). Re-entering the same stage accumulates into one entry."""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with profiler.profile(name):
+                yield
+        finally:
+            entry = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            entry["calls"] += 1
+            entry["wall_seconds"] += time.perf_counter() - wall_start
+            entry["cpu_seconds"] += time.process_time() - cpu_start
+
+    def report(self, run_name: str) -> dict:
+        return {
+            "run": run_name,
+            "started_at": self.started_at,
+            "wall_seconds": round(time.perf_counter() - self._wall_start, 6),
+            "cpu_seconds": round(time.process_time() - self._cpu_start, 6),
+            "counters": dict(sorted(self.counters.items())),
+            "stages": {
+                name: {key: round(value, 6) if isinstance(value, float) else value for key, value in entry.items()}
+                for name, entry in self.stages.items()
+            },
+        }
+
+    def write_report(self, run_name: str, path: str = None, prometheus_path: str = None) -> dict:
+        """Write the JSON report (default: metrics/<run_name>.json) and optionally a Prometheus textfile."""
+        report = self.report(run_name)
+        path = path or os.path.join(DEFAULT_METRICS_DIR, f"{run_name}.json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        if prometheus_path:
+            os.makedirs(os.path.dirname(prometheus_path) or ".", exist_ok=True)
+            # Write then rename so node_exporter's textfile collector never reads a partial file
+            tmp_path = f"{prometheus_path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(to_prometheus(report))
+            os.replace(tmp_path, prometheus_path)
+        return report
+
+
+def _prometheus_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def to_prometheus(report: dict) -> str:
+    """Render a metrics report in the Prometheus text exposition format."""
+    run = report["run"]
+    lines = [
+        "# TYPE buzzgrades_run_wall_seconds gauge",
+        f'buzzgrades_run_wall_seconds{{run="{run}"}} {report["wall_seconds"]}',
+        "# TYPE buzzgrades_run_cpu_seconds gauge",
+        f'buzzgrades_run_cpu_seconds{{run="{run}"}} {report["cpu_seconds"]}',
+        "# TYPE buzzgrades_run_completed_timestamp_seconds gauge",
+        f'buzzgrades_run_completed_timestamp_seconds{{run="{run}"}} {report["started_at"] + report["wall_seconds"]:.3f}',
+    ]
+    if report["counters"]:
+        lines.append("# TYPE buzzgrades_events_total counter")
+        for name, value in report["counters"].items():
+            lines.append(f'buzzgrades_events_total{{run="{run}",event="{_prometheus_name(name)}"}} {value}')
+    for metric in ("wall_seconds", "cpu_seconds", "calls"):
+        if report["stages"]:
+            lines.append(f"# TYPE buzzgrades_stage_{metric} gauge")
+        for name, entry in report["stages"].items():
+            lines.append(f'buzzgrades_stage_{metric}{{run="{run}",stage="{_prometheus_name(name)}"}} {entry[metric]}')
+    return "\n".join(lines) + "\n"
+
+
+def add_metrics_arguments(parser) -> None:
+    """Add the shared --log-level/--log-json/--metrics-out/--prometheus-out options to an argparse parser."""
+    parser.add_argument('--log-level', default='INFO', type=str.upper, choices=LOG_LEVELS,
+                        help='Pipeline log level (DEBUG shows per-row events).')
+    parser.add_argument('--log-json', action='store_true', help='Emit pipeline logs as JSON lines.')
+    parser.add_argument('--metrics-out', type=str, metavar='JSON_FILE',
+                        help=f'Path for the JSON metrics report (default: {DEFAULT_METRICS_DIR}/<run>.json).')
+    parser.add_argument('--prometheus-out', type=str, metavar='PROM_FILE',
+                        help='Also write metrics in Prometheus textfile format to this path.')
+
+
+metrics = Metrics()
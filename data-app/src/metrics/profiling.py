@@ -0,0 +1,227 @@
+"""
+Per-stage profiling and the profile regression gate.
+
+With --profile, every `metrics.stage(...)` block also runs under cProfile and tracemalloc.
+Each stage gets a pstats dump (profiles/<run>/<stage>.prof, readable with snakeviz or pstats)
+and a row in profiles/<run>.json with its time, allocation peak, top functions and top
+allocation sites. With --profile-baseline the summary is diffed against a stored one and the
+run exits non-zero when a stage regressed beyond the thresholds.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_ALLOC_THRESHOLD = 0.25
+# Ignore differences below these, which are noise on small stages
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_BYTES = 1024 * 1024
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 10
+TRACEBACK_FRAMES = 1
+
+DATA_APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _relative_path(filename: str) -> str:
+    """Machine-independent source path: relative to data-app or site-packages, else the file name."""
+    if filename.startswith(DATA_APP_DIR):
+        return os.path.relpath(filename, DATA_APP_DIR)
+    if "site-packages" in filename:
+        return filename.split("site-packages" + os.sep, 1)[1]
+    if filename.startswith(os.sep):
+        return os.path.basename(filename)
+    return filename
+
+
+def _function_key(func: tuple) -> str:
+    """pstats key without the line number, so unrelated edits above a function do not break the baseline diff."""
+    filename, _, name = func
+    # Built-ins are named like "<built-in method __new__ of type object at 0x7f...>"
+    name = re.sub(r" at 0x[0-9a-f]+", "", name)
+    return f"{_relative_path(filename)}:{name}"
+
+
+class StageProfiler:
+    """cProfile and tracemalloc capture for `metrics.stage` blocks.
+
+    Nested stages pause the enclosing stage's profiler, so each stage's figures exclude the
+    stages inside it. Re-entering a stage accumulates into the same profile.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.profiles = {}
+        self.stages = {}
+        self._active = []
+
+    def enable(self) -> None:
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+
+    @contextmanager
+    def profile(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        entry = self.stages.setdefault(name, {"calls": 0, "cpu_seconds": 0.0, "wall_seconds": 0.0,
+                                              "peak_bytes": 0, "net_bytes": 0, "allocations": {}})
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        if self._active:
+            self._active[-1].disable()
+        before = tracemalloc.take_snapshot()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._active.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active.pop()
+            entry["calls"] += 1
+            entry["cpu_seconds"] += time.process_time() - cpu_start
+            entry["wall_seconds"] += time.perf_counter() - wall_start
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            entry["peak_bytes"] = max(entry["peak_bytes"], peak_bytes - start_bytes)
+            entry["net_bytes"] += current_bytes - start_bytes
+            for stat in tracemalloc.take_snapshot().compare_to(before, "lineno")[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                site = f"{_relative_path(frame.filename)}:{frame.lineno}"
+                entry["allocations"][site] = entry["allocations"].get(site, 0) + stat.size_diff
+            if self._active:
+                self._active[-1].enable()
+
+    def report(self, run_name: str) -> dict:
+        stages = {}
+        for name, entry in self.stages.items():
+            stats = pstats.Stats(self.profiles[name])
+            functions = {}
+            for func, (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+                key = _function_key(func)
+                current = functions.setdefault(key, {"ncalls": 0, "tottime": 0.0, "cumtime": 0.0})
+                current["ncalls"] += ncalls
+                current["tottime"] += tottime
+                current["cumtime"] += cumtime
+            top = sorted(functions.items(), key=lambda item: item[1]["tottime"], reverse=True)[:TOP_FUNCTIONS]
+            allocations = sorted(entry["allocations"].items(), key=lambda item: item[1], reverse=True)
+            stages[name] = {
+                "calls": entry["calls"],
+                "cpu_seconds": round(entry["cpu_seconds"], 6),
+                "wall_seconds": round(entry["wall_seconds"], 6),
+                "peak_bytes": entry["peak_bytes"],
+                "net_bytes": entry["net_bytes"],
+                "functions": {key: {k: round(v, 6) if isinstance(v, float) else v for k, v in value.items()}
+                              for key, value in top},
+                "allocations": dict(allocations[:TOP_ALLOCATIONS]),
+            }
+        return {"run": run_name, "stages": stages}
+
+    def write(self, run_name: str, output_dir: str = DEFAULT_PROFILE_DIR) -> dict:
+        """Write profiles/<run>/<stage>.prof dumps and the profiles/<run>.json summary."""
+        report = self.report(run_name)
+        os.makedirs(os.path.join(output_dir, run_name), exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(output_dir, run_name, f"{name}.prof"))
+        with open(os.path.join(output_dir, f"{run_name}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+def compare_profiles(current: dict, baseline: dict, time_metric: str = "cpu_seconds",
+                     time_threshold: float = DEFAULT_TIME_THRESHOLD,
+                     alloc_threshold: float = DEFAULT_ALLOC_THRESHOLD) -> list:
+    """Return one entry per stage whose time or allocation peak regressed beyond the thresholds."""
+    regressions = []
+    for name, stage in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if not base:
+            continue
+        checks = [
+            (time_metric, time_threshold, MIN_REGRESSION_SECONDS),
+            ("peak_bytes", alloc_threshold, MIN_REGRESSION_BYTES),
+        ]
+        for metric, threshold, minimum in checks:
+            delta = stage[metric] - base[metric]
+            if delta > minimum and delta > base[metric] * threshold:
+                regressions.append({"stage": name, "metric": metric, "baseline": base[metric],
+                                    "current": stage[metric], "delta": delta})
+    return regressions
+
+
+def regressed_functions(current_stage: dict, baseline_stage: dict, limit: int = 10) -> list:
+    """Functions of a stage ordered by how much their own (tottime) time grew against the baseline."""
+    deltas = []
+    for key, func in current_stage["functions"].items():
+        base = baseline_stage["functions"].get(key, {"tottime": 0.0, "ncalls": 0})
+        deltas.append((func["tottime"] - base["tottime"], key, base, func))
+    deltas.sort(key=lambda item: item[0], reverse=True)
+    return [item for item in deltas[:limit] if item[0] > 0]
+
+
+def print_regressions(regressions: list, current: dict, baseline: dict) -> None:
+    for regression in regressions:
+        stage, metric = regression["stage"], regression["metric"]
+        ratio = regression["current"] / regression["baseline"] if regression["baseline"] else float("inf")
+        print(f"[PROFILE] REGRESSION {stage} {metric}: {regression['baseline']:,.3f} -> "
+              f"{regression['current']:,.3f} ({ratio:.2f}x)")
+    for stage in sorted({regression["stage"] for regression in regressions}):
+        print(f"[PROFILE] Top regressed functions in {stage} (self time):")
+        for delta, key, base, func in regressed_functions(current["stages"][stage], baseline["stages"][stage]):
+            print(f"    +{delta:.4f}s  {key}  ({base['tottime']:.4f}s/{base['ncalls']} calls -> "
+                  f"{func['tottime']:.4f}s/{func['ncalls']} calls)")
+
+
+def add_profile_arguments(parser) -> None:
+    """Add the shared --profile/--profile-baseline/threshold options to an argparse parser."""
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_DIR, metavar='DIR',
+                        help=f'Profile each stage with cProfile and tracemalloc and save the results '
+                             f'(default dir: {DEFAULT_PROFILE_DIR}/).')
+    parser.add_argument('--profile-baseline', type=str, metavar='JSON_FILE',
+                        help='Compare the stage profiles against this baseline and fail on regressions.')
+    parser.add_argument('--profile-metric', default='cpu', choices=['cpu', 'wall'],
+                        help='Time measure compared against the baseline (default: cpu).')
+    parser.add_argument('--profile-threshold', type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help='Allowed relative time increase per stage (default: 0.25 = 25%%).')
+    parser.add_argument('--profile-alloc-threshold', type=float, default=DEFAULT_ALLOC_THRESHOLD,
+                        help='Allowed relative increase of a stage\'s allocation peak (default: 0.25).')
+
+
+def start_profiling(args) -> None:
+    """Enable stage profiling when --profile or --profile-baseline was given."""
+    if args.profile or args.profile_baseline:
+        profiler.enable()
+
+
+def finish_profiling(run_name: str, args) -> int:
+    """Write the stage profiles and apply the baseline gate. Returns 1 on regression, else 0."""
+    if not profiler.enabled:
+        return 0
+    output_dir = args.profile or DEFAULT_PROFILE_DIR
+    report = profiler.write(run_name, output_dir)
+    print(f"[PROFILE] Stage profiles written to {os.path.join(output_dir, run_name)}/")
+    if not args.profile_baseline:
+        return 0
+
+    with open(args.profile_baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_profiles(report, baseline, f"{args.profile_metric}_seconds",
+                                   args.profile_threshold, args.profile_alloc_threshold)
+    if not regressions:
+        print(f"[PROFILE] No stage regressed against {args.profile_baseline}")
+        return 0
+    print_regressions(regressions, report, baseline)
+    return 1
+
+
+profiler = StageProfiler()
@@ -0,0 +1,70 @@
+"""
+Write the publish artifacts the frontend reads next to ProcessedData.db.
+
+    python -m src.publish                          # publish/warmup.json, when its inputs changed
+    python -m src.publish --warmup-budget 500      # warm more pages and searches
+
+Change-feed delta files (publish/changes/), the static page documents (publish/api/) and the
+sitemaps (publish/sitemap/) are brought up to date with change_log as well.
+"""
+import argparse
+import sys
+
+from src.publish.changes import DEFAULT_CHANGES_DIR, KEEP_DELTA_FILES
+from src.publish.documents import DEFAULT_DOCUMENTS_DIR
+from src.publish.sitemap import DEFAULT_SITEMAP_DIR
+from src.publish.warmup import DEFAULT_BUDGET, DEFAULT_MANIFEST_PATH, DEFAULT_RECENT_TERMS, DEFAULT_SEARCH_SHARE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write the frontend publish artifacts (warmup manifest, change feed, page documents, sitemaps).')
+    parser.add_argument('--db', default='ProcessedData.db', help='Database file (default: ProcessedData.db).')
+    parser.add_argument('--warmup-manifest', default=DEFAULT_MANIFEST_PATH,
+                        help=f'Warmup manifest path (default: {DEFAULT_MANIFEST_PATH}).')
+    parser.add_argument('--warmup-budget', type=int, default=DEFAULT_BUDGET,
+                        help='Requests the warmup manifest lists, pages and searches together.')
+    parser.add_argument('--warmup-search-share', type=float, default=DEFAULT_SEARCH_SHARE,
+                        help='Share of the warmup budget spent on search queries.')
+    parser.add_argument('--warmup-terms', type=int, default=DEFAULT_RECENT_TERMS,
+                        help='Number of most recent terms whose enrollment ranks the pages.')
+    parser.add_argument('--changes-dir', default=DEFAULT_CHANGES_DIR,
+                        help=f'Directory of the change-feed delta files (default: {DEFAULT_CHANGES_DIR}).')
+    parser.add_argument('--keep-changes', type=int, default=KEEP_DELTA_FILES,
+                        help='Number of newest delta files kept on disk.')
+    parser.add_argument('--documents-dir', default=DEFAULT_DOCUMENTS_DIR,
+                        help=f'Directory of the static page documents (default: {DEFAULT_DOCUMENTS_DIR}).')
+    parser.add_argument('--sitemap-dir', default=DEFAULT_SITEMAP_DIR,
+                        help=f'Directory of the sitemap index and shards (default: {DEFAULT_SITEMAP_DIR}).')
+    parser.add_argument('--base-url', help='Site URL in the sitemaps (default: $NEXT_PUBLIC_BASE_URL or https://buzzgrades.org).')
+    parser.add_argument('--force', action='store_true',
+                        help='Rewrite the artifacts even if their inputs are unchanged (every page document and sitemap shard).')
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from src.coordination.coordination import configure_sqlite, read_only
+    from db.Models import (ChangeLog, ClassInstructorRollup, ClassSummary, CourseCatalog, DepartmentSummary,
+                           InstructorSummary)
+    from src.publish.changes import publish_changes
+    from src.publish.documents import export_documents
+    from src.publish.sitemap import write_sitemaps
+    from src.publish.warmup import write_warmup_manifest
+
+    engine = configure_sqlite(create_engine(f"sqlite:///{args.db}", echo=False, future=True))
+    try:
+        # The change feed and the tables the page documents read, for databases older than them
+        ChangeLog.metadata.create_all(engine, tables=[ChangeLog.__table__, CourseCatalog.__table__, ClassSummary.__table__,
+                                                      InstructorSummary.__table__, DepartmentSummary.__table__,
+                                                      ClassInstructorRollup.__table__])
+        with read_only(engine).connect() as conn:
+            write_warmup_manifest(conn, args.warmup_manifest, args.warmup_budget, args.warmup_search_share,
+                                  args.warmup_terms, force=args.force)
+            publish_changes(conn, args.changes_dir, args.keep_changes)
+            export_documents(conn, args.documents_dir, full=args.force)
+            write_sitemaps(conn, args.sitemap_dir, args.base_url, full=args.force)
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
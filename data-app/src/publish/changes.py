@@ -0,0 +1,148 @@
+"""
+Change feed for cache invalidation: the class codes, professor ids and department codes each
+pipeline write touched.
+
+Every write path appends a change_log row listing the keys it changed. Writes made in one
+transaction record theirs in that same transaction (record_changes). Ingestion commits group by
+group, so it collects its keys in the process-wide `changes` set instead and records them once per
+CSV file (ChangeSet.flush). A class change also lists the class's department, whose page shows it.
+Versions only grow, so a cache that remembers the last version it saw reads everything newer and
+evicts exactly those keys.
+
+The table is the source of truth. publish_changes() mirrors rows into compact delta files,
+publish/changes/<version>.json, and names the newest version in latest.json, for consumers that
+cannot read the database. Only the newest KEEP_DELTA_FILES stay on disk; a consumer further behind
+than latest.json's "oldest", or ahead of its "version" (the database was rebuilt), has to flush
+everything.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+# SQLAlchemy is imported where it is used, so python -m src.publish --help stays light
+
+DEFAULT_CHANGES_DIR = os.path.join("publish", "changes")
+LATEST_FILE = "latest.json"
+KEEP_DELTA_FILES = 500
+# Keys per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+INSERT_SQL = """
+    INSERT INTO change_log (created_at, source, class_codes, professor_ids, dept_abbrs)
+    VALUES (:created_at, :source, :class_codes, :professor_ids, :dept_abbrs)
+"""
+CLASS_KEYS_SQL = "SELECT class_code, dept_abbr FROM classdistribution WHERE {column} IN :keys AND class_code IS NOT NULL"
+
+
+def _class_keys(conn, column: str, keys) -> list:
+    """(class code, department) of the classes whose `column` is in `keys`."""
+    from sqlalchemy import bindparam, text
+
+    keys = sorted(keys)
+    statement = text(CLASS_KEYS_SQL.format(column=column)).bindparams(bindparam("keys", expanding=True))
+    rows = []
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        rows += conn.execute(statement, {"keys": keys[start:start + LOOKUP_CHUNK_SIZE]}).all()
+    return rows
+
+
+def record_changes(conn, source: str, class_ids=(), class_codes=(), professor_ids=(), dept_abbrs=()):
+    """
+    Append a change_log row in the caller's transaction (`conn` is a Connection or Session).
+
+    Classes can be given by id or code. Those in classdistribution are stored as codes, along with
+    their departments; catalog codes without grade data have no page to invalidate. Returns the new
+    version, or None when there is nothing to record.
+    """
+    from sqlalchemy import text
+
+    class_ids = {class_id for class_id in class_ids if class_id is not None}
+    classes = _class_keys(conn, "id", class_ids) + _class_keys(conn, "class_code", {code for code in class_codes if code})
+    class_codes = {code for code, _ in classes}
+    dept_abbrs = {dept for dept in dept_abbrs if dept} | {dept for _, dept in classes if dept}
+    professor_ids = {int(prof_id) for prof_id in professor_ids if prof_id is not None}
+    if not (class_codes or professor_ids or dept_abbrs):
+        return None
+    conn.execute(text(INSERT_SQL), {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": source,
+        "class_codes": json.dumps(sorted(class_codes)),
+        "professor_ids": json.dumps(sorted(professor_ids)),
+        "dept_abbrs": json.dumps(sorted(dept_abbrs)),
+    })
+    return conn.execute(text("SELECT last_insert_rowid()")).scalar()
+
+
+class ChangeSet:
+    """Keys touched by writes that commit on their own, recorded together by flush()."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.class_codes, self.professor_ids, self.dept_abbrs = set(), set(), set()
+
+    def touch(self, class_codes=(), professor_ids=(), dept_abbrs=()) -> None:
+        self.class_codes.update(class_codes)
+        self.professor_ids.update(professor_ids)
+        self.dept_abbrs.update(dept_abbrs)
+
+    def flush(self, conn, source: str):
+        """Record the collected keys as one change_log row and start over. Returns its version or None."""
+        version = record_changes(conn, source, class_codes=self.class_codes, professor_ids=self.professor_ids,
+                                 dept_abbrs=self.dept_abbrs)
+        self.clear()
+        return version
+
+
+changes = ChangeSet()
+
+
+def _delta_versions(changes_dir: str) -> list:
+    names = os.listdir(changes_dir) if os.path.isdir(changes_dir) else []
+    return sorted(int(name[:-5]) for name in names if name.endswith(".json") and name[:-5].isdigit())
+
+
+def _write_json(path: str, value) -> None:
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(value, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+
+
+def publish_changes(conn, changes_dir: str = DEFAULT_CHANGES_DIR, keep: int = KEEP_DELTA_FILES) -> int:
+    """Write a delta file for every change_log row not on disk yet and prune old ones. Returns the files written."""
+    from sqlalchemy import text
+
+    on_disk = _delta_versions(changes_dir)
+    newest = max(on_disk, default=0)
+    if newest > (conn.execute(text("SELECT MAX(version) FROM change_log")).scalar() or 0):
+        # The database was rebuilt and its versions started over; so do the files
+        for name in [f"{version}.json" for version in on_disk] + [LATEST_FILE]:
+            if os.path.exists(os.path.join(changes_dir, name)):
+                os.remove(os.path.join(changes_dir, name))
+        on_disk, newest = [], 0
+    rows = conn.execute(text("""
+        SELECT version, created_at, source, class_codes, professor_ids, dept_abbrs FROM change_log
+        WHERE version > :newest ORDER BY version
+    """), {"newest": newest}).all()
+    if not rows:
+        return 0
+    os.makedirs(changes_dir, exist_ok=True)
+    # Only the newest `keep` rows can survive pruning, so older ones are not written at all
+    for version, created_at, source, class_codes, professor_ids, dept_abbrs in rows[-keep:]:
+        _write_json(os.path.join(changes_dir, f"{version}.json"), {
+            "version": version,
+            "createdAt": created_at,
+            "source": source,
+            "classCodes": json.loads(class_codes),
+            "professorIds": json.loads(professor_ids),
+            "deptAbbrs": json.loads(dept_abbrs),
+        })
+    versions = sorted(set(on_disk) | {row[0] for row in rows[-keep:]})
+    for version in versions[:-keep]:
+        os.remove(os.path.join(changes_dir, f"{version}.json"))
+    versions = versions[-keep:]
+    _write_json(os.path.join(changes_dir, LATEST_FILE), {"version": versions[-1], "oldest": versions[0]})
+    written = min(len(rows), keep)
+    print(f"[CHANGES] Wrote {written} delta files to {changes_dir} (versions {versions[0]}..{versions[-1]})")
+    return written
@@ -0,0 +1,434 @@
+"""
+Static page documents: the /api/class, /api/prof and /api/dept responses, rendered once per
+class, professor and department so the frontend can serve them as files instead of running the
+joins and aggregation on every request.
+
+Each document is the API's JSON ({"success": true, "data": {...}}) plus the entity's precomputed
+summary. Only compressed copies are written, .json.gz and, when the optional `brotli` package is
+installed, .json.br (the frontend gunzips for the rare client that accepts neither), into a sharded
+tree:
+
+    publish/api/class/<dept>/<class code>.json.gz
+    publish/api/prof/<id % 100>/<id>.json.gz
+    publish/api/dept/<dept>.json.gz
+
+publish/api/index.json lists every document with its path, hash and sizes, and the change_log
+version the tree reflects. Runs after the first only re-export what change_log recorded since that
+version, plus the pages that show it: a class page lists its instructors (name, RMP score), and an
+instructor page lists their classes. Documents whose bytes did not change are not rewritten.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# SQLAlchemy is imported where it is used, so python -m src.publish --help stays light
+
+DEFAULT_DOCUMENTS_DIR = os.path.join("publish", "api")
+INDEX_FILE = "index.json"
+DOCUMENT_KINDS = ("class", "prof", "dept")
+# Instructor ids are hashes (src/generation/ids.py), so their documents are spread by id modulo
+PROFESSOR_SHARDS = 100
+# Keys per IN (...) lookup, well under SQLite's bound-parameter limit
+EXPORT_CHUNK_SIZE = 500
+
+# The queries below mirror frontend/lib/db/queries.js, including its SELECT * column merging:
+# a later column with the same name overwrites an earlier one but keeps its position
+CLASS_INFO_SQL = """
+    SELECT * FROM classdistribution
+    LEFT JOIN departmentdistribution d ON classdistribution.dept_abbr = d.dept_abbr AND classdistribution.campus = d.campus
+    LEFT JOIN (SELECT lat.right_id, json_group_array(json_object('name', l.name, 'id', lat.left_id)) AS libEds
+               FROM libedAssociationTable lat LEFT JOIN libEd l ON lat.left_id = l.id
+               GROUP BY right_id) libEds ON classdistribution.id = libEds.right_id
+    WHERE classdistribution.class_code IN :keys
+"""
+CLASS_DISTRIBUTIONS_SQL = """
+    SELECT classdistribution.class_code AS document_key,
+           r.dist_id AS distribution_id, r.total_students AS students, r.grades, r.terms,
+           r.instructor_id AS professor_id, p.name AS professor_name, p.RMP_score AS professor_RMP_score
+    FROM classdistribution
+    JOIN class_instructor_rollup r ON classdistribution.id = r.class_id
+    LEFT JOIN professor p ON r.instructor_id = p.id
+    WHERE classdistribution.class_code IN :keys
+    ORDER BY classdistribution.class_code, r.instructor_id
+"""
+# getDistributionFromTerms(): classes without rollup rows yet are summed from their term rows
+CLASS_TERM_DISTRIBUTIONS_SQL = """
+    SELECT classdistribution.class_code AS document_key,
+           d.id AS distribution_id, students, term, grades, d.instructor_id AS professor_id,
+           name AS professor_name, RMP_score AS professor_RMP_score
+    FROM classdistribution
+    JOIN distribution d ON classdistribution.id = d.class_id
+    JOIN termdistribution t ON d.id = t.dist_id
+    LEFT JOIN professor p ON d.instructor_id = p.id
+    WHERE classdistribution.class_code IN :keys
+    ORDER BY classdistribution.class_code, d.instructor_id, t.term
+"""
+PROF_INFO_SQL = "SELECT * FROM professor WHERE id IN :keys"
+PROF_CLASSES_SQL = """
+    SELECT professor.id AS document_key, * FROM professor
+    LEFT JOIN distribution d ON professor.id = d.instructor_id
+    LEFT JOIN termdistribution t ON d.id = t.dist_id
+    LEFT JOIN classdistribution c ON d.class_id = c.id
+    WHERE professor.id IN :keys
+    ORDER BY professor.id, d.id, t.id
+"""
+DEPT_INFO_SQL = "SELECT * FROM departmentdistribution WHERE dept_abbr IN :keys"
+DEPT_CLASSES_SQL = """
+    SELECT departmentdistribution.dept_abbr AS document_key, * FROM departmentdistribution
+    LEFT JOIN classdistribution ON classdistribution.dept_abbr = departmentdistribution.dept_abbr
+        AND classdistribution.campus = departmentdistribution.campus
+    WHERE classdistribution.dept_abbr IN :keys
+    ORDER BY departmentdistribution.dept_abbr, classdistribution.course_num
+"""
+CATALOG_SQL = """
+    SELECT class_code, title, description, credit_hours, prerequisites, corequisites, restrictions
+    FROM course_catalog WHERE class_code IN :keys
+"""
+SUMMARY_SQL = {
+    "class": """
+        SELECT c.class_code, s.average_gpa, s.most_grade, s.most_percent
+        FROM class_summary s JOIN classdistribution c ON c.id = s.class_id WHERE c.class_code IN :keys
+    """,
+    "prof": "SELECT instructor_id, average_gpa, most_grade, most_percent FROM instructor_summary WHERE instructor_id IN :keys",
+    "dept": "SELECT dept_abbr, average_gpa, most_grade, most_percent FROM department_summary WHERE dept_abbr IN :keys",
+}
+ALL_KEYS_SQL = {
+    "class": "SELECT class_code FROM classdistribution WHERE class_code IS NOT NULL",
+    "prof": "SELECT id FROM professor",
+    "dept": "SELECT DISTINCT dept_abbr FROM departmentdistribution",
+}
+# Pages that show another entity: a class lists its instructors, an instructor lists their classes
+TAUGHT_CLASSES_SQL = """
+    SELECT DISTINCT c.class_code FROM distribution d JOIN classdistribution c ON c.id = d.class_id
+    WHERE d.instructor_id IN :keys AND c.class_code IS NOT NULL
+"""
+CLASS_INSTRUCTORS_SQL = """
+    SELECT DISTINCT d.instructor_id FROM distribution d JOIN classdistribution c ON c.id = d.class_id
+    WHERE c.class_code IN :keys AND d.instructor_id IS NOT NULL
+"""
+
+
+def _chunks(keys):
+    keys = sorted(keys)
+    for start in range(0, len(keys), EXPORT_CHUNK_SIZE):
+        yield keys[start:start + EXPORT_CHUNK_SIZE]
+
+
+def _select(conn, sql: str, keys) -> list:
+    """Rows of `sql` for `keys` as dicts, merging duplicate column names the way better-sqlite3 does."""
+    from sqlalchemy import bindparam, text
+
+    statement = text(sql).bindparams(bindparam("keys", expanding=True))
+    rows = []
+    for chunk in _chunks(keys):
+        result = conn.execute(statement, {"keys": chunk})
+        columns = list(result.keys())
+        for values in result:
+            row = {}
+            for column, value in zip(columns, values):
+                row[column] = value
+            rows.append(row)
+    return rows
+
+
+def _grouped(rows) -> dict:
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.pop("document_key"), []).append(row)
+    return groups
+
+
+def _parse_json(value, default=None):
+    """tryJSONParse() of the frontend: the parsed value, or `default` when it is falsy or invalid."""
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return default if default is not None else value
+    return parsed if _or_none(parsed) is not None else default
+
+
+def _parse_row(row: dict) -> dict:
+    """parseJSONFromRow() of the frontend."""
+    if row.get("grades"):
+        row["grades"] = _parse_json(row["grades"])
+    if row.get("total_grades"):
+        row["total_grades"] = _parse_json(row["total_grades"])
+    if "libEds" in row:
+        row["libEds"] = _parse_json(row["libEds"], [])
+    return row
+
+
+def _or_none(value):
+    """JavaScript's `value || null`."""
+    return value if value not in (None, "", 0, False) else None
+
+
+def _summary(row) -> dict:
+    return {"averageGPA": row[1], "mostStudents": row[2], "mostStudentsPercent": row[3]} if row else None
+
+
+def _catalog_key(row: dict) -> str:
+    """getCourseInfo()'s lookup key for a class row."""
+    return re.sub(r"\s+", "", f"{row['dept_abbr']}{row['course_num']}").upper()
+
+
+def _load_catalog(conn, codes) -> dict:
+    catalog = {}
+    for row in _select(conn, CATALOG_SQL, codes):
+        for column in ("prerequisites", "corequisites", "restrictions"):
+            row[column] = None if row[column] is None else json.loads(row[column])
+        catalog[row["class_code"]] = row
+    return catalog
+
+
+def _with_catalog_title(row: dict, catalog: dict) -> dict:
+    """The catalog title enrichment of the class lists in queries.js."""
+    if not row.get("dept_abbr") or not row.get("course_num"):
+        return row
+    course = catalog.get(_catalog_key(row))
+    title = course["title"] if course else None
+    row["oscarTitle"] = _or_none(title)
+    row["class_desc"] = _or_none(title) or row["class_desc"]
+    return row
+
+
+def _summaries(conn, kind: str, keys) -> dict:
+    from sqlalchemy import bindparam, text
+
+    statement = text(SUMMARY_SQL[kind]).bindparams(bindparam("keys", expanding=True))
+    return {row[0]: row for chunk in _chunks(keys) for row in conn.execute(statement, {"keys": chunk})}
+
+
+def class_documents(conn, codes) -> dict:
+    """{class code: data} as returned by /api/class/<code>, for the codes that exist."""
+    infos = {}
+    for row in _select(conn, CLASS_INFO_SQL, codes):
+        infos.setdefault(row["class_code"], _parse_row(row))
+    distributions = _grouped(_select(conn, CLASS_DISTRIBUTIONS_SQL, infos))
+    unrolled = _grouped(_select(conn, CLASS_TERM_DISTRIBUTIONS_SQL, [code for code in infos if code not in distributions]))
+    catalog = _load_catalog(conn, infos)
+    summaries = _summaries(conn, "class", infos)
+    documents = {}
+    for code, info in infos.items():
+        course = catalog.get(code)
+        if course:
+            info.update(oscarTitle=_or_none(course["title"]), oscarDesc=_or_none(course["description"]),
+                        creditHours=_or_none(course["credit_hours"]), prerequisites=_or_none(course["prerequisites"]),
+                        corequisites=_or_none(course["corequisites"]), restrictions=_or_none(course["restrictions"]))
+        rows = []
+        for row in distributions.get(code, []):
+            row = _parse_row(row)
+            terms = [{"term": term, "students": students, "grades": grades}
+                     for term, students, grades in _parse_json(row["terms"], [])]
+            if terms:
+                row["term"] = terms[0]["term"]
+            row["terms"] = terms
+            rows.append(row)
+        if code in unrolled:
+            rows = _terms_by_instructor(unrolled[code])
+        documents[code] = dict(info, distributions=rows, summary=_summary(summaries.get(code)))
+    return documents
+
+
+def _terms_by_instructor(rows: list) -> list:
+    """summarizeTerms(groupBy(rows, "professor_id")) of the frontend's getDistributionFromTerms()."""
+    by_instructor = {}
+    for row in rows:
+        by_instructor.setdefault(row["professor_id"], []).append(_parse_row(row))
+    # Object.values() order: integer ids ascending, then a missing instructor last
+    ordered = sorted(by_instructor.items(), key=lambda item: (item[0] is None, item[0] or 0))
+    return [_summarize_terms(group) for _, group in ordered]
+
+
+def _summarize_terms(rows: list) -> dict:
+    """summarizeTerms() of the frontend for one class of an instructor."""
+    grades = {}
+    for row in rows:
+        for grade, count in (row["grades"] or {}).items():
+            grades[grade] = grades.get(grade, 0) + count
+    summarized = dict(rows[0])
+    summarized["grades"] = grades
+    summarized["terms"] = [{"term": row["term"], "grades": row["grades"], "students": row["students"]} for row in rows]
+    summarized["students"] = sum(row["students"] or 0 for row in rows)
+    return summarized
+
+
+def prof_documents(conn, ids) -> dict:
+    """{professor id: data} as returned by /api/prof/<id>, for the ids that exist."""
+    infos = {row["id"]: _parse_row(row) for row in _select(conn, PROF_INFO_SQL, ids)}
+    classes = _grouped(_select(conn, PROF_CLASSES_SQL, infos))
+    catalog = _load_catalog(conn, {_catalog_key(row) for rows in classes.values() for row in rows
+                                   if row.get("dept_abbr") and row.get("course_num")})
+    summaries = _summaries(conn, "prof", infos)
+    documents = {}
+    for prof_id, info in infos.items():
+        by_class = {}
+        for row in classes.get(prof_id, []):
+            by_class.setdefault(row["class_id"], []).append(_with_catalog_title(_parse_row(row), catalog))
+        # Object.values() order: integer class ids ascending, then a missing class last
+        ordered = sorted(by_class.items(), key=lambda item: (item[0] is None, item[0] or 0))
+        distributions = [_summarize_terms(rows) for _, rows in ordered]
+        documents[str(prof_id)] = dict(info, distributions=distributions, summary=_summary(summaries.get(prof_id)))
+    return documents
+
+
+def dept_documents(conn, abbrs) -> dict:
+    """{department code: data} as returned by /api/dept/<code>, for the departments that exist."""
+    infos = {}
+    for row in _select(conn, DEPT_INFO_SQL, abbrs):
+        infos.setdefault(row["dept_abbr"], _parse_row(row))
+    classes = _grouped(_select(conn, DEPT_CLASSES_SQL, infos))
+    catalog = _load_catalog(conn, {_catalog_key(row) for rows in classes.values() for row in rows
+                                   if row.get("dept_abbr") and row.get("course_num")})
+    summaries = _summaries(conn, "dept", infos)
+    return {abbr: dict(info, distributions=[_with_catalog_title(_parse_row(row), catalog) for row in classes.get(abbr, [])],
+                       summary=_summary(summaries.get(abbr)))
+            for abbr, info in infos.items()}
+
+
+RENDERERS = {"class": class_documents, "prof": prof_documents, "dept": dept_documents}
+
+
+def document_path(kind: str, key: str, data: dict) -> str:
+    """Path of a document relative to the documents directory, without the compression suffix."""
+    if kind == "class":
+        return f"class/{data.get('dept_abbr') or '_'}/{key}.json"
+    if kind == "prof":
+        return f"prof/{int(key) % PROFESSOR_SHARDS}/{key}.json"
+    return f"dept/{key}.json"
+
+
+def load_index(root: str) -> dict:
+    try:
+        with open(os.path.join(root, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_bytes(path: str, body: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def _remove_document(root: str, path: str) -> None:
+    for suffix in (".gz", ".br"):
+        if os.path.exists(os.path.join(root, path + suffix)):
+            os.remove(os.path.join(root, path + suffix))
+
+
+def _write_document(root: str, path: str, body: bytes, shards: set) -> dict:
+    # Written in place: while an export runs, change_log is ahead of index.json, so the frontend is
+    # not reading documents; only index.json is replaced atomically
+    shard = os.path.dirname(os.path.join(root, path))
+    if shard not in shards:
+        os.makedirs(shard, exist_ok=True)
+        shards.add(shard)
+    entry = {"path": path, "sha256": hashlib.sha256(body).hexdigest()[:16], "bytes": len(body)}
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    _write_bytes(os.path.join(root, f"{path}.gz"), compressed)
+    entry["gzipBytes"] = len(compressed)
+    if BROTLI_AVAILABLE:
+        compressed = brotli.compress(body, quality=11)
+        _write_bytes(os.path.join(root, f"{path}.br"), compressed)
+        entry["brotliBytes"] = len(compressed)
+    return entry
+
+
+def _keys_to_export(conn, index: dict, latest: int, full: bool) -> tuple:
+    """({kind: keys} to re-export, whether that is everything)."""
+    from sqlalchemy import text
+
+    if full or not index or index.get("version", 0) > latest or index.get("brotli") != BROTLI_AVAILABLE:
+        return {kind: {str(row[0]) for row in conn.execute(text(ALL_KEYS_SQL[kind]))} for kind in DOCUMENT_KINDS}, True
+
+    keys = {kind: set() for kind in DOCUMENT_KINDS}
+    for class_codes, professor_ids, dept_abbrs in conn.execute(text(
+            "SELECT class_codes, professor_ids, dept_abbrs FROM change_log WHERE version > :version"),
+            {"version": index["version"]}):
+        keys["class"].update(json.loads(class_codes))
+        keys["prof"].update(json.loads(professor_ids))
+        keys["dept"].update(json.loads(dept_abbrs))
+    # Pages that show the changed entities: instructors listed on a class, classes listed on an instructor
+    taught = {row[0] for row in _select_values(conn, TAUGHT_CLASSES_SQL, keys["prof"])}
+    teaching = {row[0] for row in _select_values(conn, CLASS_INSTRUCTORS_SQL, keys["class"])}
+    keys["class"] |= taught
+    keys["prof"] = {str(prof_id) for prof_id in keys["prof"] | teaching}
+    return keys, False
+
+
+def _select_values(conn, sql: str, keys) -> list:
+    from sqlalchemy import bindparam, text
+
+    statement = text(sql).bindparams(bindparam("keys", expanding=True))
+    return [row for chunk in _chunks(keys) for row in conn.execute(statement, {"keys": chunk})]
+
+
+def export_documents(conn, root: str = DEFAULT_DOCUMENTS_DIR, full: bool = False) -> dict:
+    """
+    Re-export the documents change_log recorded since the last export (all of them with `full`, on
+    the first run, or after the database was rebuilt). Returns {kind: documents written}.
+    """
+    from sqlalchemy import text
+
+    latest = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM change_log")).scalar()
+    index = load_index(root)
+    if not full and index and index.get("version") == latest and index.get("brotli") == BROTLI_AVAILABLE:
+        print(f"[DOCUMENTS] {root} is up to date (change {latest})")
+        return {kind: 0 for kind in DOCUMENT_KINDS}
+
+    keys, everything = _keys_to_export(conn, index, latest, full)
+    if index.get("version") == latest:
+        # A forced re-export of a current tree: take it out of service until the new index is written
+        os.remove(os.path.join(root, INDEX_FILE))
+    documents = {kind: {} if everything else dict(index.get("documents", {}).get(kind, {})) for kind in DOCUMENT_KINDS}
+    previous = {kind: index.get("documents", {}).get(kind, {}) for kind in DOCUMENT_KINDS}
+    written = {kind: 0 for kind in DOCUMENT_KINDS}
+    shards = set()
+    for kind in DOCUMENT_KINDS:
+        lookup = [int(key) for key in keys[kind]] if kind == "prof" else keys[kind]
+        for chunk in _chunks(lookup):
+            rendered = RENDERERS[kind](conn, chunk)
+            for key in map(str, chunk):
+                old = previous[kind].get(key)
+                if key not in rendered:
+                    documents[kind].pop(key, None)
+                    continue
+                data = rendered[key]
+                body = json.dumps({"success": True, "data": data}, separators=(",", ":"), ensure_ascii=False).encode()
+                path = document_path(kind, key, data)
+                if old and old["path"] == path and old["sha256"] == hashlib.sha256(body).hexdigest()[:16] \
+                        and os.path.exists(os.path.join(root, f"{path}.gz")):
+                    documents[kind][key] = old
+                    continue
+                if old and old["path"] != path:
+                    _remove_document(root, old["path"])
+                documents[kind][key] = _write_document(root, path, body, shards)
+                written[kind] += 1
+        # Entities that no longer exist (merged professors, a rebuilt database) lose their files
+        for key, old in previous[kind].items():
+            if key not in documents[kind] and (everything or key in keys[kind]):
+                _remove_document(root, old["path"])
+
+    os.makedirs(root, exist_ok=True)
+    index_path = os.path.join(root, INDEX_FILE)
+    _write_bytes(f"{index_path}.tmp", json.dumps({
+        "version": latest,
+        "generatedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "brotli": BROTLI_AVAILABLE,
+        "documents": documents,
+    }, separators=(",", ":")).encode())
+    os.replace(f"{index_path}.tmp", index_path)
+    print(f"[DOCUMENTS] Wrote {sum(written.values())} documents to {root} "
+          f"({', '.join(f'{count} {kind}' for kind, count in written.items())}; change {latest}"
+          f"{'' if BROTLI_AVAILABLE else ', gzip only: install brotli for .br files'})")
+    return written
@@ -0,0 +1,209 @@
+"""
+Sitemaps for the class, instructor and department pages, generated from the database instead of by
+the frontend on every crawl.
+
+The URLs are the ones frontend/pages/sitemap_full.xml.js lists, each with a <lastmod> taken from the
+latest term the page has grades for. They are streamed kind by kind, in id order, into gzipped
+shards of at most MAX_URLS_PER_SHARD URLs:
+
+    publish/sitemap/sitemap.xml                 # sitemap index, served as /sitemap_full.xml
+    publish/sitemap/sitemap-class-1.xml.gz      # served as /sitemaps/sitemap-class-1.xml.gz
+    publish/sitemap/shards.json                 # change_log version, base URL and hash of each shard
+
+Later runs only regenerate the kinds change_log recorded changes for since shards.json's version,
+and only rewrite the shards whose content changed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+# SQLAlchemy is imported where it is used, so python -m src.publish --help stays light
+
+DEFAULT_SITEMAP_DIR = os.path.join("publish", "sitemap")
+INDEX_FILE = "sitemap.xml"
+STATE_FILE = "shards.json"
+# The sitemaps.org limit per file
+MAX_URLS_PER_SHARD = 50000
+DEFAULT_BASE_URL = "https://buzzgrades.org"
+# Month and day each term's grades are final by, for <lastmod>
+TERM_END_DATES = {"02": "05-31", "05": "07-31", "08": "12-31"}
+
+SITEMAP_KINDS = ("pages", "class", "prof", "dept")
+# (page path, image path) of each kind's URLs
+URL_PATHS = {"class": ("class", "class"), "prof": ("inst", "prof"), "dept": ("dept", "dept")}
+# Rows of (id, description, latest term), in a stable order
+KIND_SQL = {
+    "class": """
+        SELECT c.dept_abbr || c.course_num, COALESCE(NULLIF(cc.title, ''), c.class_desc), MAX(t.term)
+        FROM classdistribution c
+        LEFT JOIN course_catalog cc ON cc.class_code = c.class_code
+        LEFT JOIN distribution d ON d.class_id = c.id
+        LEFT JOIN termdistribution t ON t.dist_id = d.id
+        GROUP BY c.id ORDER BY c.id
+    """,
+    "prof": """
+        SELECT p.id, p.name, MAX(t.term)
+        FROM professor p
+        LEFT JOIN distribution d ON d.instructor_id = p.id
+        LEFT JOIN termdistribution t ON t.dist_id = d.id
+        GROUP BY p.id ORDER BY p.id
+    """,
+    "dept": """
+        SELECT dd.dept_abbr, dd.dept_name, MAX(t.term)
+        FROM departmentdistribution dd
+        LEFT JOIN classdistribution c ON c.dept_abbr = dd.dept_abbr AND c.campus = dd.campus
+        LEFT JOIN distribution d ON d.class_id = c.id
+        LEFT JOIN termdistribution t ON t.dist_id = d.id
+        GROUP BY dd.dept_abbr ORDER BY dd.dept_abbr
+    """,
+}
+URLSET_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+               'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n')
+URLSET_CLOSE = "</urlset>\n"
+
+
+def default_base_url() -> str:
+    """The site URL the frontend uses (NEXT_PUBLIC_BASE_URL)."""
+    return os.environ.get("NEXT_PUBLIC_BASE_URL") or DEFAULT_BASE_URL
+
+
+def term_lastmod(term) -> str:
+    """W3C date a term's grades are final by, e.g. 202502 -> 2025-05-31; None without a term."""
+    if not term:
+        return None
+    term = str(term)
+    return f"{term[:4]}-{TERM_END_DATES.get(term[4:6], term[4:6] + '-01')}"
+
+
+def _clean_id(value) -> str:
+    return str(value).replace(" ", "")
+
+
+def _clean_description(value) -> str:
+    return re.sub(r"[^a-zA-Z0-9]+", "-", value or "").lower()
+
+
+def _url(loc: str, image: str, lastmod: str) -> str:
+    return (f"<url><loc>{escape(loc)}</loc>" + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
+            + f"<image:image><image:loc>{escape(image)}</image:loc></image:image></url>\n")
+
+
+def _kind_urls(conn, kind: str, base_url: str):
+    """(url element, lastmod) of every page of `kind`, streamed from the database."""
+    from sqlalchemy import text
+
+    if kind == "pages":
+        latest = conn.execute(text("SELECT MAX(term) FROM termdistribution")).scalar()
+        yield _url(f"{base_url}/", f"{base_url}/images/advert.png", term_lastmod(latest)), term_lastmod(latest)
+        return
+    page, image = URL_PATHS[kind]
+    for key, description, term in conn.execute(text(KIND_SQL[kind])):
+        lastmod = term_lastmod(term)
+        yield (_url(f"{base_url}/{page}/{_clean_id(key)}/{_clean_description(description)}",
+                    f"{base_url}/api/image/{image}/{_clean_id(key)}", lastmod), lastmod)
+
+
+def _shards(urls):
+    """Group (url element, lastmod) pairs into (body, lastmod, url count) shards."""
+    shard, lastmod = [], None
+    for url, url_lastmod in urls:
+        shard.append(url)
+        lastmod = max(filter(None, (lastmod, url_lastmod)), default=None)
+        if len(shard) == MAX_URLS_PER_SHARD:
+            yield URLSET_OPEN + "".join(shard) + URLSET_CLOSE, lastmod, len(shard)
+            shard, lastmod = [], None
+    if shard:
+        yield URLSET_OPEN + "".join(shard) + URLSET_CLOSE, lastmod, len(shard)
+
+
+def load_state(sitemap_dir: str) -> dict:
+    try:
+        with open(os.path.join(sitemap_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_atomic(path: str, body: bytes) -> None:
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(body)
+    os.replace(f"{path}.tmp", path)
+
+
+def _changed_kinds(conn, state: dict) -> set:
+    """Kinds with a change_log row after the state's version; any change moves the home page's lastmod."""
+    from sqlalchemy import text
+
+    kinds = set()
+    for class_codes, professor_ids, dept_abbrs in conn.execute(text(
+            "SELECT class_codes, professor_ids, dept_abbrs FROM change_log WHERE version > :version"),
+            {"version": state["version"]}):
+        for kind, keys in (("class", class_codes), ("prof", professor_ids), ("dept", dept_abbrs)):
+            if json.loads(keys):
+                kinds.add(kind)
+    return kinds | {"pages"} if kinds else kinds
+
+
+def write_sitemaps(conn, sitemap_dir: str = DEFAULT_SITEMAP_DIR, base_url: str = None, full: bool = False) -> int:
+    """
+    Regenerate the shards of the kinds changed since the last run (all of them with `full`, on the
+    first run, after the database was rebuilt or when the base URL changed). Returns the shards written.
+    """
+    from sqlalchemy import text
+
+    base_url = (base_url or default_base_url()).rstrip("/")
+    latest = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM change_log")).scalar()
+    state = load_state(sitemap_dir)
+    if full or not state or state.get("version", 0) > latest or state.get("baseUrl") != base_url:
+        kinds, previous = set(SITEMAP_KINDS), {}
+    else:
+        kinds, previous = _changed_kinds(conn, state), state["shards"]
+        if not kinds:
+            print(f"[SITEMAP] {sitemap_dir} is up to date (change {latest})")
+            return 0
+
+    os.makedirs(sitemap_dir, exist_ok=True)
+    shards = {name: shard for name, shard in previous.items() if shard["kind"] not in kinds}
+    written = 0
+    for kind in SITEMAP_KINDS:
+        if kind not in kinds:
+            continue
+        for number, (body, lastmod, count) in enumerate(_shards(_kind_urls(conn, kind, base_url)), start=1):
+            name = f"sitemap-{kind}-{number}.xml.gz"
+            body = body.encode()
+            digest = hashlib.sha256(body).hexdigest()[:16]
+            shards[name] = {"kind": kind, "urls": count, "lastmod": lastmod, "sha256": digest}
+            if previous.get(name, {}).get("sha256") == digest and os.path.exists(os.path.join(sitemap_dir, name)):
+                continue
+            _write_atomic(os.path.join(sitemap_dir, name), gzip.compress(body, compresslevel=9, mtime=0))
+            written += 1
+    # Shards a kind no longer fills, and any left from an earlier base URL or database
+    for name in os.listdir(sitemap_dir):
+        if name.startswith("sitemap-") and name.endswith(".xml.gz") and name not in shards:
+            os.remove(os.path.join(sitemap_dir, name))
+
+    ordered = sorted(shards, key=lambda name: (SITEMAP_KINDS.index(shards[name]["kind"]),
+                                               int(name.rsplit("-", 1)[1].split(".")[0])))
+    index = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for name in ordered:
+        lastmod = shards[name]["lastmod"]
+        index.append(f"<sitemap><loc>{escape(f'{base_url}/sitemaps/{name}')}</loc>"
+                     + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "") + "</sitemap>\n")
+    index.append("</sitemapindex>\n")
+    _write_atomic(os.path.join(sitemap_dir, INDEX_FILE), "".join(index).encode())
+    _write_atomic(os.path.join(sitemap_dir, STATE_FILE), json.dumps({
+        "version": latest,
+        "generatedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "baseUrl": base_url,
+        "shards": {name: shards[name] for name in ordered},
+    }, indent=2).encode())
+    urls = sum(shard["urls"] for shard in shards.values())
+    print(f"[SITEMAP] Wrote {written} of {len(shards)} shards to {sitemap_dir} "
+          f"({urls} URLs; regenerated {', '.join(kind for kind in SITEMAP_KINDS if kind in kinds)}; change {latest})")
+    return written
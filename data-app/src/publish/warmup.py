@@ -0,0 +1,142 @@
+"""
+Warmup manifest for frontend/scripts/warmup.js: the pages and search queries most likely to be hit
+first after a publish.
+
+Pages are ranked by recent enrollment, meaning the students of the last few terms in
+termdistribution. Classes, instructors and departments share one ranking, so a large department
+outranks a small class. Searches are the queries users type on the way to those pages. They are
+"CS", then "CS 1" through "CS 1332" for a class, and the surname and full name for an instructor.
+Each query is weighted by the enrollment of everything it matches.
+
+The manifest fills a request budget. A share of it goes to searches, and the rest to pages. It
+records a fingerprint of its inputs and is only rewritten when that fingerprint changes.
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime, timezone
+
+# SQLAlchemy is imported where it is used, so python -m src.publish --help stays light
+
+DEFAULT_MANIFEST_PATH = os.path.join("publish", "warmup.json")
+# Requests warmup.js makes, the share of them spent on searches, and how many recent terms count
+DEFAULT_BUDGET = 300
+DEFAULT_SEARCH_SHARE = 0.25
+DEFAULT_RECENT_TERMS = 4
+UNKNOWN_INSTRUCTOR = "Unknown Instructor"
+
+RECENT_TERMS_SQL = "SELECT DISTINCT term FROM termdistribution ORDER BY term DESC LIMIT :terms"
+RECENT_STUDENTS_SQL = f"""
+    SELECT c.dept_abbr, c.course_num, c.class_code, d.instructor_id, p.name, SUM(t.students) AS students
+    FROM termdistribution t
+    JOIN distribution d ON d.id = t.dist_id
+    JOIN classdistribution c ON c.id = d.class_id
+    LEFT JOIN professor p ON p.id = d.instructor_id
+    WHERE t.term IN ({RECENT_TERMS_SQL}) AND c.class_code IS NOT NULL
+    GROUP BY d.id
+"""
+# Everything the manifest is derived from; a change in any of these regenerates it
+FINGERPRINT_SQL = f"""
+    SELECT
+        (SELECT json_group_array(term) FROM ({RECENT_TERMS_SQL})),
+        (SELECT COUNT(*) || ':' || COALESCE(SUM(students), 0) FROM termdistribution WHERE term IN ({RECENT_TERMS_SQL})),
+        (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) FROM distribution),
+        (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) || ':' || COALESCE(SUM(LENGTH(name)), 0) FROM professor),
+        (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) FROM classdistribution)
+"""
+
+
+def manifest_fingerprint(conn, budget: int, search_share: float, recent_terms: int) -> str:
+    from sqlalchemy import text
+
+    inputs = list(conn.execute(text(FINGERPRINT_SQL), {"terms": recent_terms}).one())
+    inputs += [budget, search_share, recent_terms]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()[:16]
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def search_queries(dept: str, number: str, name: str = None) -> list:
+    """Queries typed on the way to a class (dept and number given) or an instructor (name given)."""
+    if name is not None:
+        parts = name.split()
+        return list(dict.fromkeys([parts[-1], name])) if parts else []
+    return [dept] + [f"{dept} {number[:length]}" for length in range(1, len(number) + 1)]
+
+
+def rank_pages(rows) -> tuple:
+    """(pages, query weights) from the per-distribution rows of RECENT_STUDENTS_SQL."""
+    classes, instructors, departments, names = Counter(), Counter(), Counter(), {}
+    class_names = {}
+    for dept, number, class_code, instructor_id, name, students in rows:
+        classes[class_code] += students
+        class_names[class_code] = (dept, number)
+        departments[dept] += students
+        if instructor_id is not None and name and name != UNKNOWN_INSTRUCTOR:
+            instructors[instructor_id] += students
+            names[instructor_id] = name
+
+    queries = Counter()
+    for class_code, students in classes.items():
+        for query in search_queries(*class_names[class_code]):
+            queries[query] += students
+    for instructor_id, students in instructors.items():
+        for query in search_queries(None, None, names[instructor_id]):
+            queries[query] += students
+
+    pages = [{"kind": "class", "key": code, "path": f"/class/{code}", "students": students}
+             for code, students in classes.items()]
+    pages += [{"kind": "inst", "key": str(instructor_id), "path": f"/inst/{instructor_id}", "students": students}
+              for instructor_id, students in instructors.items()]
+    pages += [{"kind": "dept", "key": dept, "path": f"/dept/{dept}", "students": students}
+              for dept, students in departments.items()]
+    pages.sort(key=lambda page: (-page["students"], page["kind"], page["key"]))
+    return pages, queries
+
+
+def build_manifest(conn, budget: int = DEFAULT_BUDGET, search_share: float = DEFAULT_SEARCH_SHARE,
+                   recent_terms: int = DEFAULT_RECENT_TERMS) -> dict:
+    from sqlalchemy import text
+
+    terms = [row[0] for row in conn.execute(text(RECENT_TERMS_SQL), {"terms": recent_terms})]
+    pages, queries = rank_pages(conn.execute(text(RECENT_STUDENTS_SQL), {"terms": recent_terms}))
+    searches = [{"query": query, "students": students}
+                for query, students in sorted(queries.items(), key=lambda item: (-item[1], item[0]))]
+    search_budget = min(len(searches), round(budget * search_share))
+    pages = pages[:budget - search_budget]
+    # Pages the budget cannot fill are left to searches
+    searches = searches[:budget - len(pages)]
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "budget": budget,
+        "recentTerms": sorted(terms),
+        "pages": pages,
+        "searches": searches,
+    }
+
+
+def write_warmup_manifest(conn, path: str = DEFAULT_MANIFEST_PATH, budget: int = DEFAULT_BUDGET,
+                          search_share: float = DEFAULT_SEARCH_SHARE, recent_terms: int = DEFAULT_RECENT_TERMS,
+                          force: bool = False) -> bool:
+    """Write the manifest unless the one at `path` was built from the same inputs. Returns whether it was written."""
+    fingerprint = manifest_fingerprint(conn, budget, search_share, recent_terms)
+    if not force and load_manifest(path).get("fingerprint") == fingerprint:
+        print(f"[WARMUP] {path} is up to date")
+        return False
+    manifest = dict(build_manifest(conn, budget, search_share, recent_terms), fingerprint=fingerprint)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    print(f"[WARMUP] Wrote {path}: {len(manifest['pages'])} pages, {len(manifest['searches'])} searches "
+          f"(terms {manifest['recentTerms']})")
+    return True
@@ -1,17 +1,15 @@
-try:
-    from .rmp import RMP
-except ImportError:
+import os
+import sys
+import argparse
+
+if not __package__:
     # Handle case when run directly (not as package)
-    import sys
-    import os
     # Add data-app root to path so db module can be found
     sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
     sys.path.append(os.path.dirname(__file__))
-    from rmp import RMP
-import sys
-import argparse
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+
+from src.metrics import metrics, configure_logging, add_metrics_arguments, add_profile_arguments, start_profiling, finish_profiling
+from src.maintenance.maintenance import run_maintenance, add_maintenance_arguments
 
 def main():
     parser = argparse.ArgumentParser(description='Standalone RMP Processing')
@@ -25,6 +23,8 @@ def main():
                        help='RMP ID to use with --add-manual (numeric ID from RMP URL)')
     parser.add_argument('--import-manual', type=str, metavar='CSV_FILE',
                        help='Import manual RMP mappings from CSV file (default: rmp_requests_by_users.csv)')
+    parser.add_argument('--import-report', type=str, metavar='CSV_FILE',
+                       help='With --import-manual, write the result of every CSV row to this file')
     parser.add_argument('--export-unmatched', type=str, metavar='CSV_FILE',
                        help='Export professors without RMP data to CSV for manual research')
     parser.add_argument('--dry-run', action='store_true',
@@ -35,49 +35,66 @@ def main():
                        help='Verify RMP URLs are accessible (slower)')
     parser.add_argument('--debug', action='store_true',
                        help='Enable detailed debugging output for RMP processing')
+    add_metrics_arguments(parser)
+    add_profile_arguments(parser)
+    add_maintenance_arguments(parser)
     
     args = parser.parse_args()
-    
+
+    configure_logging("DEBUG" if args.debug else args.log_level, args.log_json)
+    start_profiling(args)
+    try:
+        status, wrote = run(args)
+        if not status and wrote:
+            publish_change_feed()
+    finally:
+        metrics.write_report("rmp", args.metrics_out, args.prometheus_out)
+        print(f"[RMP] Metrics report written to {args.metrics_out or 'metrics/rmp.json'}")
+    return status or finish_profiling("rmp", args)
+
+def run(args):
+    # Run the requested RMP operation and return the process exit code and whether it wrote to the database
     # Initialize database connection
     try:
-        from db.Models import Base
-        gt_engine = create_engine("sqlite:///./ProcessedData.db", echo=False, future=True)
-        
-        # Override the Session for RMP module
-        import db.Models
-        db.Models.Session = sessionmaker(bind=gt_engine, autoflush=False)
-        
-        rmp = RMP()
+        from db.Models import bind_session
+        engine = bind_session()
         
         # Stats only mode
         if args.stats_only:
             print("[RMP Stats] Generating RMP coverage statistics...")
             show_rmp_statistics()
-            return 0
+            return 0, False
+
+        # The matcher and its GraphQL client are only loaded for commands that use them
+        from src.rmp.rmp import RMP
+        rmp = RMP()
         
         # Manual RMP operations
         if args.add_manual:
             if not args.rmp_id:
                 print("[RMP Error] --add-manual requires --rmp-id parameter")
-                return 1
+                return 1, False
             
+            prepare_schema(engine)
             print(f"[RMP Manual] Adding manual RMP link for '{args.add_manual}' with ID '{args.rmp_id}'")
             success = rmp.add_manual_rmp_link(args.add_manual, args.rmp_id)
-            return 0 if success else 1
+            return (0, True) if success else (1, False)
         
         if args.import_manual:
             # Use provided file or default to rmp_requests_by_users.csv
             csv_file = args.import_manual if args.import_manual != 'default' else 'rmp_requests_by_users.csv'
-            print(f"[RMP Manual] Importing manual mappings from {csv_file}")
-            count = rmp.import_manual_mappings(csv_file)
+            if not args.dry_run:
+                prepare_schema(engine)
+            print(f"[RMP Manual] Importing manual mappings from {csv_file}{' (dry run)' if args.dry_run else ''}")
+            count = rmp.import_manual_mappings(csv_file, dry_run=args.dry_run, report_path=args.import_report)
             print(f"[RMP Manual] Import completed: {count} professors processed")
-            return 0
+            return 0, not args.dry_run
         
         if args.export_unmatched:
             print(f"[RMP Manual] Exporting unmatched professors to {args.export_unmatched}")
             count = rmp.export_unmatched_professors(args.export_unmatched)
             print(f"[RMP Manual] Export completed: {count} professors exported")
-            return 0
+            return 0, False
         
         # Dry run mode
         if args.dry_run:
@@ -95,7 +112,7 @@ def main():
                 print(f"[RMP DRY RUN] Would export unmatched professors to {args.export_unmatched}")
             elif not any([args.fix_duplicates, args.add_manual, args.import_manual, args.export_unmatched]):
                 print("[RMP DRY RUN] Would run full processing (RMP updates + duplicate detection)")
-            return 0
+            return 0, False
         
         # Determine what operations to run
         fix_duplicates = args.fix_duplicates
@@ -119,29 +136,58 @@ def main():
             else:
                 # Manual operations were already handled above, don't run additional processing
                 print("[RMP] Manual operations completed")
-                return 0
+                return 0, False
         
+        prepare_schema(engine)
         print("[RMP] Starting enhanced RMP processing...")
         rmp.update_profs(fix_duplicates=fix_duplicates, skip_rmp_updates=skip_rmp_updates, debug=args.debug)
         print("[RMP] Completed RMP processing")
+
+        if not args.skip_maintenance:
+            run_maintenance()
         
         # Show final statistics
         show_rmp_statistics()
         
-        return 0
+        return 0, True
         
     except Exception as e:
         print(f"[RMP Error] Failed to process: {e}")
-        return 1
+        return 1, False
+
+def prepare_schema(engine):
+    # The change feed and the tables the page documents read, for databases older than them;
+    # only the commands that write need them, so --stats-only and --dry-run leave the schema alone
+    from db.Models import (ChangeLog, ClassInstructorRollup, ClassSummary, CourseCatalog, DepartmentSummary,
+                           InstructorSummary, create_missing_indexes)
+    ChangeLog.metadata.create_all(engine, tables=[ChangeLog.__table__, CourseCatalog.__table__, ClassSummary.__table__,
+                                                  InstructorSummary.__table__, DepartmentSummary.__table__,
+                                                  ClassInstructorRollup.__table__])
+    create_missing_indexes(engine)
+
+def publish_change_feed():
+    # Mirror the change_log rows this run recorded into publish/changes/ for cache invalidation,
+    # and re-export the page documents and sitemap shards they touched
+    from db.Models import get_engine
+    from src.coordination.coordination import read_only
+    from src.publish.changes import publish_changes
+    from src.publish.documents import export_documents
+    from src.publish.sitemap import write_sitemaps
+    with read_only(get_engine()).connect() as conn:
+        publish_changes(conn)
+        export_documents(conn)
+        write_sitemaps(conn)
 
 def show_rmp_statistics():
     # Display current RMP coverage statistics
     try:
-        from db.Models import Session, Professor
-        session = Session()
+        from db.Models import Session, get_engine
+        from db.Reads import rmp_coverage, top_rated_professors
+        from src.coordination.coordination import read_only
+        session = Session(bind=read_only(get_engine()))
         
-        total_profs = session.query(Professor).count()
-        with_rmp = session.query(Professor).filter(Professor.RMP_score.isnot(None)).count()
+        counts = rmp_coverage(session)
+        total_profs, with_rmp = counts.total, counts.with_score
         coverage = (with_rmp / total_profs * 100) if total_profs > 0 else 0
         
         print(f"[RMP Stats] Total Professors: {total_profs}")
@@ -150,8 +196,7 @@ def show_rmp_statistics():
         
         # Show top/bottom rated if we have data
         if with_rmp > 0:
-            top_rated = session.query(Professor).filter(Professor.RMP_score.isnot(None))\
-                              .order_by(Professor.RMP_score.desc()).limit(3).all()
+            top_rated = top_rated_professors(session, 3)
             print(f"[RMP Stats] Top Rated: {[(p.name, p.RMP_score) for p in top_rated]}")
         
         session.close()
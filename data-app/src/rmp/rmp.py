@@ -1,15 +1,21 @@
 from db.Models import Professor, Session, Distribution
+from db.Reads import rmp_coverage, unmatched_professor_names
 from multiprocessing import Pool
-from aiohttp import BasicAuth
-from gql.transport.aiohttp import AIOHTTPTransport
-from gql import Client, gql
+from functools import lru_cache
 import time
 import json
 from pathlib import Path
+import numpy as np
+from src.metrics import metrics, get_logger
+from src.coordination.coordination import WriteQueue, stage_lock
+from sqlalchemy import update, func, select
+from src.generation.names import canonical_name
+from src.search.fts import sync_fts
+from src.publish.changes import record_changes
 
 # Fuzzy matching dependencies
 try:
-    from rapidfuzz import fuzz
+    from rapidfuzz import fuzz, process
     FUZZY_MATCHING_AVAILABLE = True
 except ImportError:
     FUZZY_MATCHING_AVAILABLE = False
@@ -20,6 +26,46 @@ GT_SCHOOL_NAME = "Georgia Institute of Technology"
 RMP_BASE_URL = "https://www.ratemyprofessors.com"
 RMP_GRAPHQL_URL = f"{RMP_BASE_URL}/graphql"
 MULTIPROCESS_POOL_SIZE = 5
+MAX_QUERY_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 2
+# Names per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+# Outcomes of a manual mapping row; the first two count as imported
+MANUAL_IMPORTED, MANUAL_UNCHANGED = "linked", "unchanged"
+MANUAL_IMPORT_STATUSES = [MANUAL_IMPORTED, MANUAL_UNCHANGED, "not_found", "invalid_id", "conflict", "duplicate", "empty"]
+
+log = get_logger("rmp")
+
+TEACHER_SEARCH_QUERY = """
+    query NewSearchTeachersQuery($professorName: String!, $schoolID: ID!){
+        newSearch{
+            teachers(query: {text: $professorName, schoolID: $schoolID}, first: 25){
+                edges{
+                    node{
+                        avgDifficulty
+                        avgRating
+                        wouldTakeAgainPercent
+                        id
+                        firstName
+                        lastName
+                        legacyId
+                        school{
+                            id
+                        }
+                    }
+                }
+            }
+        }
+    }
+"""
+
+
+@lru_cache(maxsize=None)
+def parse_query(source: str):
+    """Parsed GraphQL document for `source`; gql is imported on the first real query only."""
+    from gql import gql
+    return gql(source)
+
 
 # Fetch RMP data for given GT professor
 class RMP:
@@ -27,15 +73,16 @@ class RMP:
         self.SCHOOLS = [
             {"id": GT_SCHOOL_ID, "name": GT_SCHOOL_NAME}
         ]
-        RMPHeaders = {
+        self._headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",
             "Origin": RMP_BASE_URL,
             "Referer": f"{RMP_BASE_URL}/",
             "Sec-Fetch-Site": "same-origin",
             "Sec-Fetch-Mode": "cors",
         }
-        self.transport = AIOHTTPTransport(url=RMP_GRAPHQL_URL, auth=BasicAuth("test", "test"), ssl=False, headers=RMPHeaders)
-        self.gqlClient = Client(transport=self.transport, fetch_schema_from_transport=False)
+        # The GraphQL client (gql + aiohttp) is built on first use; matching, stats and duplicate
+        # cleanup never need it, and pool workers each build their own
+        self._gql_client = None
         
         # Initialize caching system
         self._cache_file = Path(__file__).parent / "rmp_cache.json"
@@ -64,6 +111,7 @@ class RMP:
             "susan": ["sue", "suzy"],
             "salvador": ["sal"]
         }
+        self._nickname_index = self._build_nickname_index()
 
     def _load_cache(self) -> dict:
         """Load cache from disk"""
@@ -108,25 +156,31 @@ class RMP:
         # Check manual cache first (never expires)
         if cache_key in self._cache["manual"]:
             entry = self._cache["manual"][cache_key]
-            print(f"[RMP Manual Cache] Found manual entry for {professor_name}")
+            metrics.incr("rmp.cache_hits.manual")
+            log.debug("manual_cache_hit", professor=professor_name)
             return entry["data"]
         
         # Check positive cache (6 months TTL)
         if cache_key in self._cache["positive"]:
             entry = self._cache["positive"][cache_key]
             if self._is_cache_valid(entry, 180):
+                metrics.incr("rmp.cache_hits.positive")
                 return entry["data"]
             else:
+                metrics.incr("rmp.cache_expired")
                 del self._cache["positive"][cache_key]
         
         # Check negative cache (2 weeks TTL)
         if cache_key in self._cache["negative"]:
             entry = self._cache["negative"][cache_key]
             if self._is_cache_valid(entry, 14):
+                metrics.incr("rmp.cache_hits.negative")
                 return []
             else:
+                metrics.incr("rmp.cache_expired")
                 del self._cache["negative"][cache_key]
         
+        metrics.incr("rmp.cache_misses")
         return None
 
     def _cache_result(self, professor_name: str, result: list):
@@ -146,8 +200,8 @@ class RMP:
         
         self._save_cache()
 
-    def _add_manual_cache_entry(self, professor_name: str, rmp_data: dict):
-        """Add manual entry to cache (never expires)"""
+    def _add_manual_cache_entry(self, professor_name: str, rmp_data: dict, save: bool = True):
+        """Add manual entry to cache (never expires); with save=False the caller writes the cache once at the end"""
         cache_key = self._get_cache_key(professor_name)
         
         # Create RMP-style candidate data from manual entry
@@ -173,8 +227,9 @@ class RMP:
         if cache_key in self._cache["negative"]:
             del self._cache["negative"][cache_key]
             
-        self._save_cache()
-        print(f"[RMP Manual] Added manual cache entry for {professor_name}")
+        if save:
+            self._save_cache()
+            print(f"[RMP Manual] Added manual cache entry for {professor_name}")
 
     def _remove_from_negative_cache(self, professor_name: str):
         """Remove professor from negative cache (used when manually adding)"""
@@ -186,101 +241,81 @@ class RMP:
 
 
     def _canonicalize_name(self, name: str) -> str:
-        """Clean and normalize name for matching purposes only"""
-        if not name:
-            return ""
-        
-        # Strip and normalize whitespace only
-        name = " ".join(name.strip().split())
-        
-        # Remove common academic titles and suffixes (case insensitive) for matching only
-        import re
-        name = re.sub(r'\b(dr|prof|professor)\.?\s*', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\s+(jr|sr|ii|iii|iv)\.?$', '', name, flags=re.IGNORECASE)
-        
-        # Final cleanup
-        name = " ".join(name.split())
-        
-        # Convert to lowercase for matching purposes only
-        return name.lower()
+        """Clean and normalize name for matching purposes only (same key as Professor.canonical_name)"""
+        return canonical_name(name)
+
+    def _build_nickname_index(self) -> dict:
+        """Map every full name and nickname to all names of its nickname group(s), in both directions"""
+        index = {}
+        for full_name, nicknames in self._nickname_map.items():
+            group = {full_name, *nicknames}
+            for name in group:
+                index.setdefault(name, set()).update(group)
+        return {name: frozenset(group) for name, group in index.items()}
 
     def _get_name_variants(self, first_name: str) -> list:
         """Get nickname variants for a first name"""
         canonical_first = self._canonicalize_name(first_name)
-        variants = [canonical_first]
-        
-        # Add nicknames if available
-        if canonical_first in self._nickname_map:
-            variants.extend(self._nickname_map[canonical_first])
-        
-        # Check if current name is a nickname and add full names
-        for full_name, nicknames in self._nickname_map.items():
-            if canonical_first in nicknames:
-                variants.append(full_name)
-                variants.extend(nicknames)
-        
-        return list(set(variants))
+        return list(self._nickname_index.get(canonical_first, frozenset()) | {canonical_first})
 
-    def _fuzzy_match_candidates(self, target_name: str, candidates: list) -> list:
-        """Apply fuzzy matching to filter candidates with high confidence"""
-        if not FUZZY_MATCHING_AVAILABLE or not candidates:
-            return candidates
-        
-        target_canonical = self._canonicalize_name(target_name)
-        scored_candidates = []
-        
+    def _canonical_candidates(self, candidates: list) -> list:
+        """(first, last, full) canonical names of each candidate, computed once per candidate list"""
+        canonical = []
         for candidate in candidates:
-            candidate_name = f"{candidate['node']['firstName']} {candidate['node']['lastName']}"
-            candidate_canonical = self._canonicalize_name(candidate_name)
-            
-            # Calculate fuzzy score
-            score = fuzz.token_sort_ratio(target_canonical, candidate_canonical) / 100.0
-            
-            # Only accept high confidence matches to avoid false positives
-            if score >= 0.85:
-                scored_candidates.append((candidate, score))
-        
-        # Sort by score (highest first) and return candidates
-        scored_candidates.sort(key=lambda x: x[1], reverse=True)
-        return [candidate for candidate, score in scored_candidates]
+            first = self._canonicalize_name(candidate["node"]["firstName"])
+            last = self._canonicalize_name(candidate["node"]["lastName"])
+            full = self._canonicalize_name(f"{candidate['node']['firstName']} {candidate['node']['lastName']}")
+            canonical.append((first, last, full))
+        return canonical
 
-    def _enhanced_match_candidates(self, target_name: str, candidates: list) -> list:
-        """Enhanced matching using nicknames and fuzzy matching"""
+    def _fuzzy_scores(self, target_canonicals: list, candidate_canonicals: list):
+        """token_sort_ratio of every target against every candidate (0-1) in one cdist call, or None without rapidfuzz"""
+        if not FUZZY_MATCHING_AVAILABLE or not target_canonicals or not candidate_canonicals:
+            return None
+        return process.cdist(target_canonicals, candidate_canonicals, scorer=fuzz.token_sort_ratio, dtype=np.float64) / 100.0
+
+    def _match_candidates_batch(self, target_names: list, candidates: list) -> list:
+        """
+        Enhanced matching of several names against one candidate list (e.g. everyone sharing a surname).
+
+        Returns one (matched candidates, fuzzy score of the best match or None) pair per target name:
+        nickname matches on first name plus exact last name, otherwise the single best fuzzy match.
+        """
         if not candidates:
-            return []
-        
-        # Parse target name
-        name_parts = target_name.strip().split()
-        if len(name_parts) < 2:
-            return []
-        
-        target_first = name_parts[0]
-        target_last = " ".join(name_parts[1:])
-        
-        # Get name variants for first name
-        first_variants = self._get_name_variants(target_first)
-        
-        matched_candidates = []
-        
-        # Try nickname matching first
-        for candidate in candidates:
-            candidate_first = self._canonicalize_name(candidate["node"]["firstName"])
-            candidate_last = self._canonicalize_name(candidate["node"]["lastName"])
-            target_last_clean = self._canonicalize_name(target_last)
-            
-            # Check if first name matches any variant and last name matches exactly
-            if candidate_first in first_variants and candidate_last == target_last_clean:
-                matched_candidates.append(candidate)
+            return [([], None) for _ in target_names]
+        canonical = self._canonical_candidates(candidates)
+        target_canonicals = [self._canonicalize_name(name) for name in target_names]
+        scores = self._fuzzy_scores(target_canonicals, [full for _, _, full in canonical])
+
+        results = []
+        for row, target_name in enumerate(target_names):
+            name_parts = target_name.strip().split()
+            if len(name_parts) < 2:
+                results.append(([], None))
                 continue
-        
-        # If no nickname matches and fuzzy matching available, try fuzzy matching
-        if not matched_candidates and FUZZY_MATCHING_AVAILABLE:
-            fuzzy_matches = self._fuzzy_match_candidates(target_name, candidates)
-            if fuzzy_matches:
-                # Only take the best match to avoid ambiguity
-                matched_candidates = [fuzzy_matches[0]]
-        
-        return matched_candidates
+            first_variants = set(self._get_name_variants(name_parts[0]))
+            target_last_clean = self._canonicalize_name(" ".join(name_parts[1:]))
+
+            # Try nickname matching first
+            matched = [column for column, (first, last, _) in enumerate(canonical)
+                       if first in first_variants and last == target_last_clean]
+            if matched:
+                best_score = float(scores[row][matched[0]]) if scores is not None else None
+                results.append(([candidates[column] for column in matched], best_score))
+                continue
+
+            # If no nickname matches and fuzzy matching available, take only the best high-confidence match
+            if scores is not None:
+                accepted = [column for column in np.argsort(-scores[row], kind="stable") if scores[row][column] >= 0.85]
+                if accepted:
+                    results.append(([candidates[accepted[0]]], float(scores[row][accepted[0]])))
+                    continue
+            results.append(([], None))
+        return results
+
+    def _enhanced_match_candidates(self, target_name: str, candidates: list) -> list:
+        """Enhanced matching using nicknames and fuzzy matching"""
+        return self._match_candidates_batch([target_name], candidates)[0][0]
 
     def _validate_match_quality(self, target_name: str, candidate_name: str, score: float) -> dict:
         """Validate the quality of a potential match and return quality metrics"""
@@ -336,130 +371,165 @@ class RMP:
             "recommended_action": recommendation
         }
 
+    @property
+    def gqlClient(self):
+        if self._gql_client is None:
+            from aiohttp import BasicAuth
+            from gql import Client
+            from gql.transport.aiohttp import AIOHTTPTransport
+
+            transport = AIOHTTPTransport(url=RMP_GRAPHQL_URL, auth=BasicAuth("test", "test"), ssl=False, headers=self._headers)
+            self._gql_client = Client(transport=transport, fetch_schema_from_transport=False)
+        return self._gql_client
+
+    def _execute_query(self, query: str, variable_values: dict) -> dict:
+        """Execute a GraphQL query, retrying transient failures with a linear backoff."""
+        for attempt in range(1, MAX_QUERY_ATTEMPTS + 1):
+            metrics.incr("rmp.api_calls")
+            try:
+                return self.gqlClient.execute(parse_query(query), variable_values=variable_values)
+            except Exception as e:
+                if attempt == MAX_QUERY_ATTEMPTS:
+                    metrics.incr("rmp.api_errors")
+                    raise
+                metrics.incr("rmp.retries")
+                log.warning("query_retry", attempt=attempt, error=str(e))
+                time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+
+    def _search_teachers(self, college: dict[str, str], search_text: str) -> list:
+        """Run one RMP teacher search at `college` and return its candidate edges."""
+        result = self._execute_query(TEACHER_SEARCH_QUERY, {"professorName": search_text, "schoolID": college["id"]})
+        return result["newSearch"]["teachers"]["edges"]
+
+    def _search_text(self, professor_name: str) -> str:
+        """Search by last name when there is one (fewer API calls, and nicknames still match), else by full name"""
+        name_parts = professor_name.strip().split()
+        return " ".join(name_parts[1:]) if len(name_parts) >= 2 else professor_name
+
     def get_prof_by_school_and_name(self, college: dict[str, str], professor_name: str) -> dict[str, str | float | int]:
         """Search for a professor by name using GraphQL with caching and enhanced matching."""
-        
-        # Check cache first
-        cached_result = self._get_cached_result(professor_name)
-        if cached_result is not None:
-            print(f"[RMP Cache] Found cached result for {professor_name}")
-            return cached_result
-        
-        # Optimized search strategy: search by last name first to reduce API calls
-        name_parts = professor_name.strip().split()
-        if len(name_parts) >= 2:
-            first_name = name_parts[0]
-            last_name = " ".join(name_parts[1:])
-            
-            # Primary search: by last name only (more efficient)
-            last_name_query = gql("""
-                query NewSearchTeachersQuery($professorName: String!, $schoolID: ID!){
-                    newSearch{
-                        teachers(query: {text: $professorName, schoolID: $schoolID}, first: 25){
-                            edges{
-                                node{
-                                    avgDifficulty
-                                    avgRating
-                                    wouldTakeAgainPercent
-                                    id
-                                    firstName
-                                    lastName
-                                    legacyId
-                                    school{
-                                        id
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            """)
-            
-            result = self.gqlClient.execute(last_name_query, variable_values={"professorName": last_name, "schoolID": college["id"]})
-            candidates = result["newSearch"]["teachers"]["edges"]
-            print(f"[RMP GQL] Searched by last name '{last_name}' for {professor_name} at {college['name']}")
-        else:
-            # Fallback to full name search for single names
-            full_name_query = gql("""
-                query NewSearchTeachersQuery($professorName: String!, $schoolID: ID!){
-                    newSearch{
-                        teachers(query: {text: $professorName, schoolID: $schoolID}, first: 25){
-                            edges{
-                                node{
-                                    avgDifficulty
-                                    avgRating
-                                    wouldTakeAgainPercent
-                                    id
-                                    firstName
-                                    lastName
-                                    legacyId
-                                    school{
-                                        id
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            """)
-            result = self.gqlClient.execute(full_name_query, variable_values={"professorName": professor_name, "schoolID": college["id"]})
-            candidates = result["newSearch"]["teachers"]["edges"]
-            print(f"[RMP GQL] Searched for {professor_name} at {college['name']}")
-        
-        # Cache the result before returning
-        self._cache_result(professor_name, candidates)
-        
+        return self._get_candidates(college, [professor_name])[professor_name]
+
+    def _get_candidates(self, college: dict[str, str], professor_names: list) -> dict:
+        """
+        Candidate lists for several professors: cached results first, then one search per distinct
+        search text (professors sharing a surname share one API call and one candidate list).
+        Each cache hit is a separate list, so one equal to an earlier list of the same search text is
+        replaced by that list; match_profs() batches professors by candidate list identity.
+        """
+        candidates = {}
+        uncached = {}
+        shared = {}
+        for professor_name in professor_names:
+            cached_result = self._get_cached_result(professor_name)
+            if cached_result is not None:
+                log.debug("cache_hit", professor=professor_name)
+                first = shared.setdefault(self._search_text(professor_name), cached_result)
+                candidates[professor_name] = first if first == cached_result else cached_result
+            else:
+                uncached.setdefault(self._search_text(professor_name), []).append(professor_name)
+
+        for search_text, names in uncached.items():
+            result = self._search_teachers(college, search_text)
+            log.debug("searched", text=search_text, professors="|".join(names), school=college["name"])
+            for professor_name in names:
+                self._cache_result(professor_name, result)
+                candidates[professor_name] = result
         return candidates
 
     def update_prof_by_name(self, prof: Professor) -> None:
         """Update a single professor's RMP data in the database with enhanced matching."""
-        profMatches = []
-        for school in self.SCHOOLS:
-            profMatches.extend(self.get_prof_by_school_and_name(school, prof.name))
+        rmp_data = self.match_prof(prof)
+        if rmp_data:
+            try:
+                session = Session()
+                session.query(Professor).filter(Professor.id == prof.id).update(rmp_data)
+                if any(getattr(prof, key) != value for key, value in rmp_data.items()):
+                    record_changes(session, "rmp", professor_ids=[prof.id])
+                session.commit()
+                metrics.incr("rmp.updated")
+                log.debug("professor_updated", professor=prof.name, score=rmp_data["RMP_score"])
+            except Exception as e:
+                session.rollback()
+                metrics.incr("rmp.db_errors")
+                log.error("professor_update_failed", professor=prof.name, error=str(e))
+            finally:
+                session.close()
+
+    def match_prof(self, prof: Professor) -> dict:
+        """Look up a professor on RMP and return validated column values ({"RMP_score": ...}), or None."""
+        return self.match_profs([prof])[prof.id]
+
+    def match_profs(self, profs: list) -> dict:
+        """
+        Look up several professors on RMP, returning {professor id: column values or None}.
+
+        Professors sharing a candidate list (the same surname search) are matched together: the
+        list is canonicalized once and every name is fuzzy-scored against it in one cdist call.
+        """
+        per_school = [self._get_candidates(school, [prof.name for prof in profs]) for school in self.SCHOOLS]
+        groups = {}
+        for prof in profs:
+            lists = [candidates[prof.name] for candidates in per_school]
+            key = tuple(id(candidates) for candidates in lists)
+            if key not in groups:
+                groups[key] = ([candidate for candidates in lists for candidate in candidates], [])
+            groups[key][1].append(prof)
 
+        results = {}
+        for candidates, group in groups.values():
+            matches = self._match_candidates_batch([prof.name for prof in group], candidates)
+            for prof, (enhanced_matches, fuzzy_score) in zip(group, matches):
+                results[prof.id] = self._select_match(prof, candidates, enhanced_matches, fuzzy_score)
+        return results
+
+    def _select_match(self, prof: Professor, profMatches: list, enhanced_matches: list, fuzzy_score) -> dict:
+        """Pick the RMP profile for `prof` among its candidates and return validated column values, or None."""
         # Try exact match first (preserve existing behavior)
         exact_matches = list(filter(lambda x: str.strip(x["node"]["firstName"] + " " + x["node"]["lastName"]) == prof.name, profMatches))
         
         if exact_matches:
             profMatches = exact_matches
-            print(f"[RMP Match] Found exact match for {prof.name}")
+            metrics.incr("rmp.match.exact")
+            log.debug("exact_match", professor=prof.name)
         else:
             # Try enhanced matching with quality validation
-            enhanced_matches = self._enhanced_match_candidates(prof.name, profMatches)
             if enhanced_matches:
                 # Validate match quality
                 best_match = enhanced_matches[0]
                 candidate_name = f"{best_match['node']['firstName']} {best_match['node']['lastName']}"
                 
-                if FUZZY_MATCHING_AVAILABLE:
-                    target_canonical = self._canonicalize_name(prof.name)
-                    candidate_canonical = self._canonicalize_name(candidate_name)
-                    fuzzy_score = fuzz.token_sort_ratio(target_canonical, candidate_canonical) / 100.0
-                    
+                if fuzzy_score is not None:
+                    # The best match's fuzzy score was already computed in the batch
                     quality_check = self._validate_match_quality(prof.name, candidate_name, fuzzy_score)
                     
                     if quality_check["recommended_action"] == "accept":
                         profMatches = enhanced_matches
-                        print(f"[RMP Match] Found high-quality enhanced match for {prof.name} -> {candidate_name} (confidence: {quality_check['confidence']:.2f})")
+                        metrics.incr("rmp.match.enhanced")
+                        log.debug("enhanced_match", professor=prof.name, candidate=candidate_name, confidence=round(quality_check['confidence'], 2))
                     elif quality_check["recommended_action"] == "review":
-                        print(f"[RMP Review] Questionable match for {prof.name} -> {candidate_name} (confidence: {quality_check['confidence']:.2f}, issues: {quality_check['issues']})")
+                        metrics.incr("rmp.match.review")
+                        log.info("questionable_match", professor=prof.name, candidate=candidate_name, confidence=round(quality_check['confidence'], 2), issues=",".join(quality_check['issues']))
                         profMatches = []  # Skip questionable matches for now
                     else:
-                        print(f"[RMP Reject] Poor match quality for {prof.name} -> {candidate_name} (confidence: {quality_check['confidence']:.2f}, issues: {quality_check['issues']})")
+                        metrics.incr("rmp.match.rejected")
+                        log.debug("rejected_match", professor=prof.name, candidate=candidate_name, confidence=round(quality_check['confidence'], 2), issues=",".join(quality_check['issues']))
                         profMatches = []
                 else:
                     # Without fuzzy matching, accept enhanced matches (nickname-based)
                     profMatches = enhanced_matches
-                    print(f"[RMP Match] Found enhanced match for {prof.name} -> {candidate_name}")
+                    metrics.incr("rmp.match.enhanced")
+                    log.debug("enhanced_match", professor=prof.name, candidate=candidate_name)
             else:
                 profMatches = []
-                print(f"[RMP Match] No suitable matches found for {prof.name}")
         if len(profMatches) == 0:
-            print(f"[RMP Fail] Failed to find {prof.name}")
-            return
+            metrics.incr("rmp.not_found")
+            log.debug("not_found", professor=prof.name)
+            return None
         elif len(profMatches) > 1:
-            print(f"[RMP Fail] Ambiguous match for {prof.name}")
-            return
+            metrics.incr("rmp.ambiguous")
+            log.debug("ambiguous_match", professor=prof.name, candidates=len(profMatches))
+            return None
         else:
             RMP_Prof = profMatches[0]["node"]
             
@@ -467,19 +537,12 @@ class RMP:
             debug_mode = getattr(self, 'debug_mode', False)
             rmp_data = self._validate_and_extract_rmp_data(RMP_Prof, prof.name, debug=debug_mode)
             
-            if rmp_data:
-                try:
-                    session = Session()
-                    session.query(Professor).filter(Professor.id == prof.id).update(rmp_data)
-                    session.commit()
-                    print(f"[RMP Update] Successfully updated {prof.name} with RMP score {rmp_data[Professor.RMP_score]}")
-                except Exception as e:
-                    session.rollback()
-                    print(f"[RMP Fail] Database error updating {prof.name}: {e}")
-                finally:
-                    session.close()
-            else:
-                print(f"[RMP Invalid] Rejected invalid RMP data for {prof.name}")
+            if not rmp_data:
+                metrics.incr("rmp.invalid")
+                log.debug("invalid_data_rejected", professor=prof.name)
+                return None
+            # Plain column names so the values can be returned from pool workers
+            return {column.key: value for column, value in rmp_data.items()}
 
     def _validate_and_extract_rmp_data(self, rmp_prof_node: dict, professor_name: str, debug: bool = False) -> dict:
         """Validate RMP data and return only if all required fields are valid"""
@@ -493,21 +556,17 @@ class RMP:
             last_name = rmp_prof_node.get("lastName", "")
             
             if debug:
-                print(f"[RMP Debug] Raw data for {professor_name}:")
-                print(f"  avgRating: {avg_rating} (type: {type(avg_rating)})")
-                print(f"  avgDifficulty: {avg_difficulty} (type: {type(avg_difficulty)})")
-                print(f"  wouldTakeAgainPercent: {would_take_again} (type: {type(would_take_again)})")
-                print(f"  legacyId: {legacy_id} (type: {type(legacy_id)})")
-                print(f"  RMP Name: {first_name} {last_name}")
+                log.debug("raw_rmp_data", professor=professor_name, avg_rating=avg_rating, avg_difficulty=avg_difficulty,
+                          would_take_again=would_take_again, legacy_id=legacy_id, rmp_name=f"{first_name} {last_name}")
             
             # Essential fields check - legacy_id must exist for a valid RMP profile
             if legacy_id is None:
-                print(f"[RMP Invalid] No legacy ID found for {professor_name}")
+                log.warning("invalid_rmp_data", professor=professor_name, reason="missing legacy id")
                 return None
                 
             # Validate legacy ID format
             if not str(legacy_id).isdigit():
-                print(f"[RMP Invalid] Invalid legacy ID format '{legacy_id}' for {professor_name}")
+                log.warning("invalid_rmp_data", professor=professor_name, reason=f"legacy id format {legacy_id!r}")
                 return None
             
             # Handle edge cases for professors with limited/no rating data
@@ -515,30 +574,30 @@ class RMP:
             
             # Convert and validate avg_rating
             if avg_rating is None:
-                print(f"[RMP Info] Professor {professor_name} has RMP profile but no average rating yet")
+                log.debug("no_average_rating", professor=professor_name)
                 avg_rating = 0.0  # Use 0.0 for unrated professors (valid case)
             else:
                 try:
                     avg_rating = float(avg_rating)
                     if not (0 <= avg_rating <= 5):
-                        print(f"[RMP Invalid] Rating {avg_rating} out of range for {professor_name}")
+                        log.warning("invalid_rmp_data", professor=professor_name, reason=f"rating {avg_rating} out of range")
                         return None
                 except (ValueError, TypeError):
-                    print(f"[RMP Invalid] Cannot convert rating '{avg_rating}' to float for {professor_name}")
+                    log.warning("invalid_rmp_data", professor=professor_name, reason=f"rating {avg_rating!r} not numeric")
                     return None
             
             # Convert and validate avg_difficulty  
             if avg_difficulty is None:
-                print(f"[RMP Info] Professor {professor_name} has no difficulty rating yet")
+                log.debug("no_difficulty_rating", professor=professor_name)
                 avg_difficulty = 0.0  # Use 0.0 for unrated difficulty
             else:
                 try:
                     avg_difficulty = float(avg_difficulty)
                     if not (0 <= avg_difficulty <= 5):
-                        print(f"[RMP Invalid] Difficulty {avg_difficulty} out of range for {professor_name}")
+                        log.warning("invalid_rmp_data", professor=professor_name, reason=f"difficulty {avg_difficulty} out of range")
                         return None
                 except (ValueError, TypeError):
-                    print(f"[RMP Invalid] Cannot convert difficulty '{avg_difficulty}' to float for {professor_name}")
+                    log.warning("invalid_rmp_data", professor=professor_name, reason=f"difficulty {avg_difficulty!r} not numeric")
                     return None
             
             # Handle would_take_again - this can legitimately be null, -1, or 0-100
@@ -549,10 +608,10 @@ class RMP:
                     if -1 <= would_take_again_float <= 100:  # -1 indicates no data, 0-100 are valid percentages
                         would_take_again_value = would_take_again_float
                     else:
-                        print(f"[RMP Warning] Would take again {would_take_again} out of range for {professor_name}")
+                        log.warning("would_take_again_out_of_range", professor=professor_name, value=would_take_again)
                         would_take_again_value = None  # Invalid value, store as null
                 except (ValueError, TypeError):
-                    print(f"[RMP Warning] Cannot convert would_take_again '{would_take_again}' for {professor_name}")
+                    log.warning("would_take_again_not_numeric", professor=professor_name, value=would_take_again)
                     would_take_again_value = None
             
             # Generate RMP profile link
@@ -567,13 +626,12 @@ class RMP:
             }
             
             if debug or (avg_rating == 0.0 and avg_difficulty == 0.0):
-                print(f"[RMP Valid] Storing data for {professor_name}: score={avg_rating}, diff={avg_difficulty}, take_again={would_take_again_value}")
+                log.debug("valid_rmp_data", professor=professor_name, score=avg_rating, diff=avg_difficulty, take_again=would_take_again_value)
             
             return result_data
             
         except Exception as e:
-            print(f"[RMP Error] Unexpected error validating data for {professor_name}: {e}")
-            print(f"[RMP Error] Raw node data: {rmp_prof_node}")
+            log.error("validation_error", professor=professor_name, error=str(e), node=rmp_prof_node)
             return None
 
     def _verify_rmp_url(self, url: str) -> bool:
@@ -592,23 +650,31 @@ class RMP:
         session = Session()
         
         try:
-            # Find duplicates based on canonical name matching
-            professors = session.query(Professor).all()
+            # Find duplicates based on canonical name matching (grouped through the canonical-name index)
+            duplicate_names = session.query(Professor.canonical_name)\
+                .group_by(Professor.canonical_name).having(func.count(Professor.id) > 1)
+            professors = session.query(Professor).filter(Professor.canonical_name.in_(duplicate_names.scalar_subquery()))\
+                .order_by(Professor.id).all()
             canonical_groups = {}
             
             # Group professors by canonical name
             for prof in professors:
-                canonical = self._canonicalize_name(prof.name)
-                if canonical not in canonical_groups:
-                    canonical_groups[canonical] = []
-                canonical_groups[canonical].append(prof)
+                canonical_groups.setdefault(prof.canonical_name, []).append(prof)
+
+            # Distribution counts of every professor in a duplicate group, in one query
+            dist_counts = dict(session.query(Distribution.instructor_id, func.count(Distribution.id))
+                               .filter(Distribution.instructor_id.in_([prof.id for prof in professors]))
+                               .group_by(Distribution.instructor_id).all())
             
             # Find groups with multiple professors (duplicates)
             duplicates_found = 0
+            # Professors kept or deleted by a merge, whose search documents change, and the classes they teach
+            merged_ids, moved_class_ids = set(), set()
             for canonical_name, prof_group in canonical_groups.items():
                 if len(prof_group) > 1:
                     duplicates_found += 1
-                    print(f"[RMP Duplicates] Found duplicates for '{canonical_name}': {[p.name for p in prof_group]}")
+                    metrics.incr("rmp.duplicates.groups")
+                    log.info("duplicates_found", canonical=canonical_name, names="|".join(p.name for p in prof_group))
                     
                     # Keep the professor with the most distributions or the lowest ID
                     best_prof = None
@@ -616,7 +682,7 @@ class RMP:
                     
                     for prof in prof_group:
                         # Count distributions
-                        dist_count = session.query(Distribution).filter(Distribution.professor_id == prof.id).count()
+                        dist_count = dist_counts.get(prof.id, 0)
                         score = dist_count * 1000 + (10000 - prof.id)  # Prefer more distributions, then lower ID
                         
                         if score > best_score:
@@ -626,12 +692,14 @@ class RMP:
                     # Merge others into the best professor
                     for prof in prof_group:
                         if prof.id != best_prof.id:
-                            print(f"[RMP Duplicates] Merging '{prof.name}' (ID {prof.id}) into '{best_prof.name}' (ID {best_prof.id})")
+                            metrics.incr("rmp.duplicates.merged")
+                            log.info("merging_duplicate", name=prof.name, id=prof.id, into=best_prof.name, into_id=best_prof.id)
                             
                             # Update distribution references
-                            distributions = session.query(Distribution).filter(Distribution.professor_id == prof.id).all()
+                            distributions = session.query(Distribution).filter(Distribution.instructor_id == prof.id).all()
                             for dist in distributions:
-                                dist.professor_id = best_prof.id
+                                dist.instructor_id = best_prof.id
+                                moved_class_ids.add(dist.class_id)
                             
                             # Merge RMP data if the duplicate has data and the best doesn't
                             if prof.RMP_score and not best_prof.RMP_score:
@@ -639,12 +707,16 @@ class RMP:
                                 best_prof.RMP_diff = prof.RMP_diff
                                 best_prof.RMP_link = prof.RMP_link
                                 best_prof.RMP_would_take_again = prof.RMP_would_take_again
-                                print(f"[RMP Duplicates] Transferred RMP data from duplicate")
+                                log.info("transferred_rmp_data", from_id=prof.id, to_id=best_prof.id)
                             
                             # Delete the duplicate
                             session.delete(prof)
+                            merged_ids.update((prof.id, best_prof.id))
             
             if duplicates_found > 0:
+                session.flush()
+                sync_fts(session.connection(), instructor_ids=merged_ids)
+                record_changes(session, "duplicates", class_ids=moved_class_ids, professor_ids=merged_ids)
                 session.commit()
                 print(f"[RMP Duplicates] Merged {duplicates_found} sets of duplicate professors")
             else:
@@ -662,14 +734,14 @@ class RMP:
             session = Session()
             
             # Find the professor with the old name
-            prof = session.query(Professor).filter(Professor.name == old_name).first()
+            prof = session.query(Professor).filter(Professor.by_name(old_name)).first()
             if not prof:
                 print(f"[Manual Name] Professor '{old_name}' not found in database")
                 session.close()
                 return False
             
             # Check if new name already exists
-            existing_prof = session.query(Professor).filter(Professor.name == new_name).first()
+            existing_prof = session.query(Professor).filter(Professor.by_name(new_name)).first()
             if existing_prof and existing_prof.id != prof.id:
                 print(f"[Manual Name] Professor '{new_name}' already exists. Use merge function instead.")
                 session.close()
@@ -677,6 +749,9 @@ class RMP:
             
             # Update the name
             prof.name = new_name
+            session.flush()
+            sync_fts(session.connection(), instructor_ids=[prof.id])
+            record_changes(session, "rmp", professor_ids=[prof.id])
             session.commit()
             
             print(f"[Manual Name] Successfully updated professor name: '{old_name}' → '{new_name}'")
@@ -692,13 +767,28 @@ class RMP:
 
 
 
+    def _manual_rmp_data(self, professor_name: str, rmp_id: str) -> dict:
+        """
+        Minimal RMP record for a manual mapping; the ratings are placeholders that the next
+        regular RMP run fills in.
+        """
+        name_parts = professor_name.split()
+        return {
+            "legacyId": int(rmp_id),
+            "avgRating": None,  # Will be populated if we fetch
+            "avgDifficulty": None,
+            "wouldTakeAgainPercent": None,
+            "firstName": name_parts[0] if name_parts else "",
+            "lastName": " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
+        }
+
     def add_manual_rmp_link(self, professor_name: str, rmp_id: str) -> bool:
         """Manually add RMP data for a professor by RMP ID"""
         try:
             session = Session()
             
             # Find the professor in database
-            prof = session.query(Professor).filter(Professor.name == professor_name).first()
+            prof = session.query(Professor).filter(Professor.by_name(professor_name)).first()
             if not prof:
                 print(f"[RMP Manual] Professor '{professor_name}' not found in database")
                 session.close()
@@ -716,22 +806,12 @@ class RMP:
             # Try to fetch RMP data using the ID directly
             print(f"[RMP Manual] Attempting to fetch data for {professor_name} using RMP ID {rmp_id}")
             
-            # For manual additions, we create a minimal RMP record
-            # The actual data can be fetched later or left as placeholders
-            rmp_data = {
-                "legacyId": int(rmp_id),
-                "avgRating": None,  # Will be populated if we fetch
-                "avgDifficulty": None,
-                "wouldTakeAgainPercent": None,
-                "firstName": prof.name.split()[0] if prof.name.split() else "",
-                "lastName": " ".join(prof.name.split()[1:]) if len(prof.name.split()) > 1 else ""
-            }
-            
             # Add to manual cache
-            self._add_manual_cache_entry(professor_name, rmp_data)
+            self._add_manual_cache_entry(professor_name, self._manual_rmp_data(prof.name, rmp_id))
             
             # Update database with link (minimal data for now)
             prof.RMP_link = rmp_link
+            record_changes(session, "rmp", professor_ids=[prof.id])
             session.commit()
             
             print(f"[RMP Manual] Successfully added manual RMP link for {professor_name}: {rmp_link}")
@@ -747,8 +827,72 @@ class RMP:
                 session.close()
             return False
 
-    def import_manual_mappings(self, csv_file_path: str) -> int:
-        """Import manual RMP mappings from CSV file"""
+    def _read_manual_mappings(self, csv_file_path: str) -> list:
+        """
+        Parse and validate a manual mapping CSV. Returns one result dict per data row (row, professor_name,
+        rmp_id, notes, status, detail); rows that pass validation have status None. Raises ValueError
+        on missing headers.
+        """
+        import csv
+
+        results = []
+        first_ids = {}
+        with open(csv_file_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            
+            # Validate CSV headers
+            required_headers = ['professor_name', 'rmp_id']
+            if not reader.fieldnames or not all(header in reader.fieldnames for header in required_headers):
+                raise ValueError(f"CSV must have headers {required_headers}, found {reader.fieldnames}")
+            
+            for row_num, row in enumerate(reader, start=2):  # Start at 2 since row 1 is headers
+                result = {
+                    "row": row_num,
+                    "professor_name": (row['professor_name'] or '').strip(),
+                    "rmp_id": (row['rmp_id'] or '').strip(),
+                    "notes": (row.get('notes') or '').strip(),
+                    "status": None,
+                    "detail": "",
+                }
+                results.append(result)
+                name, rmp_id = result["professor_name"], result["rmp_id"]
+                if not name or not rmp_id:
+                    result["status"], result["detail"] = "empty", "missing professor_name or rmp_id"
+                elif not rmp_id.isdigit():
+                    result["status"], result["detail"] = "invalid_id", "RMP ID must be numeric"
+                elif name in first_ids:
+                    # The first row for a professor wins; later rows only agree with it or conflict
+                    first_row, first_id = first_ids[name]
+                    result["status"] = "duplicate" if first_id == rmp_id else "conflict"
+                    result["detail"] = f"professor already mapped to {first_id} on row {first_row}"
+                else:
+                    first_ids[name] = (row_num, rmp_id)
+        return results
+
+    def _professors_by_name(self, session, names: list) -> dict:
+        """{name: (id, RMP_link)} for the professors named exactly as in `names`, in chunked canonical-name lookups."""
+        canonicals = sorted({canonical_name(name) for name in names})
+        wanted = set(names)
+        found = {}
+        for start in range(0, len(canonicals), LOOKUP_CHUNK_SIZE):
+            rows = session.execute(
+                select(Professor.id, Professor.name, Professor.RMP_link)
+                .where(Professor.canonical_name.in_(canonicals[start:start + LOOKUP_CHUNK_SIZE]))
+                .order_by(Professor.id)
+            )
+            for prof_id, name, rmp_link in rows:
+                # Same-named professors resolve to the oldest row, like by_name(...).first()
+                if name in wanted and name not in found:
+                    found[name] = (prof_id, rmp_link)
+        return found
+
+    def import_manual_mappings(self, csv_file_path: str, dry_run: bool = False, report_path: str = None) -> int:
+        """
+        Import manual RMP mappings from a CSV file in one pass: validate every row, resolve all names at
+        once, set every link in a single transaction and write the cache once. Prints (and with
+        `report_path` writes as CSV) one result per row. With `dry_run` nothing is written to the
+        database or cache. Returns the number of professors linked or already linked.
+        """
         import csv
         import os
         
@@ -756,45 +900,69 @@ class RMP:
             print(f"[RMP Manual] CSV file not found: {csv_file_path}")
             return 0
         
-        successful_imports = 0
+        try:
+            results = self._read_manual_mappings(csv_file_path)
+        except (ValueError, OSError, csv.Error) as e:
+            print(f"[RMP Manual] Error reading CSV file: {e}")
+            return 0
+        print(f"[RMP Manual] Processing {len(results)} manual mappings from {csv_file_path}")
         
+        pending = [result for result in results if result["status"] is None]
+        session = Session()
         try:
-            with open(csv_file_path, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                # Validate CSV headers
-                required_headers = ['professor_name', 'rmp_id']
-                if not all(header in reader.fieldnames for header in required_headers):
-                    print(f"[RMP Manual] CSV must have headers: {required_headers}")
-                    print(f"[RMP Manual] Found headers: {reader.fieldnames}")
-                    return 0
-                
-                print(f"[RMP Manual] Processing manual mappings from {csv_file_path}")
-                
-                for row_num, row in enumerate(reader, start=2):  # Start at 2 since row 1 is headers
-                    professor_name = row['professor_name'].strip()
-                    rmp_id = row['rmp_id'].strip()
-                    notes = row.get('notes', '').strip()
-                    
-                    if not professor_name or not rmp_id:
-                        print(f"[RMP Manual] Row {row_num}: Skipping empty professor_name or rmp_id")
-                        continue
-                    
-                    print(f"[RMP Manual] Row {row_num}: Processing {professor_name} -> RMP ID {rmp_id}")
-                    if notes:
-                        print(f"[RMP Manual] Notes: {notes}")
-                    
-                    if self.add_manual_rmp_link(professor_name, rmp_id):
-                        successful_imports += 1
+            with metrics.stage("rmp_manual_import"):
+                professors = self._professors_by_name(session, [result["professor_name"] for result in pending])
+                updates = []
+                for result in pending:
+                    match = professors.get(result["professor_name"])
+                    rmp_link = f"{RMP_BASE_URL}/professor/{result['rmp_id']}"
+                    if match is None:
+                        result["status"], result["detail"] = "not_found", "no professor with this exact name"
+                    elif match[1] == rmp_link:
+                        result["status"] = MANUAL_UNCHANGED
                     else:
-                        print(f"[RMP Manual] Row {row_num}: Failed to add {professor_name}")
-                        
+                        result["status"] = MANUAL_IMPORTED
+                        result["detail"] = f"replaces {match[1]}" if match[1] else ""
+                        updates.append({"id": match[0], "RMP_link": rmp_link})
+                
+                if not dry_run:
+                    # One transaction for every link; the cache is only touched once it committed
+                    if updates:
+                        session.execute(update(Professor), updates)
+                        record_changes(session, "rmp", professor_ids=[row["id"] for row in updates])
+                    session.commit()
+                    for result in results:
+                        if result["status"] in (MANUAL_IMPORTED, MANUAL_UNCHANGED):
+                            self._add_manual_cache_entry(result["professor_name"],
+                                                         self._manual_rmp_data(result["professor_name"], result["rmp_id"]),
+                                                         save=False)
+                    self._save_cache()
         except Exception as e:
-            print(f"[RMP Manual] Error reading CSV file: {e}")
-            return successful_imports
+            session.rollback()
+            print(f"[RMP Manual] Import failed, no mappings were applied: {e}")
+            return 0
+        finally:
+            session.close()
+        
+        counts = {status: 0 for status in MANUAL_IMPORT_STATUSES}
+        for result in results:
+            counts[result["status"]] += 1
+            metrics.incr(f"rmp.manual.{result['status']}")
+            detail = f" ({result['detail']})" if result["detail"] else ""
+            print(f"[RMP Manual] Row {result['row']}: {result['professor_name'] or '-'} -> {result['rmp_id'] or '-'}: "
+                  f"{result['status']}{detail}")
         
-        print(f"[RMP Manual] Successfully imported {successful_imports} manual RMP mappings")
-        return successful_imports
+        if report_path:
+            with open(report_path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=["row", "professor_name", "rmp_id", "status", "detail", "notes"])
+                writer.writeheader()
+                writer.writerows(results)
+            print(f"[RMP Manual] Per-row results written to {report_path}")
+        
+        imported = counts[MANUAL_IMPORTED] + counts[MANUAL_UNCHANGED]
+        print(f"[RMP Manual] {'Would import' if dry_run else 'Imported'} {imported} manual RMP mappings "
+              f"({', '.join(f'{count} {status}' for status, count in counts.items() if count)})")
+        return imported
 
     def export_unmatched_professors(self, csv_file_path: str) -> int:
         """Export professors without RMP data to CSV for manual research"""
@@ -804,11 +972,9 @@ class RMP:
             session = Session()
             
             # Find professors without RMP links
-            unmatched_profs = session.query(Professor).filter(
-                Professor.RMP_link.is_(None)
-            ).order_by(Professor.name).all()
+            unmatched_names = unmatched_professor_names(session)
             
-            if not unmatched_profs:
+            if not unmatched_names:
                 print("[RMP Manual] All professors have RMP data - no unmatched professors to export")
                 session.close()
                 return 0
@@ -821,14 +987,13 @@ class RMP:
                 writer.writerow(['professor_name', 'rmp_id', 'notes'])
                 
                 # Write professor data with empty rmp_id and notes for manual filling
-                for prof in unmatched_profs:
-                    writer.writerow([prof.name, '', 'Manual research needed'])
+                writer.writerows([name, '', 'Manual research needed'] for name in unmatched_names)
             
-            print(f"[RMP Manual] Exported {len(unmatched_profs)} unmatched professors to {csv_file_path}")
+            print(f"[RMP Manual] Exported {len(unmatched_names)} unmatched professors to {csv_file_path}")
             print(f"[RMP Manual] Please research RMP IDs and update the CSV, then use --import-manual to import")
             
             session.close()
-            return len(unmatched_profs)
+            return len(unmatched_names)
             
         except Exception as e:
             print(f"[RMP Manual] Error exporting unmatched professors: {e}")
@@ -843,7 +1008,9 @@ class RMP:
         
         # Step 1: Clean up duplicates if requested
         if fix_duplicates:
-            self._detect_and_merge_duplicates()
+            # Ingestion references professor ids, so it must not run while duplicates are deleted
+            with metrics.stage("rmp_duplicates"), stage_lock("professors"):
+                self._detect_and_merge_duplicates()
         
         # Step 2: Process RMP updates (only if not skipped)
         if not skip_rmp_updates:
@@ -852,13 +1019,39 @@ class RMP:
                 print("[RMP Debug] Debug mode enabled - detailed logging active")
             
             # Any higher multiprocessing pool size gets rate limited by RMP
-            with Pool(MULTIPROCESS_POOL_SIZE) as p:
+            with metrics.stage("rmp_updates"), Pool(MULTIPROCESS_POOL_SIZE) as p:
                 session = Session()
                 profs = session.query(Professor).order_by(Professor.name).all()
                 session.close()
                 
-                print(f"[RMP] Processing {len(profs)} professors for RMP data...")
-                p.map(self.update_prof_by_name, profs)
+                # Professors sharing a surname share one search and are matched as one batch
+                surname_groups = {}
+                for prof in profs:
+                    surname_groups.setdefault(self._search_text(prof.name), []).append(prof)
+
+                print(f"[RMP] Processing {len(profs)} professors ({len(surname_groups)} searches) for RMP data...")
+                # Workers only do network I/O; their results are written in batches by this process
+                profs_by_id = {prof.id: prof for prof in profs}
+                writes = WriteQueue(Session)
+                try:
+                    with writes:
+                        for worker_counters, results in p.imap_unordered(self._update_prof_worker, surname_groups.values()):
+                            # Workers count into their own copy of the registry, so fold their counters back in
+                            metrics.merge(worker_counters)
+                            for prof_id, rmp_data in results:
+                                if rmp_data:
+                                    # Only professors whose RMP values moved are keyed for the change feed
+                                    moved = any(getattr(profs_by_id[prof_id], key) != value for key, value in rmp_data.items())
+                                    writes.put(update(Professor).where(Professor.id == prof_id).values(**rmp_data), key=prof_id if moved else None)
+                                    metrics.incr("rmp.updated")
+                finally:
+                    # Publish only the writes that committed, even when a failed batch aborts the run
+                    session = Session()
+                    try:
+                        record_changes(session, "rmp", professor_ids=writes.committed)
+                        session.commit()
+                    finally:
+                        session.close()
                 
             print("[RMP] Completed RMP processing")
         else:
@@ -866,7 +1059,20 @@ class RMP:
         
         # Step 3: Verify data integrity
         if debug:
-            self._verify_data_integrity()
+            with metrics.stage("rmp_integrity"):
+                self._verify_data_integrity()
+
+    def _update_prof_worker(self, profs: list) -> tuple:
+        """Pool entry point: match a surname group and return (counters recorded, [(professor id, RMP values or None)])."""
+        metrics.reset()
+        metrics.incr("rmp.professors", len(profs))
+        matched = {}
+        try:
+            matched = self.match_profs(profs)
+        except Exception as e:
+            metrics.incr("rmp.errors", len(profs))
+            log.error("professor_failed", professors="|".join(prof.name for prof in profs), error=str(e))
+        return metrics.snapshot(), [(prof.id, matched.get(prof.id)) for prof in profs]
 
     def _verify_data_integrity(self) -> None:
         """Verify RMP data integrity after processing"""
@@ -874,57 +1080,33 @@ class RMP:
         session = Session()
         
         try:
-            # Check for professors with RMP links but no scores (should not happen)
-            invalid_entries = session.query(Professor).filter(
-                Professor.RMP_link.isnot(None),
-                Professor.RMP_score.is_(None)
-            ).all()
-            
-            if invalid_entries:
-                print(f"[RMP Integrity] ISSUE: {len(invalid_entries)} professors have RMP links but no scores:")
-                for prof in invalid_entries[:5]:  # Show first 5
-                    print(f"  - {prof.name}: {prof.RMP_link}")
-            
-            # Check for scores outside valid range
-            invalid_scores = session.query(Professor).filter(
-                Professor.RMP_score.isnot(None),
-                ~Professor.RMP_score.between(0, 5)
-            ).all()
-            
-            if invalid_scores:
-                print(f"[RMP Integrity] ISSUE: {len(invalid_scores)} professors have scores outside 0-5 range:")
-                for prof in invalid_scores[:5]:
-                    print(f"  - {prof.name}: score={prof.RMP_score}")
-            
-            # Check for negative would_take_again values (other than -1 which indicates no data)
-            invalid_take_again = session.query(Professor).filter(
-                Professor.RMP_would_take_again.isnot(None),
-                Professor.RMP_would_take_again < -1
-            ).all()
-            
-            if invalid_take_again:
-                print(f"[RMP Integrity] ISSUE: {len(invalid_take_again)} professors have invalid would_take_again values:")
-                for prof in invalid_take_again[:5]:
-                    print(f"  - {prof.name}: would_take_again={prof.RMP_would_take_again}")
+            # Every count comes from one aggregate query; offending rows are only read to show examples
+            coverage = rmp_coverage(session)
+            checks = [
+                (coverage.link_without_score, "have RMP links but no scores", Professor.RMP_link,
+                 [Professor.RMP_link.isnot(None), Professor.RMP_score.is_(None)], "{}"),
+                (coverage.invalid_scores, "have scores outside 0-5 range", Professor.RMP_score,
+                 [Professor.RMP_score.isnot(None), ~Professor.RMP_score.between(0, 5)], "score={}"),
+                # Negative would_take_again values other than -1, which indicates no data
+                (coverage.invalid_take_again, "have invalid would_take_again values", Professor.RMP_would_take_again,
+                 [Professor.RMP_would_take_again < -1], "would_take_again={}"),
+            ]
+            for count, issue, column, conditions, value_format in checks:
+                if count:
+                    print(f"[RMP Integrity] ISSUE: {count} professors {issue}:")
+                    # Show first 5
+                    for name, value in session.execute(select(Professor.name, column).where(*conditions).limit(5)):
+                        print(f"  - {name}: {value_format.format(value)}")
             
             # Summary statistics
-            total_profs = session.query(Professor).count()
-            with_rmp_links = session.query(Professor).filter(Professor.RMP_link.isnot(None)).count()
-            with_valid_scores = session.query(Professor).filter(
-                Professor.RMP_score.isnot(None),
-                Professor.RMP_score.between(0, 5)
-            ).count()
-            
-            zero_scores = session.query(Professor).filter(Professor.RMP_score == 0.0).count()
-            
             print(f"[RMP Integrity] Data Quality Summary:")
-            print(f"  Total professors: {total_profs}")
-            print(f"  With RMP links: {with_rmp_links}")
-            print(f"  With valid scores: {with_valid_scores}")
-            print(f"  With 0.0 scores: {zero_scores} (may be legitimate unrated professors)")
-            print(f"  Coverage: {(with_valid_scores/total_profs*100):.1f}%")
+            print(f"  Total professors: {coverage.total}")
+            print(f"  With RMP links: {coverage.with_link}")
+            print(f"  With valid scores: {coverage.valid_scores}")
+            print(f"  With 0.0 scores: {coverage.zero_scores} (may be legitimate unrated professors)")
+            print(f"  Coverage: {(coverage.valid_scores/coverage.total*100):.1f}%")
             
-            if len(invalid_entries) == 0 and len(invalid_scores) == 0 and len(invalid_take_again) == 0:
+            if not any(count for count, *_ in checks):
                 print("[RMP Integrity] ✅ All data integrity checks passed!")
             else:
                 print("[RMP Integrity] ⚠️ Data integrity issues found - see details above")
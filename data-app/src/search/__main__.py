@@ -0,0 +1,38 @@
+"""
+Create or bring the FTS5 search tables up to date.
+
+    python -m src.search                 # create missing tables, sync new and deleted entities
+    python -m src.search --rebuild       # drop and rebuild every table from scratch
+"""
+import argparse
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create, sync or rebuild the FTS5 search tables.')
+    parser.add_argument('--db', default='ProcessedData.db', help='Database file (default: ProcessedData.db).')
+    parser.add_argument('--rebuild', action='store_true', help='Drop and rebuild every FTS table from scratch.')
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, text
+    from src.coordination.coordination import configure_sqlite
+    from src.search.fts import FTS_TABLES, create_fts_table, sync_stale_fts
+
+    engine = configure_sqlite(create_engine(f"sqlite:///{args.db}", echo=False, future=True))
+    try:
+        with engine.begin() as conn:
+            if args.rebuild:
+                for table in FTS_TABLES:
+                    print(f"[FTS] Rebuilt {table} ({create_fts_table(conn, table)} rows)")
+            else:
+                synced = sync_stale_fts(conn)
+                print(f"[FTS] Synced search documents: {synced or 'none changed'}")
+            counts = {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in FTS_TABLES}
+        print(f"[FTS] Documents: {counts}")
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+FTS5 search tables used by the frontend (courses_fts, professors_fts, departments_fts).
+
+The Python pipeline owns these tables. Each search document carries its summary fields
+(average_gpa, most_grade, most_percent) as UNINDEXED columns, so a search reads them from the FTS
+row instead of joining the summary tables. Course and professor documents use the class or
+professor id as their rowid, which makes updating one entity a delete plus an insert by rowid:
+
+  * generate_summaries.py refreshes the documents of every class, instructor and department it
+    re-summarized (all of them on a full run)
+  * main.py and the maintenance stage add and remove documents whose entity appeared or
+    disappeared (ingested classes and professors, merged duplicates), found by comparing keys
+  * duplicate merges and professor renames refresh the professors they touched
+  * catalog ingestion refreshes the courses whose catalog entry changed (course titles come
+    from course_catalog)
+
+A table is only dropped and rebuilt when its declared schema below changes.
+"""
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import bindparam, text
+
+CUMULATIVE_JSON = Path(__file__).resolve().parents[2] / "COURSE_INFO" / "cumulative.json"
+FTS_TABLES = ["courses_fts", "professors_fts", "departments_fts"]
+# Ids per DELETE/SELECT, well under SQLite's bound-parameter limit
+SYNC_CHUNK_SIZE = 500
+
+SUMMARY_COLUMNS = "average_gpa UNINDEXED, most_grade UNINDEXED, most_percent UNINDEXED"
+FTS_SCHEMAS = {
+    "courses_fts": f"""CREATE VIRTUAL TABLE courses_fts USING fts5(
+        course_code, course_code_space, course_title, department, class_id UNINDEXED,
+        {SUMMARY_COLUMNS}, tokenize = 'porter ascii'
+    )""",
+    "professors_fts": f"""CREATE VIRTUAL TABLE professors_fts USING fts5(
+        name, {SUMMARY_COLUMNS}, tokenize = 'porter ascii'
+    )""",
+    "departments_fts": f"""CREATE VIRTUAL TABLE departments_fts USING fts5(
+        dept_abbr, dept_name, {SUMMARY_COLUMNS}, tokenize = 'porter ascii'
+    )""",
+}
+
+# Source rows of each table's documents; {filter} narrows them to the entities being synced
+DOCUMENT_SQL = {
+    "courses_fts": """
+        SELECT c.id, c.dept_abbr, c.course_num, c.class_desc, s.average_gpa, s.most_grade, s.most_percent
+        FROM classdistribution c LEFT JOIN class_summary s ON s.class_id = c.id
+        WHERE c.total_students > 0 {filter}
+    """,
+    "professors_fts": """
+        SELECT p.id, p.name, s.average_gpa, s.most_grade, s.most_percent
+        FROM professor p LEFT JOIN instructor_summary s ON s.instructor_id = p.id
+        WHERE p.name IS NOT NULL AND p.name != '' {filter}
+    """,
+    "departments_fts": """
+        SELECT DISTINCT d.dept_abbr, d.dept_name, s.average_gpa, s.most_grade, s.most_percent
+        FROM departmentdistribution d LEFT JOIN department_summary s ON s.dept_abbr = d.dept_abbr
+        WHERE d.dept_abbr IS NOT NULL AND d.dept_name IS NOT NULL {filter}
+    """,
+}
+# Column of DOCUMENT_SQL each table's documents are keyed on, and the FTS column holding that key
+DOCUMENT_KEYS = {
+    "courses_fts": ("c.id", "rowid"),
+    "professors_fts": ("p.id", "rowid"),
+    "departments_fts": ("d.dept_abbr", "dept_abbr"),
+}
+INSERT_SQL = {
+    "courses_fts": """
+        INSERT INTO courses_fts (rowid, course_code, course_code_space, course_title, department, class_id,
+                                 average_gpa, most_grade, most_percent)
+        VALUES (:class_id, :code, :code_space, :title, :dept, :class_id, :average_gpa, :most_grade, :most_percent)
+    """,
+    "professors_fts": """
+        INSERT INTO professors_fts (rowid, name, average_gpa, most_grade, most_percent)
+        VALUES (:id, :name, :average_gpa, :most_grade, :most_percent)
+    """,
+    "departments_fts": """
+        INSERT INTO departments_fts (dept_abbr, dept_name, average_gpa, most_grade, most_percent)
+        VALUES (:dept_abbr, :dept_name, :average_gpa, :most_grade, :most_percent)
+    """,
+}
+
+# Rows each FTS table should hold, as (source query, FTS query) pairs of comparable keys
+FTS_KEYS = {
+    "courses_fts": (
+        "SELECT id FROM classdistribution WHERE total_students > 0",
+        "SELECT rowid FROM courses_fts",
+    ),
+    "professors_fts": (
+        "SELECT id FROM professor WHERE name IS NOT NULL AND name != ''",
+        "SELECT rowid FROM professors_fts",
+    ),
+    "departments_fts": (
+        "SELECT DISTINCT dept_abbr FROM departmentdistribution WHERE dept_abbr IS NOT NULL AND dept_name IS NOT NULL",
+        "SELECT dept_abbr FROM departments_fts",
+    ),
+}
+
+
+def _normalized(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql or "").replace("( ", "(").replace(" )", ")").strip()
+
+
+def existing_fts_tables(conn) -> list:
+    existing = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    return [name for name in FTS_TABLES if name in existing]
+
+
+def outdated_fts_tables(conn) -> list:
+    """FTS tables that are missing or were created with a different schema than FTS_SCHEMAS."""
+    created = dict(conn.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).all())
+    return [table for table in FTS_TABLES if _normalized(created.get(table)) != _normalized(FTS_SCHEMAS[table])]
+
+
+def stale_fts_keys(conn, tables=None) -> dict:
+    """{table: keys} of documents missing from, or left over in, each FTS table (only tables with any)."""
+    stale = {}
+    for table in tables or existing_fts_tables(conn):
+        source_sql, fts_sql = FTS_KEYS[table]
+        keys = [row[0] for row in conn.execute(text(f"""
+            SELECT * FROM ({source_sql} EXCEPT {fts_sql})
+            UNION
+            SELECT * FROM ({fts_sql} EXCEPT {source_sql})
+        """))]
+        if keys:
+            stale[table] = keys
+    return stale
+
+
+@lru_cache(maxsize=1)
+def load_course_titles(path: Path = CUMULATIVE_JSON) -> dict:
+    """Catalog titles keyed by course id without spaces (e.g. "ACCT2101")."""
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        courses = json.load(f).get("courses", [])
+    return {course["courseId"].replace(" ", ""): course.get("title") for course in courses}
+
+
+def course_titles(conn) -> dict:
+    """
+    Catalog titles keyed by class code (e.g. "ACCT2101") from course_catalog; a database whose
+    catalog was never ingested (python -m src.catalog) falls back to cumulative.json.
+    """
+    if conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_catalog'")).first():
+        titles = dict(conn.execute(text("SELECT class_code, title FROM course_catalog WHERE title IS NOT NULL")).all())
+        if titles:
+            return titles
+    return load_course_titles()
+
+
+def _documents(conn, table: str, keys=None, titles=None) -> list:
+    """Insert parameters of the documents of `keys` (every document when None)."""
+    key_column = DOCUMENT_KEYS[table][0]
+    if keys is None:
+        rows = conn.execute(text(DOCUMENT_SQL[table].format(filter=""))).all()
+    else:
+        statement = text(DOCUMENT_SQL[table].format(filter=f"AND {key_column} IN :keys")) \
+            .bindparams(bindparam("keys", expanding=True))
+        rows = [row for start in range(0, len(keys), SYNC_CHUNK_SIZE)
+                for row in conn.execute(statement, {"keys": keys[start:start + SYNC_CHUNK_SIZE]})]
+    if table != "courses_fts":
+        return [row._asdict() for row in rows]
+    titles = course_titles(conn) if titles is None else titles
+    return [{
+        "class_id": class_id,
+        "code": f"{dept}{number}",
+        "code_space": f"{dept} {number}",
+        "title": titles.get(f"{dept}{number}") or desc or "",
+        "dept": dept,
+        "average_gpa": average_gpa,
+        "most_grade": most_grade,
+        "most_percent": most_percent,
+    } for class_id, dept, number, desc, average_gpa, most_grade, most_percent in rows]
+
+
+def create_fts_table(conn, table: str, titles=None) -> int:
+    """(Re)create one FTS table from FTS_SCHEMAS, fill it and merge its index segments."""
+    conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    conn.execute(text(FTS_SCHEMAS[table]))
+    return rebuild_fts_table(conn, table, titles)
+
+
+def rebuild_fts_table(conn, table: str, titles=None) -> int:
+    """Repopulate one FTS table from scratch and merge its index segments."""
+    conn.execute(text(f"DELETE FROM {table}"))
+    documents = _documents(conn, table, titles=titles)
+    if documents:
+        conn.execute(text(INSERT_SQL[table]), documents)
+    conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+    return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def ensure_fts_tables(conn, titles=None) -> list:
+    """Create and fill every FTS table that is missing or has an outdated schema; returns their names."""
+    outdated = outdated_fts_tables(conn)
+    for table in outdated:
+        rows = create_fts_table(conn, table, titles)
+        print(f"[FTS] Created {table} ({rows} rows)")
+    return outdated
+
+
+def sync_fts_documents(conn, table: str, keys, titles=None) -> int:
+    """Replace the documents of `keys` in `table` with their current rows (dropping those that no longer qualify)."""
+    keys = sorted(set(keys))
+    if not keys:
+        return 0
+    key_column = DOCUMENT_KEYS[table][1]
+    delete = text(f"DELETE FROM {table} WHERE {key_column} IN :keys").bindparams(bindparam("keys", expanding=True))
+    for start in range(0, len(keys), SYNC_CHUNK_SIZE):
+        conn.execute(delete, {"keys": keys[start:start + SYNC_CHUNK_SIZE]})
+    documents = _documents(conn, table, keys, titles)
+    if documents:
+        conn.execute(text(INSERT_SQL[table]), documents)
+    return len(keys)
+
+
+def sync_fts(conn, class_ids=(), instructor_ids=(), dept_abbrs=(), titles=None) -> dict:
+    """
+    Bring the FTS documents of the given classes, instructors and departments up to date, after
+    creating any table whose schema changed. Returns {table: documents refreshed}.
+    """
+    created = ensure_fts_tables(conn, titles)
+    keys = {"courses_fts": class_ids, "professors_fts": instructor_ids, "departments_fts": dept_abbrs}
+    return {table: sync_fts_documents(conn, table, table_keys, titles)
+            for table, table_keys in keys.items() if table not in created and table_keys}
+
+
+def sync_stale_fts(conn, titles=None) -> dict:
+    """Add documents for new entities and remove those of deleted ones. Returns {table: documents changed}."""
+    created = ensure_fts_tables(conn, titles)
+    stale = stale_fts_keys(conn, [table for table in FTS_TABLES if table not in created])
+    return {table: sync_fts_documents(conn, table, keys, titles) for table, keys in stale.items()}
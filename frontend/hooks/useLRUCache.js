@@ -8,6 +8,42 @@ setInterval(() => {
   detailCache.cleanup();
 }, 10 * 60 * 1000);
 
+// Evict the detail pages a pipeline run changed since they were cached (see pages/api/changes.js)
+const CHANGE_POLL_MS = 60 * 1000;
+let changeVersion = null;
+
+const routeKey = (route) => {
+  const match = route.match(/^\/(class|inst|dept)\/([^/?#]+)/);
+  return match ? { kind: match[1], key: decodeURIComponent(match[2]).replace(/\s+/g, '').toUpperCase() } : null;
+};
+
+const evictChangedDetails = async () => {
+  try {
+    const response = await fetch(changeVersion === null ? '/api/changes' : `/api/changes?since=${changeVersion}`);
+    if (!response.ok) return;
+    const { data } = await response.json();
+    if (changeVersion !== null) {
+      const changed = {
+        class: new Set(data.classCodes),
+        inst: new Set(data.professorIds.map(String)),
+        dept: new Set(data.deptAbbrs),
+      };
+      detailCache.deleteWhere((route) => {
+        const page = routeKey(route);
+        return data.reset || (page !== null && changed[page.kind].has(page.key));
+      });
+    }
+    changeVersion = data.version;
+  } catch (error) {
+    // Offline or mid-deploy: try again on the next poll
+  }
+};
+
+if (typeof window !== 'undefined') {
+  evictChangedDetails();
+  setInterval(evictChangedDetails, CHANGE_POLL_MS);
+}
+
 export const useLRUCache = () => {
   const getCachedDetail = (route) => {
     return detailCache.get(route);
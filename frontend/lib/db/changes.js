@@ -0,0 +1,66 @@
+import { db } from "./connection.js";
+
+// Change feed written by the data pipeline (data-app/src/publish/changes.py): every write appends a
+// change_log row with the class codes, professor ids and department codes it touched. In-process
+// caches subscribe through onChanges() and evict just those keys instead of waiting out their TTL.
+// Databases built before the table existed have no feed, and caches fall back to their TTL.
+const CHANGE_POLL_MS = 10 * 1000;
+
+const hasChangeLog = Boolean(
+  db.prepare("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'").get()
+);
+const latestVersionStmt = hasChangeLog
+  ? db.prepare("SELECT COALESCE(MAX(version), 0) AS version FROM change_log")
+  : null;
+const changesSinceStmt = hasChangeLog
+  ? db.prepare(`
+      SELECT class_codes AS classCodes, professor_ids AS professorIds, dept_abbrs AS deptAbbrs
+      FROM change_log
+      WHERE version > ?
+      ORDER BY version
+    `)
+  : null;
+
+const latestChangeVersion = () => (latestVersionStmt ? latestVersionStmt.get().version : 0);
+
+// Keys changed after `version`, merged into Sets. A `version` ahead of the log means the database
+// was rebuilt and its versions started over, so `reset` asks the caller to flush everything.
+const getChangesSince = (version) => {
+  const latest = latestChangeVersion();
+  const changes = {
+    version: latest,
+    reset: version > latest,
+    classCodes: new Set(),
+    professorIds: new Set(),
+    deptAbbrs: new Set(),
+  };
+  if (!changesSinceStmt || changes.reset) return changes;
+
+  changesSinceStmt.all(version).forEach((row) => {
+    JSON.parse(row.classCodes).forEach((code) => changes.classCodes.add(code));
+    JSON.parse(row.professorIds).forEach((id) => changes.professorIds.add(id));
+    JSON.parse(row.deptAbbrs).forEach((dept) => changes.deptAbbrs.add(dept));
+  });
+  return changes;
+};
+
+let seenVersion = latestChangeVersion();
+let checkedAt = Date.now();
+const listeners = [];
+
+const onChanges = (listener) => {
+  listeners.push(listener);
+};
+
+// Called on cache reads; costs at most one MAX(version) read per CHANGE_POLL_MS
+const pollChanges = () => {
+  if (!latestVersionStmt || Date.now() - checkedAt < CHANGE_POLL_MS) return;
+  checkedAt = Date.now();
+  if (latestChangeVersion() === seenVersion) return;
+
+  const changes = getChangesSince(seenVersion);
+  seenVersion = changes.version;
+  listeners.forEach((listener) => listener(changes));
+};
+
+export { latestChangeVersion, getChangesSince, onChanges, pollChanges };
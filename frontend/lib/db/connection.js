@@ -98,38 +98,38 @@ const logBootRequest = (endpoint, totalDuration, dbDuration) => {
   }
 };
 
+// Course metadata (titles, descriptions, requisites) is a point read on course_catalog, which the
+// data pipeline ingests from COURSE_INFO. Databases built before that table existed fall back to
+// parsing cumulative.json once per process.
+const catalogColumns = ['prerequisites', 'corequisites', 'restrictions'];
+const hasCourseCatalog = Boolean(
+  db.prepare("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_catalog'").get()
+);
+const courseCatalogStmt = hasCourseCatalog
+  ? db.prepare(`
+      SELECT course_id AS courseId, subject_code AS subjectCode, course_number AS courseNumber, title,
+             description, credit_hours AS creditHours, prerequisites, corequisites, restrictions, term,
+             last_updated AS lastUpdated
+      FROM course_catalog
+      WHERE class_code = ?
+    `)
+  : null;
+
 let cumulativeCourseData = null;
-let cumulativeDataLoadTime = null;
 
 const loadCumulativeCourseData = () => {
-  const now = Date.now();
-
-  // Cache for 1 hour to improve performance
-  if (
-    cumulativeCourseData &&
-    cumulativeDataLoadTime &&
-    now - cumulativeDataLoadTime < 3600000
-  ) {
+  if (cumulativeCourseData) {
     return cumulativeCourseData;
   }
 
+  const courseMap = new Map();
   try {
     if (fs.existsSync(cumulativeJsonPath)) {
       const jsonData = JSON.parse(fs.readFileSync(cumulativeJsonPath, "utf8"));
-
-      // Create a map for quick lookup by courseId
-      const courseMap = new Map();
-      if (jsonData.courses) {
-        jsonData.courses.forEach((course) => {
-          // Remove space from courseId for consistent lookup (e.g., "ACCT 2101" -> "ACCT2101")
-          const courseKey = course.courseId.replace(/\s+/g, "");
-          courseMap.set(courseKey, course);
-        });
-      }
-
-      cumulativeCourseData = courseMap;
-      cumulativeDataLoadTime = now;
-      return courseMap;
+      (jsonData.courses || []).forEach((course) => {
+        // Remove space from courseId for consistent lookup (e.g., "ACCT 2101" -> "ACCT2101")
+        courseMap.set(course.courseId.replace(/\s+/g, "").toUpperCase(), course);
+      });
     }
   } catch (error) {
     // Log error in development, but don't expose in production
@@ -139,12 +139,22 @@ const loadCumulativeCourseData = () => {
     }
   }
 
-  return new Map();
+  cumulativeCourseData = courseMap;
+  return courseMap;
 };
 
 const getCourseInfo = (classCode) => {
-  const courseMap = loadCumulativeCourseData();
-  return courseMap.get(classCode.replace(/\s+/g, "")) || null;
+  const key = classCode.replace(/\s+/g, "").toUpperCase();
+  if (!courseCatalogStmt) {
+    return loadCumulativeCourseData().get(key) || null;
+  }
+
+  const row = courseCatalogStmt.get(key);
+  if (!row) return null;
+  catalogColumns.forEach((column) => {
+    row[column] = row[column] === null ? null : JSON.parse(row[column]);
+  });
+  return row;
 };
 
 // Better-sqlite3 is synchronous, but we'll wrap in Promise for API compatibility
@@ -1,4 +1,5 @@
 import { promisedQuery } from './connection.js';
+import { onChanges, pollChanges } from './changes.js';
 import { getSearch } from './search.js';
 
 // Search result cache for performance
@@ -9,6 +10,7 @@ const CACHE_TTL = 5 * 60 * 1000; // 5 minutes
 const COMMON_DEPT_SEARCHES = ['math', 'chem', 'cs', 'phys', 'biol', 'econ', 'me', 'ece', 'isye'];
 
 const getCachedResult = (searchKey) => {
+  pollChanges();
   const cached = searchCache.get(searchKey);
   if (cached && Date.now() - cached.timestamp < CACHE_TTL) {
     return cached.data;
@@ -16,9 +18,17 @@ const getCachedResult = (searchKey) => {
   return null;
 };
 
-const setCachedResult = (searchKey, data) => {
+// Entity keys a cached result shows, plus the department searched (where new classes would appear)
+const resultKeys = (data, dept) => ({
+  classCodes: data.classes.map(row => (row.class_name || '').replace(/\s+/g, '').toUpperCase()),
+  professorIds: data.professors.map(row => row.id),
+  deptAbbrs: data.departments.map(row => row.dept_abbr).concat(dept ? [dept] : [])
+});
+
+const setCachedResult = (searchKey, data, dept = null) => {
   searchCache.set(searchKey, {
     data,
+    keys: resultKeys(data, dept),
     timestamp: Date.now()
   });
   
@@ -29,6 +39,19 @@ const setCachedResult = (searchKey, data) => {
   }
 };
 
+// Drop the cached searches showing anything a pipeline run changed (see changes.js)
+onChanges((changes) => {
+  for (const [searchKey, cached] of searchCache.entries()) {
+    const { classCodes, professorIds, deptAbbrs } = cached.keys;
+    if (changes.reset
+      || classCodes.some(code => changes.classCodes.has(code))
+      || professorIds.some(id => changes.professorIds.has(id))
+      || deptAbbrs.some(dept => changes.deptAbbrs.has(dept))) {
+      searchCache.delete(searchKey);
+    }
+  }
+});
+
 // Comprehensive course code detection patterns
 const COURSE_CODE_PATTERNS = [
   // Course codes: "CS1332", "CS 1332", "CHEM1211K", "CHEM 1211K" 
@@ -105,9 +128,8 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
         SELECT DISTINCT
           cf.class_id, cf.course_code, cf.course_code_space, cf.course_title, cf.department,
           1000 as relevance_score,
-          cs.average_gpa AS averageGPA, cs.most_grade AS mostStudents, cs.most_percent AS mostStudentsPercent
+          cf.average_gpa AS averageGPA, cf.most_grade AS mostStudents, cf.most_percent AS mostStudentsPercent
         FROM courses_fts cf
-        LEFT JOIN class_summary cs ON cs.class_id = cf.class_id
         WHERE ${whereClause} ORDER BY cf.course_code ASC LIMIT 7
       `;
       
@@ -172,9 +194,8 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
       
       const deptSQL = `
         SELECT DISTINCT df.dept_name, df.dept_abbr, 1200 as relevance_score,
-               ds.average_gpa AS averageGPA, ds.most_grade AS mostStudents, ds.most_percent AS mostStudentsPercent
+               df.average_gpa AS averageGPA, df.most_grade AS mostStudents, df.most_percent AS mostStudentsPercent
         FROM departments_fts df
-        LEFT JOIN department_summary ds ON ds.dept_abbr = df.dept_abbr
         WHERE departments_fts MATCH @dept_pattern
         LIMIT 7
       `;
@@ -191,7 +212,7 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
       
       // Cache department searches and other common queries
       if (COMMON_DEPT_SEARCHES.includes(searchTerm.toLowerCase()) || courseCodeInfo.isDeptCode) {
-        setCachedResult(searchKey, result);
+        setCachedResult(searchKey, result, effectiveDept);
       }
       
       return result;
@@ -216,9 +237,8 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
       const classSQL = `
         SELECT cf.class_id, cf.course_code, cf.course_code_space, cf.course_title, cf.department,
                (ABS(bm25(courses_fts)) * 2.0) as relevance_score,
-               cs.average_gpa AS averageGPA, cs.most_grade AS mostStudents, cs.most_percent AS mostStudentsPercent
+               cf.average_gpa AS averageGPA, cf.most_grade AS mostStudents, cf.most_percent AS mostStudentsPercent
         FROM courses_fts cf
-        LEFT JOIN class_summary cs ON cs.class_id = cf.class_id
         ${whereClause} ORDER BY relevance_score DESC LIMIT 7
       `;
       // console.log(`🔍 CONTENT SEARCH SQL: ${classSQL}`);
@@ -226,10 +246,9 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
       const instructorSQL = `
         SELECT p.id as instructor_id, p.name as instructor_name, p.RMP_score, 
                (ABS(bm25(professors_fts)) * 10.0) as relevance_score,
-               ins.average_gpa AS averageGPA, ins.most_grade AS mostStudents, ins.most_percent AS mostStudentsPercent
+               pf.average_gpa AS averageGPA, pf.most_grade AS mostStudents, pf.most_percent AS mostStudentsPercent
         FROM professors_fts pf
         JOIN professor p ON pf.rowid = p.id
-        LEFT JOIN instructor_summary ins ON ins.instructor_id = p.id
         WHERE professors_fts MATCH @search_term
         ORDER BY relevance_score DESC LIMIT 7
       `;
@@ -237,9 +256,8 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
       const deptSQL = `
         SELECT df.dept_name, df.dept_abbr, 
                (ABS(bm25(departments_fts)) * 5.0) as relevance_score,
-               ds.average_gpa AS averageGPA, ds.most_grade AS mostStudents, ds.most_percent AS mostStudentsPercent
+               df.average_gpa AS averageGPA, df.most_grade AS mostStudents, df.most_percent AS mostStudentsPercent
         FROM departments_fts df
-        LEFT JOIN department_summary ds ON ds.dept_abbr = df.dept_abbr
         WHERE departments_fts MATCH @search_term
         ORDER BY relevance_score DESC LIMIT 7
       `;
@@ -256,7 +274,7 @@ export const getSearchFTS5 = async (search, deptFilter = null) => {
       
       // Cache content searches if they're common terms
       if (COMMON_DEPT_SEARCHES.some(term => searchTerm.toLowerCase().includes(term))) {
-        setCachedResult(searchKey, result);
+        setCachedResult(searchKey, result, deptFilter ? deptFilter.toUpperCase() : null);
       }
       
       return result;
@@ -341,7 +359,7 @@ const enhanceInstructors = async (instructors) => {
 const enhanceDepartments = async (departments) => {
   if (departments.length === 0) return [];
   
-  // Use precomputed summaries from LEFT JOIN - no more heavy aggregation!
+  // Use the summary fields stored in the FTS documents - no more heavy aggregation!
   return departments.map(dept => {
     const result = {
       dept_abbr: dept.dept_abbr,
@@ -1,7 +1,8 @@
 import { promisedQuery, getCourseInfo, tryJSONParse } from './connection.js';
 import { parseJSONFromRow, groupBy, summarizeTerms, calculateAggregateStats } from './utils.js';
 
-export const getDistribution = async (classCode) => {
+// Sum every term row per instructor; used while class_instructor_rollup is missing or has no rows for the class
+const getDistributionFromTerms = async (classCode) => {
   const sql = `
       SELECT d.id      as distribution_id,
              students,
@@ -11,11 +12,12 @@ export const getDistribution = async (classCode) => {
              name            as professor_name,
              RMP_score       as professor_RMP_score
       FROM classdistribution
-               LEFT JOIN distribution d on classdistribution.id = d.class_id
-               LEFT JOIN termdistribution t on d.id = t.dist_id
+               JOIN distribution d on classdistribution.id = d.class_id
+               JOIN termdistribution t on d.id = t.dist_id
                LEFT JOIN professor p on d.instructor_id = p.id
       WHERE 
-        classdistribution.dept_abbr || course_num = REPLACE(@class_name, ' ', '')`;
+        classdistribution.class_code = UPPER(REPLACE(@class_name, ' ', ''))
+      ORDER BY d.instructor_id, t.term`;
 
   const params = {
     class_name: classCode,
@@ -26,6 +28,44 @@ export const getDistribution = async (classCode) => {
   return summarizeTerms(groupBy(rows.map(row => parseJSONFromRow(row, tryJSONParse)), "professor_id"));
 };
 
+export const getDistribution = async (classCode) => {
+  // One precomputed row per instructor (class_instructor_rollup, built by generate_summaries.py)
+  const sql = `
+      SELECT r.dist_id          as distribution_id,
+             r.total_students   as students,
+             r.grades,
+             r.terms,
+             r.instructor_id    as professor_id,
+             p.name             as professor_name,
+             p.RMP_score        as professor_RMP_score
+      FROM classdistribution
+               JOIN class_instructor_rollup r on classdistribution.id = r.class_id
+               LEFT JOIN professor p on r.instructor_id = p.id
+      WHERE 
+        classdistribution.class_code = UPPER(REPLACE(@class_name, ' ', ''))
+      ORDER BY r.instructor_id`;
+
+  const params = {
+    class_name: classCode,
+  };
+
+  let rows;
+  try {
+    rows = await promisedQuery(sql, params);
+  } catch (error) {
+    // A database older than the rollup table
+    if (!/no such table/.test(error.message)) throw error;
+    rows = [];
+  }
+  // Rollups are rebuilt after ingestion; until then the class's grades are only in termdistribution
+  if (rows.length === 0) return getDistributionFromTerms(classCode);
+
+  return rows.map(row => {
+    const terms = tryJSONParse(row.terms, []).map(([term, students, grades]) => ({ term, students, grades }));
+    return { ...parseJSONFromRow(row, tryJSONParse), term: terms[0]?.term, terms };
+  });
+};
+
 export const getClassInfo = async (classCode) => {
   const sql = `
       SELECT *
@@ -37,7 +77,7 @@ export const getClassInfo = async (classCode) => {
                                    LEFT JOIN libEd l ON lat.left_id = l.id
                           GROUP BY right_id) libEds on classdistribution.id = libEds.right_id
       WHERE 
-      classdistribution.dept_abbr || course_num = REPLACE(@class_name, ' ', '')`;
+      classdistribution.class_code = UPPER(REPLACE(@class_name, ' ', ''))`;
 
   const params = {
     class_name: classCode,
@@ -27,7 +27,7 @@ export const getSearch = async (search) => {
       FROM classdistribution
       WHERE 
         (
-          dept_abbr || course_num LIKE @search
+          class_code LIKE @search
           OR REPLACE(class_desc, ' ', '') LIKE @search
         )
       ORDER BY total_students DESC
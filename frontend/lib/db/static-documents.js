@@ -0,0 +1,102 @@
+import fs from "fs";
+import path from "path";
+import zlib from "zlib";
+import { latestChangeVersion } from "./changes.js";
+
+// Class, professor and department responses pre-rendered by the data pipeline
+// (data-app/src/publish/documents.py), stored as .json.gz and .json.br next to an index.json.
+// A document is only served while the index reflects the database's latest change_log version;
+// otherwise, and for anything missing, callers fall back to the SQL queries. publish/ is not checked
+// in: until `python -m src.publish` (or a pipeline run) writes it, there is no index and every
+// request reads from the database.
+const documentsDir = path.resolve(process.cwd(), "../data-app/publish/api");
+const indexPath = path.join(documentsDir, "index.json");
+const INDEX_CHECK_MS = 10 * 1000;
+
+let index = null;
+let indexMtime = 0;
+let checkedAt = 0;
+
+// Re-read index.json when the pipeline replaced it; costs at most one stat per INDEX_CHECK_MS
+const loadIndex = () => {
+  if (Date.now() - checkedAt < INDEX_CHECK_MS) return index;
+  checkedAt = Date.now();
+  try {
+    const { mtimeMs } = fs.statSync(indexPath);
+    if (mtimeMs !== indexMtime) {
+      index = JSON.parse(fs.readFileSync(indexPath, "utf8"));
+      indexMtime = mtimeMs;
+    }
+  } catch (error) {
+    index = null;
+    indexMtime = 0;
+  }
+  return index;
+};
+
+// Document keys as the pipeline writes them: class codes without spaces, upper-case departments
+const normalizeKey = (kind, key) => {
+  if (kind === "class") return String(key).replace(/\s+/g, "").toUpperCase();
+  if (kind === "dept") return String(key).toUpperCase();
+  return String(key);
+};
+
+const findDocument = (kind, key) => {
+  const current = loadIndex();
+  if (!current || current.version !== latestChangeVersion()) return null;
+  const documents = current.documents[kind] || {};
+  const normalized = normalizeKey(kind, key);
+  return Object.prototype.hasOwnProperty.call(documents, normalized) ? documents[normalized] : null;
+};
+
+const readFile = (relativePath) => {
+  try {
+    return fs.readFileSync(path.join(documentsDir, relativePath));
+  } catch (error) {
+    // Removed by an export in progress
+    return null;
+  }
+};
+
+// The `data` of a document (what /api/<kind>/<key> returns), or null
+const readStaticDocument = (kind, key) => {
+  const entry = findDocument(kind, key);
+  const compressed = entry && readFile(`${entry.path}.gz`);
+  try {
+    return compressed ? JSON.parse(zlib.gunzipSync(compressed)).data : null;
+  } catch (error) {
+    // Caught mid-rewrite by the next export
+    return null;
+  }
+};
+
+// Send a document in the best encoding the client accepts. Returns false when there is none to send.
+const sendStaticDocument = (req, res, kind, key) => {
+  const entry = findDocument(kind, key);
+  if (!entry) return false;
+
+  const accepted = req.headers["accept-encoding"] || "";
+  const encoding = entry.brotliBytes !== undefined && /\bbr\b/.test(accepted) ? "br" : "gzip";
+  const compressed = readFile(`${entry.path}${encoding === "br" ? ".br" : ".gz"}`);
+  if (!compressed) return false;
+  // Only gzip copies are kept; clients accepting neither get them inflated
+  const identity = encoding === "gzip" && !/\bgzip\b/.test(accepted);
+
+  // One ETag per representation, as each encoding is different bytes
+  const etag = `"${entry.sha256}${identity ? "" : `-${encoding}`}"`;
+  res.setHeader("Content-Type", "application/json; charset=utf-8");
+  res.setHeader("Vary", "Accept-Encoding");
+  res.setHeader("ETag", etag);
+  res.setHeader("X-Static-Document", entry.path);
+  if (req.headers["if-none-match"] === etag) {
+    res.status(304).end();
+    return true;
+  }
+  const body = identity ? zlib.gunzipSync(compressed) : compressed;
+  if (!identity) res.setHeader("Content-Encoding", encoding);
+  res.setHeader("Content-Length", body.length);
+  res.status(200).end(body);
+  return true;
+};
+
+export { readStaticDocument, sendStaticDocument };
@@ -0,0 +1,21 @@
+import fs from "fs";
+import path from "path";
+
+// Sitemap index and gzipped shards written by the data pipeline (data-app/src/publish/sitemap.py).
+// Without them, pages/sitemap_full.xml.js falls back to building one sitemap from the database.
+const sitemapDir = path.resolve(process.cwd(), "../data-app/publish/sitemap");
+const SHARD_NAME = /^sitemap-[a-z]+-\d+\.xml\.gz$/;
+
+const readSitemapFile = (name) => {
+  try {
+    return fs.readFileSync(path.join(sitemapDir, name));
+  } catch (error) {
+    return null;
+  }
+};
+
+const readSitemapIndex = () => readSitemapFile("sitemap.xml");
+
+const readSitemapShard = (name) => (SHARD_NAME.test(name) ? readSitemapFile(name) : null);
+
+export { readSitemapIndex, readSitemapShard };
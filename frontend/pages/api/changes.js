@@ -0,0 +1,42 @@
+import { getChangesSince, latestChangeVersion } from "../../lib/db/changes.js";
+
+// Past this many keys a client is told to flush its cache rather than download the whole list
+const MAX_CHANGED_KEYS = 2000;
+
+/**
+ * Change feed for client caches (hooks/useLRUCache.js).
+ *
+ * GET /api/changes returns the current version; GET /api/changes?since=<version> also returns the
+ * class codes, professor ids and department codes changed after it. `reset` means flush everything.
+ */
+export default async function handler(req, res) {
+  res.setHeader('Cache-Control', 'no-cache, no-store, must-revalidate');
+
+  if (req.query.since === undefined) {
+    res.status(200).json({
+      success: true,
+      data: { version: latestChangeVersion(), reset: false, classCodes: [], professorIds: [], deptAbbrs: [] },
+    });
+    return;
+  }
+
+  const since = Number(req.query.since);
+  if (!Number.isInteger(since) || since < 0) {
+    res.status(400).json({ success: false, error: "since must be a change version" });
+    return;
+  }
+
+  const changes = getChangesSince(since);
+  const size = changes.classCodes.size + changes.professorIds.size + changes.deptAbbrs.size;
+  const reset = changes.reset || size > MAX_CHANGED_KEYS;
+  res.status(200).json({
+    success: true,
+    data: {
+      version: changes.version,
+      reset,
+      classCodes: reset ? [] : [...changes.classCodes],
+      professorIds: reset ? [] : [...changes.professorIds],
+      deptAbbrs: reset ? [] : [...changes.deptAbbrs],
+    },
+  });
+}
@@ -1,5 +1,6 @@
 import { getClassDistribtionsInDept, getDeptInfo } from "../../../lib/db/index.js";
 import { logBootRequest } from "../../../lib/db/connection.js";
+import { sendStaticDocument } from "../../../lib/db/static-documents.js";
 
 export default async function handler(req, res) {
   const startTime = Date.now();
@@ -13,6 +14,13 @@ export default async function handler(req, res) {
 
   const { deptCode } = req.query;
 
+  // Serve the pipeline's pre-rendered document when it is current; the queries below are the fallback
+  res.setHeader('Cache-Control', 'public, s-maxage=604800, stale-while-revalidate=2592000');
+  if (sendStaticDocument(req, res, "dept", deptCode)) {
+    logBootRequest(`/api/dept/${deptCode}`, Date.now() - startTime, 0);
+    return;
+  }
+
   // Parallelize info and distributions fetching for better performance
   const dbStartTime = Date.now();
   const [info, distributions] = await Promise.all([
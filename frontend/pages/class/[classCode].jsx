@@ -20,6 +20,7 @@ import PageLayout from "../../components/Layout/PageLayout";
 import SearchBar from "../../components/Search/SearchBar";
 import { getClassInfo, getDistribution } from "../../lib/db/index.js";
 import { getCourseInfo } from "../../lib/db/connection.js";
+import { readStaticDocument } from "../../lib/db/static-documents.js";
 import { parseCourseCodesInText } from "../../lib/db/utils.js";
 import { distributionsToCards } from "../../components/distributionsToCards";
 import { useSearch } from "../../components/Search/useSearch";
@@ -310,7 +311,9 @@ export async function getServerSideProps({ res, params, query }) {
 
   const { classCode } = params;
 
-  const info = await getClassInfo(classCode);
+  // The pipeline's pre-rendered document, when current, saves both queries
+  const staticDocument = readStaticDocument("class", classCode);
+  const info = staticDocument ? [staticDocument] : await getClassInfo(classCode);
 
   if (info.length === 0 && !query.static) {
     return {
@@ -326,7 +329,7 @@ export async function getServerSideProps({ res, params, query }) {
     };
   }
 
-  const distributions = await getDistribution(classCode);
+  const distributions = staticDocument ? staticDocument.distributions : await getDistribution(classCode);
 
   if (query.static && query.static !== "all") {
     const filtered = distributions.filter((dist) =>
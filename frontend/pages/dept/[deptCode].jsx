@@ -10,6 +10,7 @@ import {
 import PageLayout from "../../components/Layout/PageLayout";
 import SearchBar from "../../components/Search/SearchBar";
 import { getClassDistribtionsInDept, getDeptInfo } from "../../lib/db/index.js";
+import { readStaticDocument } from "../../lib/db/static-documents.js";
 import { distributionsToCards } from "../../components/distributionsToCards";
 import VirtualizedCourseList from "../../components/VirtualizedCourseList";
 import { useSearch } from "../../components/Search/useSearch";
@@ -141,7 +142,9 @@ export async function getServerSideProps({ res, params }) {
 
   const { deptCode } = params;
 
-  const info = await getDeptInfo(deptCode);
+  // The pipeline's pre-rendered document, when current, saves both queries
+  const staticDocument = readStaticDocument("dept", deptCode);
+  const info = staticDocument ? [staticDocument] : await getDeptInfo(deptCode);
 
   if (info.length === 0) {
     return {
@@ -152,7 +155,7 @@ export async function getServerSideProps({ res, params }) {
     };
   }
 
-  const distributions = await getClassDistribtionsInDept(deptCode);
+  const distributions = staticDocument ? staticDocument.distributions : await getClassDistribtionsInDept(deptCode);
 
   return {
     props: {
@@ -11,6 +11,7 @@ import {
 import PageLayout from "../../components/Layout/PageLayout";
 import SearchBar from "../../components/Search/SearchBar";
 import { getInstructorClasses, getInstructorInfo } from "../../lib/db/index.js";
+import { readStaticDocument } from "../../lib/db/static-documents.js";
 import { distributionsToCards } from "../../components/distributionsToCards";
 import { useSearch } from "../../components/Search/useSearch";
 import SearchResults from "../../components/Search/SearchResults";
@@ -221,7 +222,9 @@ export async function getServerSideProps({ res, params }) {
 
   const { profCode } = params;
 
-  const info = await getInstructorInfo(profCode);
+  // The pipeline's pre-rendered document, when current, saves both queries
+  const staticDocument = readStaticDocument("prof", profCode);
+  const info = staticDocument ? [staticDocument] : await getInstructorInfo(profCode);
 
   if (info.length === 0) {
     return {
@@ -232,7 +235,7 @@ export async function getServerSideProps({ res, params }) {
     };
   }
 
-  const distributions = await getInstructorClasses(profCode);
+  const distributions = staticDocument ? staticDocument.distributions : await getInstructorClasses(profCode);
 
   return {
     props: {
@@ -3,6 +3,7 @@ import {
   getEveryDepartmentCode,
   getEveryProfessorCode,
 } from "../lib/db/index.js";
+import { readSitemapIndex } from "../lib/sitemaps.js";
 
 const cleanPrimaryID = (id) => {
   return id.toString().replaceAll(" ", "");
@@ -90,8 +91,9 @@ function SiteMap() {
 }
 
 export async function getServerSideProps({ res }) {
-  // We generate the XML sitemap with the posts data
-  const sitemap = await generateSiteMap();
+  // The pipeline's sitemap index (listing its gzipped shards under /sitemaps/) when it exists,
+  // otherwise one sitemap generated from the database
+  const sitemap = readSitemapIndex() || (await generateSiteMap());
 
   res.setHeader("Content-Type", "text/xml");
   // we send the XML to the browser
@@ -0,0 +1,26 @@
+import { readSitemapShard } from "../../lib/sitemaps.js";
+
+function SitemapShard() {
+  // getServerSideProps sends the file
+}
+
+export async function getServerSideProps({ res, params }) {
+  const shard = readSitemapShard(params.shard);
+  if (!shard) {
+    return {
+      notFound: true,
+    };
+  }
+
+  // A gzipped sitemap file as the pipeline wrote it, not a gzip-encoded response
+  res.setHeader("Content-Type", "application/gzip");
+  res.setHeader("Cache-Control", "public, s-maxage=86400, stale-while-revalidate=604800");
+  res.write(shard);
+  res.end();
+
+  return {
+    props: {},
+  };
+}
+
+export default SitemapShard;
@@ -1,22 +1,33 @@
 #!/usr/bin/env node
 
 /**
- * Production warmup script for BuzzGrades search API
- * 
- * Fires 6-10 GETs to /api/search with hot queries to warm up:
+ * Production warmup script for BuzzGrades
+ *
+ * Fetches the pages and /api/search queries listed in the warmup manifest that the data pipeline
+ * writes after each publish (data-app/publish/warmup.json, see data-app/src/publish/warmup.py):
+ * the classes, instructors and departments with the most recent enrollment, and the search
+ * prefixes leading to them. This warms up:
  * - Route/module loading
  * - Database connection
  * - Prepared statement cache
  * - FTS5 query templates
+ * - CDN/browser caches of the most visited pages
+ *
+ * Without a manifest it falls back to a handful of hardcoded search queries.
+ * WARMUP_MANIFEST overrides the manifest path, WARMUP_CONCURRENCY the number of parallel requests.
  */
 
 const https = require('https');
 const http = require('http');
+const fs = require('fs');
+const path = require('path');
 
 // Get origin from environment or default to localhost:3000
 const ORIGIN = process.env.BENCH_ORIGIN || process.env.WARMUP_ORIGIN || 'http://localhost:3000';
+const MANIFEST_PATH = process.env.WARMUP_MANIFEST || path.resolve(__dirname, '../../data-app/publish/warmup.json');
+const CONCURRENCY = parseInt(process.env.WARMUP_CONCURRENCY || '8', 10);
 
-// Hot queries; cold start mitigation plan
+// Hot queries used when there is no manifest
 const HOT_QUERIES = [
   'CS',          // Dept search
   'MATH',        // Dept search  
@@ -28,9 +39,26 @@ const HOT_QUERIES = [
   'linear algebra', // Additional content search
 ];
 
-const makeRequest = (query) => {
+const searchPath = (query) => `/api/search?q=${encodeURIComponent(query)}`;
+
+// Paths to warm: manifest pages and searches, or the hot queries
+const loadTargets = () => {
+  try {
+    const manifest = JSON.parse(fs.readFileSync(MANIFEST_PATH, 'utf8'));
+    console.log(`📄 Using warmup manifest ${MANIFEST_PATH} (generated ${manifest.generatedAt})`);
+    return [
+      ...manifest.pages.map((page) => ({ label: page.path, path: page.path })),
+      ...manifest.searches.map((search) => ({ label: `"${search.query}"`, path: searchPath(search.query) })),
+    ];
+  } catch (error) {
+    console.log(`📄 No warmup manifest at ${MANIFEST_PATH}, using ${HOT_QUERIES.length} hot queries`);
+    return HOT_QUERIES.map((query) => ({ label: `"${query}"`, path: searchPath(query) }));
+  }
+};
+
+const makeRequest = ({ label: query, path: requestPath }) => {
   return new Promise((resolve, reject) => {
-    const url = new URL(`/api/search?q=${encodeURIComponent(query)}`, ORIGIN);
+    const url = new URL(requestPath, ORIGIN);
     const client = url.protocol === 'https:' ? https : http;
     
     const startTime = Date.now();
@@ -43,60 +71,63 @@ const makeRequest = (query) => {
         const totalDuration = res.headers['x-total-duration'];
         
         if (res.statusCode === 200) {
-          console.log(`✅ "${query}": ${duration}ms (search: ${searchDuration}, total: ${totalDuration})`);
+          console.log(`✅ ${query}: ${duration}ms (search: ${searchDuration}, total: ${totalDuration})`);
           resolve({ query, duration, status: res.statusCode });
         } else {
-          console.warn(`⚠️  "${query}": HTTP ${res.statusCode} in ${duration}ms`);
+          console.warn(`⚠️  ${query}: HTTP ${res.statusCode} in ${duration}ms`);
           resolve({ query, duration, status: res.statusCode, error: true });
         }
       });
     });
     
     req.on('error', (error) => {
-      console.error(`❌ "${query}": ${error.message}`);
+      console.error(`❌ ${query}: ${error.message}`);
       reject({ query, error: error.message });
     });
     
     req.setTimeout(10000, () => {
       req.destroy();
-      console.error(`⏰ "${query}": timeout after 10s`);
+      console.error(`⏰ ${query}: timeout after 10s`);
       reject({ query, error: 'timeout' });
     });
   });
 };
 
 const warmup = async () => {
+  const targets = loadTargets();
   console.log(`🔥 Starting warmup against ${ORIGIN}`);
-  console.log(`📊 Running ${HOT_QUERIES.length} hot queries...`);
+  console.log(`📊 Running ${targets.length} requests, ${CONCURRENCY} at a time...`);
   
   const startTime = Date.now();
   const results = [];
   
   try {
-    // Execute all queries concurrently for faster warmup
-    const promises = HOT_QUERIES.map(query => 
-      makeRequest(query).catch(err => ({ ...err, error: true }))
-    );
-    
-    const responses = await Promise.all(promises);
-    results.push(...responses);
+    // A few workers take targets in manifest order, so the most visited pages warm first
+    let next = 0;
+    const worker = async () => {
+      while (next < targets.length) {
+        const target = targets[next++];
+        results.push(await makeRequest(target).catch(err => ({ ...err, error: true })));
+      }
+    };
+    await Promise.all(Array.from({ length: Math.max(1, CONCURRENCY) }, worker));
     
     const totalTime = Date.now() - startTime;
     const successful = results.filter(r => !r.error).length;
     const failed = results.filter(r => r.error).length;
     
     console.log(`\n🏁 Warmup completed in ${totalTime}ms`);
-    console.log(`✅ Successful: ${successful}/${HOT_QUERIES.length}`);
+    console.log(`✅ Successful: ${successful}/${targets.length}`);
     if (failed > 0) {
-      console.log(`❌ Failed: ${failed}/${HOT_QUERIES.length}`);
+      console.log(`❌ Failed: ${failed}/${targets.length}`);
     }
     
-    // Success if majority of queries succeeded
-    if (successful >= HOT_QUERIES.length * 0.7) {
+    // Success if majority of requests succeeded
+    if (successful >= targets.length * 0.7) {
       console.log(`🎉 Warmup successful! API is ready.`);
       process.exit(0);
     } else {
-      console.error(`💥 Warmup failed - too many errors (${failed}/${HOT_QUERIES.length})`);
+      console.error(`💥 Warmup failed - too many errors (${failed}/${targets.length})`);
       process.exit(1);
     }
     
@@ -126,4 +157,4 @@ if (require.main === module) {
   warmup();
 }
 
-module.exports = { warmup, HOT_QUERIES };
\ No newline at end of file
+module.exports = { warmup, loadTargets, HOT_QUERIES };
\ No newline at end of file
@@ -50,6 +50,14 @@ class LRUCache {
     this.cache.clear();
   }
 
+  deleteWhere(predicate) {
+    for (const key of [...this.cache.keys()]) {
+      if (predicate(key)) {
+        this.cache.delete(key);
+      }
+    }
+  }
+
   size() {
     return this.cache.size;
   }